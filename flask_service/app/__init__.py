@@ -1,8 +1,14 @@
 # app/__init__.py
-from flask import Flask, jsonify, send_from_directory # <--- MODIFIED HERE
+import click
+from flask import Flask, jsonify
 from flask_pymongo import PyMongo
 from flask_jwt_extended import JWTManager
 from .config import Config
+from .utils.json_provider import get_json_provider_class
+from .utils.compression import init_compression
+from .services.invalidation_bus import init_invalidation_bus
+from .services.counter_aggregator import init_counter_aggregator
+from .services.upload_serving import serve_upload
 import os
 
 mongo = PyMongo()
@@ -11,6 +17,7 @@ jwt = JWTManager()
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.json = get_json_provider_class(app.config.get('JSON_PROVIDER'))(app) # Encodes ObjectId/datetime/bytes natively
 
     try:
         os.makedirs(app.instance_path, exist_ok=True)
@@ -19,40 +26,138 @@ def create_app(config_class=Config):
 
     mongo.init_app(app)
     jwt.init_app(app)
+    init_compression(app)
+    init_invalidation_bus(app)
+    init_counter_aggregator(app)
+    from .services.upload_gc import init_upload_gc # Imports models, which need `mongo` defined above
+    from .services.purger import init_purger
+    init_upload_gc(app)
+    init_purger(app)
 
     from .routes.auth_routes import auth_bp
     from .routes.user_routes import user_bp
     from .routes.content_routes import content_bp 
     from .routes.academic_routes import academic_bp
     from .routes.community_routes import community_bp # <-- Ensure this is imported
+    from .routes.upload_routes import upload_bp
 
     app.register_blueprint(auth_bp, url_prefix='/api/v1/auth')
     app.register_blueprint(user_bp, url_prefix='/api/v1/users')
     app.register_blueprint(content_bp, url_prefix='/api/v1') 
     app.register_blueprint(academic_bp, url_prefix='/api/v1') 
     app.register_blueprint(community_bp, url_prefix='/api/v1') # <-- Ensure this is registered
+    app.register_blueprint(upload_bp, url_prefix='/api/v1')
+
+    @app.cli.command('create-indexes')
+    def create_indexes_command():
+        """Creates the MongoDB indexes the models rely on. Safe to re-run."""
+        from .models.user import User
+        from .models.post import Post
+        from .models.comment import Comment
+        from .models.upload import Upload
+        from .models.community import Community
+        from .services import job_queue, timelines
+        User.ensure_indexes()
+        Community.ensure_indexes()
+        Post.ensure_indexes()
+        Comment.ensure_indexes()
+        Upload.ensure_indexes()
+        job_queue.ensure_indexes()
+        timelines.ensure_indexes()
+        print("Indexes created.")
+
+    @app.cli.command('gc-uploads')
+    @click.option('--dry-run', is_flag=True, help="Report orphans and reclaimable bytes without deleting anything.")
+    @click.option('--grace-hours', type=float, default=None, help="Keep unreferenced files younger than this (default: UPLOAD_GC_GRACE_HOURS).")
+    @click.option('--batch-size', type=int, default=None, help="Objects deleted per batch (default: UPLOAD_GC_BATCH_SIZE).")
+    @click.option('--max-batches', type=int, default=None, help="Stop after this many batches; the next run continues.")
+    def gc_uploads_command(dry_run, grace_hours, batch_size, max_batches):
+        """Deletes uploaded files no community, post or user references any more."""
+        from .services.upload_gc import sweep_orphaned_uploads
+        report = sweep_orphaned_uploads(dry_run=dry_run, batch_size=batch_size, max_batches=max_batches,
+                                        grace_seconds=grace_hours * 3600 if grace_hours is not None else None)
+        for field in ("scanned", "referenced", "withinGrace", "keptByRecord", "orphans", "deleted", "errors"):
+            print(f"{field}: {report[field]}")
+        print(f"{'reclaimableBytes' if dry_run else 'reclaimedBytes'}: "
+              f"{report['reclaimableBytes'] if dry_run else report['reclaimedBytes']}")
+        for key in report["sample"]:
+            print(f"  {key}")
+
+    @app.cli.command('purge-deleted')
+    @click.option('--max-documents', type=int, default=None, help="Per collection (default: PURGE_MAX_DOCUMENTS_PER_PASS).")
+    def purge_deleted_command(max_documents):
+        """Finishes purging soft-deleted posts and comments (also resumes interrupted purges)."""
+        from .services.purger import run_purge_pass
+        purged = run_purge_pass(max_documents=max_documents)
+        print(f"Purged {purged['posts']} posts and {purged['comments']} comments.")
+
+    @app.cli.command('worker')
+    @click.option('--executor', type=click.Choice(['thread', 'process']), default='thread',
+                  help="Run handlers on threads (I/O-bound, the default) or processes (CPU-bound, e.g. image variants).")
+    @click.option('--concurrency', type=int, default=None, help="Jobs run at once (default: JOB_WORKER_CONCURRENCY).")
+    @click.option('--types', default=None, help="Comma-separated job types to take (default: all).")
+    def worker_command(executor, concurrency, types):
+        """Runs queued background jobs until SIGINT/SIGTERM, then finishes the jobs in progress."""
+        import signal
+        import threading
+        from .services.job_queue import JobWorker
+        stop_event = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop_event.set())
+        worker = JobWorker(app, executor=executor, concurrency=concurrency,
+                           job_types=[t.strip() for t in types.split(',')] if types else None)
+        app.logger.info(f"Job worker {worker.name} started ({executor}, limits {worker.limits})")
+        worker.run(stop_event)
+        print(worker.snapshot())
+
+    @app.cli.command('job-stats')
+    @click.option('--window-minutes', type=int, default=60, help="Latency window for finished jobs.")
+    def job_stats_command(window_minutes):
+        """Prints queue depth per job type and recent wait/run latencies."""
+        from .services.job_queue import get_job_queue_metrics
+        metrics = get_job_queue_metrics(window_seconds=window_minutes * 60)
+        for job_type, depth in sorted(metrics["depth"].items()):
+            print(f"{job_type}: queued {depth['queued']} (ready {depth['ready']}, oldest {depth['oldestReadyAgeSeconds']}s), "
+                  f"running {depth['running']}")
+        for job_type, finished in sorted(metrics["finished"].items()):
+            print(f"{job_type}: done {finished['done']}, failed {finished['failed']}, "
+                  f"wait p50/p95 {finished['waitMs']['p50']}/{finished['waitMs']['p95']} ms, "
+                  f"run p50/p95 {finished['runMs']['p50']}/{finished['runMs']['p95']} ms")
+
+    @app.cli.command('reconcile-counters')
+    @click.option('--hours', type=float, default=24, help="Posts created or active within this many hours.")
+    def reconcile_counters_command(hours):
+        """Repairs drifted vote/comment/reply counters (queued as jobs when JOB_QUEUE_ENABLED)."""
+        from .services.counter_reconciler import reconcile_recent_posts
+        print(reconcile_recent_posts(since_seconds=hours * 3600))
 
     # ... (health_check and JWT error handlers) ...
     @app.route('/health', methods=['GET'])
     def health_check():
         return jsonify({"status": "healthy"}), 200
+    @app.route('/health/metrics', methods=['GET'])
+    def health_metrics():
+        """Counters of the worker process that serves the request."""
+        if not app.config.get('HEALTH_METRICS_ENABLED'):
+            return jsonify({"status": "fail", "message": "Not found."}), 404
+        from .services.community_directory import get_community_directory_metrics
+        from .services.counter_aggregator import get_counter_aggregator_metrics
+        from .services.invalidation_bus import get_invalidation_bus_metrics
+        from .services.object_cache import get_object_cache_metrics
+        from .services.portal_transport import get_transport_metrics
+        from .services.response_cache import get_response_cache_metrics
+        return jsonify({"status": "success", "data": {
+            "pid": os.getpid(),
+            "portalTransport": get_transport_metrics(),
+            "responseCache": get_response_cache_metrics(),
+            "objectCache": get_object_cache_metrics(),
+            "communityDirectory": get_community_directory_metrics(),
+            "counterAggregator": get_counter_aggregator_metrics(),
+            "invalidationBus": get_invalidation_bus_metrics(),
+        }}), 200
     @app.route(f'/{app.config.get("STATIC_UPLOAD_SUBPATH", "uploads")}/<path:filename>')
     def serve_uploaded_file(filename):
-        upload_dir = app.config.get('UPLOAD_FOLDER')
-        if not upload_dir:
-            app.logger.error("UPLOAD_FOLDER not configured for serving files.")
-            return jsonify({"status":"error", "message":"File serving not configured"}), 404
-        
-        # Ensure upload_dir is absolute for send_from_directory
-        if not os.path.isabs(upload_dir):
-            upload_dir = os.path.join(app.instance_path, upload_dir)
-
-        app.logger.debug(f"Attempting to serve: {filename} from directory: {upload_dir}")
-        try:
-            return send_from_directory(upload_dir, filename)
-        except FileNotFoundError:
-            app.logger.warning(f"File not found: {os.path.join(upload_dir, filename)}")
-            return jsonify({"status":"error", "message":"File not found"}), 404
+        return serve_upload(filename) # app/services/upload_serving.py: proxy offload, ETags, 304s, ranges
 
     @jwt.unauthorized_loader
     def unauthorized_response(reason_for_error):
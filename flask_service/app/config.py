@@ -15,11 +15,72 @@ class Config:
     JWT_TOKEN_LOCATION = ['headers']
 
     # College Portal Configuration
-    COLLEGE_LOGIN_URL = 'https://parents.msrit.edu/newparents/index.php'
-    COLLEGE_BASE_URL = 'https://parents.msrit.edu'
-    COLLEGE_EXAM_HISTORY_PATH = '/newparents/index.php?option=com_history&task=getResult'
+    # Override COLLEGE_BASE_URL (e.g. http://127.0.0.1:8765) to point the scraper at
+    # the offline portal simulator in tests/portal_simulator.py.
+    COLLEGE_BASE_URL = os.environ.get('COLLEGE_BASE_URL', 'https://parents.msrit.edu').rstrip('/')
+    COLLEGE_LOGIN_URL = os.environ.get('COLLEGE_LOGIN_URL', f"{COLLEGE_BASE_URL}/newparents/index.php")
+    COLLEGE_EXAM_HISTORY_PATH = os.environ.get('COLLEGE_EXAM_HISTORY_PATH', '/newparents/index.php?option=com_history&task=getResult')
 
     SCRAPER_USER_AGENT = 'UniCampusAppBackend/PythonScraper/1.1 (compatible; Mozilla/5.0)'
+    # Shared keep-alive pool for portal requests (see app/services/portal_transport.py).
+    # POOL_MAXSIZE bounds concurrent connections per host; POOL_BLOCK makes extra logins wait instead of opening more.
+    SCRAPER_POOL_CONNECTIONS = int(os.environ.get('SCRAPER_POOL_CONNECTIONS', 4))
+    SCRAPER_POOL_MAXSIZE = int(os.environ.get('SCRAPER_POOL_MAXSIZE', 16))
+    SCRAPER_POOL_BLOCK = os.environ.get('SCRAPER_POOL_BLOCK', 'false').lower() == 'true'
+    # Threads used to download post-login pages (exam history, ...) alongside the dashboard
+    SCRAPER_PAGE_FETCH_WORKERS = int(os.environ.get('SCRAPER_PAGE_FETCH_WORKERS', 8))
+
+    # GET /health/metrics: this worker's cache, transport and bus counters (all process-local, so each
+    # gunicorn worker answers for itself). Turn off where /health is reachable from outside.
+    HEALTH_METRICS_ENABLED = os.environ.get('HEALTH_METRICS_ENABLED', 'true').lower() == 'true'
+
+    # JSON encoder for responses: 'orjson' (default, falls back to stdlib if not installed) or 'stdlib'
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'orjson')
+
+    # Response compression (app/utils/compression.py). Bodies under COMPRESSION_MIN_SIZE bytes are sent as-is.
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 512))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5)) # 0-11; above ~6 costs more CPU than it saves bytes on small JSON
+    COMPRESSION_MIMETYPES = ['application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript']
+
+    # Shared cache for the anonymous part of community list/detail/post-page responses (app/services/response_cache.py)
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_TTL_SECONDS = int(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', 30))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+
+    # Per-object cache of serialized posts/communities, versioned by their last content edit (app/services/object_cache.py)
+    OBJECT_CACHE_ENABLED = os.environ.get('OBJECT_CACHE_ENABLED', 'true').lower() == 'true'
+    OBJECT_CACHE_MAX_ENTRIES = int(os.environ.get('OBJECT_CACHE_MAX_ENTRIES', 5000)) # Per cache, per worker
+    OBJECT_CACHE_MAX_BYTES = int(os.environ.get('OBJECT_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    OBJECT_CACHE_MAX_AGE_SECONDS = int(os.environ.get('OBJECT_CACHE_MAX_AGE_SECONDS', 300)) # Bounds staleness of embedded author names
+
+    # Broadcasts cache invalidations to the other gunicorn workers/nodes (app/services/invalidation_bus.py).
+    # 'mongo' tails a capped collection, 'redis' uses pub/sub on REDIS_URL, 'none' keeps invalidations process-local.
+    # Opt-in: single-worker deployments have nobody to tell, and each listener costs a connection per worker.
+    INVALIDATION_BUS_BACKEND = os.environ.get('INVALIDATION_BUS_BACKEND', 'none')
+    INVALIDATION_BUS_COLLECTION = os.environ.get('INVALIDATION_BUS_COLLECTION', 'cache_invalidations')
+    INVALIDATION_BUS_CAPPED_BYTES = int(os.environ.get('INVALIDATION_BUS_CAPPED_BYTES', 1024 * 1024))
+    INVALIDATION_BUS_POLL_SECONDS = float(os.environ.get('INVALIDATION_BUS_POLL_SECONDS', 0.5))
+    INVALIDATION_BUS_CHANNEL = os.environ.get('INVALIDATION_BUS_CHANNEL', 'unicampus:cache-invalidations')
+    REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
+    # Cached community id/slug/name resolution (app/services/community_directory.py)
+    COMMUNITY_META_TTL_SECONDS = int(os.environ.get('COMMUNITY_META_TTL_SECONDS', 600))
+    COMMUNITY_META_NEGATIVE_TTL_SECONDS = int(os.environ.get('COMMUNITY_META_NEGATIVE_TTL_SECONDS', 30))
+    COMMUNITY_META_MAX_ENTRIES = int(os.environ.get('COMMUNITY_META_MAX_ENTRIES', 10000))
+
+    # Background rewrite of post/comment author snapshots after a name/avatar change (app/services/author_fanout.py)
+    AUTHOR_FANOUT_BATCH_SIZE = int(os.environ.get('AUTHOR_FANOUT_BATCH_SIZE', 500))
+    AUTHOR_FANOUT_MAX_ATTEMPTS = int(os.environ.get('AUTHOR_FANOUT_MAX_ATTEMPTS', 3))
+    AUTHOR_FANOUT_RETRY_BASE_SECONDS = float(os.environ.get('AUTHOR_FANOUT_RETRY_BASE_SECONDS', 2))
+    AUTHOR_FANOUT_WORKERS = int(os.environ.get('AUTHOR_FANOUT_WORKERS', 2))
+
+    # Write-behind buffering of vote/comment counters per worker (app/services/counter_aggregator.py)
+    COUNTER_AGGREGATOR_ENABLED = os.environ.get('COUNTER_AGGREGATOR_ENABLED', 'false').lower() == 'true'
+    COUNTER_AGGREGATOR_FLUSH_SECONDS = float(os.environ.get('COUNTER_AGGREGATOR_FLUSH_SECONDS', 1.0))
+    COUNTER_AGGREGATOR_MAX_PENDING = int(os.environ.get('COUNTER_AGGREGATOR_MAX_PENDING', 1000)) # Buffered documents that trigger a flush
+    COUNTER_AGGREGATOR_MAX_STALENESS_SECONDS = float(os.environ.get('COUNTER_AGGREGATOR_MAX_STALENESS_SECONDS', 5.0))
     
     # This UPLOAD_FOLDER is for the *local file system path* where files are saved on the server
     UPLOAD_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'instance', 'uploads')
@@ -27,9 +88,73 @@ class Config:
     # The subpath for the URL, e.g., /uploads/community_icons/file.png
     STATIC_UPLOAD_SUBPATH = 'uploads' 
 
+    # Streaming image uploads (POST /api/v1/uploads/<kind>); checked while the body is read
+    UPLOAD_MAX_IMAGE_BYTES = int(os.environ.get('UPLOAD_MAX_IMAGE_BYTES', 8 * 1024 * 1024))
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 64 * 1024))
+    UPLOAD_BLOB_SUBFOLDER = 'blobs' # Content-addressed uploads: <UPLOAD_FOLDER>/blobs/<sha[:2]>/<sha256>.<ext>
+    # Who sends upload bytes (app/services/upload_serving.py): 'app', 'x-accel' (nginx) or 'x-sendfile'
+    UPLOAD_SERVE_MODE = os.environ.get('UPLOAD_SERVE_MODE', 'app')
+    UPLOAD_ACCEL_PREFIX = os.environ.get('UPLOAD_ACCEL_PREFIX', '/protected-uploads') # nginx `internal` location aliased to UPLOAD_FOLDER
+    UPLOAD_CACHE_MAX_AGE = int(os.environ.get('UPLOAD_CACHE_MAX_AGE', 24 * 3600)) # Legacy uuid-named files; hashed names are immutable
+    # Where upload bytes are stored (app/services/upload_storage.py): 'local' (UPLOAD_FOLDER) or 's3'
+    UPLOAD_STORAGE_BACKEND = os.environ.get('UPLOAD_STORAGE_BACKEND', 'local')
+    UPLOAD_PUBLIC_BASE_URL = os.environ.get('UPLOAD_PUBLIC_BASE_URL') # CDN base for upload URLs; defaults to the backend's own
+    UPLOAD_SPOOL_FOLDER = os.environ.get('UPLOAD_SPOOL_FOLDER') # Streaming-upload spool with 's3'; defaults to the system temp dir
+    UPLOAD_PRESIGN_EXPIRES_SECONDS = int(os.environ.get('UPLOAD_PRESIGN_EXPIRES_SECONDS', 900))
+    S3_BUCKET = os.environ.get('S3_BUCKET')
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL') # e.g. http://minio:9000; unset for AWS S3
+    S3_REGION = os.environ.get('S3_REGION', 'us-east-1')
+    S3_ACCESS_KEY_ID = os.environ.get('S3_ACCESS_KEY_ID')
+    S3_SECRET_ACCESS_KEY = os.environ.get('S3_SECRET_ACCESS_KEY')
+    S3_ADDRESSING_STYLE = os.environ.get('S3_ADDRESSING_STYLE', 'path') # 'virtual' for AWS bucket-subdomain URLs
+    # Orphaned upload sweeper (app/services/upload_gc.py; `flask gc-uploads` or in the background)
+    UPLOAD_GC_INTERVAL_SECONDS = int(os.environ.get('UPLOAD_GC_INTERVAL_SECONDS', 0)) # 0 = no background sweeps, e.g. 21600
+    UPLOAD_GC_GRACE_HOURS = float(os.environ.get('UPLOAD_GC_GRACE_HOURS', 24)) # Unreferenced files younger than this are kept
+    UPLOAD_GC_BATCH_SIZE = int(os.environ.get('UPLOAD_GC_BATCH_SIZE', 500))
+    UPLOAD_GC_BATCH_PAUSE_SECONDS = float(os.environ.get('UPLOAD_GC_BATCH_PAUSE_SECONDS', 0.1))
+    UPLOAD_GC_DRY_RUN = os.environ.get('UPLOAD_GC_DRY_RUN', 'false').lower() == 'true' # Background sweeps only report
+
+    # Soft-deleted posts/comments are purged in the background (app/services/purger.py; `flask purge-deleted`)
+    PURGE_ON_DELETE = os.environ.get('PURGE_ON_DELETE', 'true').lower() == 'true' # Start the cascade right after the DELETE
+    PURGE_WORKERS = int(os.environ.get('PURGE_WORKERS', 2))
+    PURGE_BATCH_SIZE = int(os.environ.get('PURGE_BATCH_SIZE', 200)) # Comments removed per step
+    PURGE_BATCH_PAUSE_SECONDS = float(os.environ.get('PURGE_BATCH_PAUSE_SECONDS', 0.05))
+    PURGE_INTERVAL_SECONDS = int(os.environ.get('PURGE_INTERVAL_SECONDS', 300)) # Pass that resumes interrupted purges; 0 = off
+    PURGE_MAX_DOCUMENTS_PER_PASS = int(os.environ.get('PURGE_MAX_DOCUMENTS_PER_PASS', 1000))
+
+    # Home feed across joined communities (app/services/home_feed.py)
+    FEED_COMMUNITIES_PER_QUERY = int(os.environ.get('FEED_COMMUNITIES_PER_QUERY', 100)) # MongoDB merge-sorts at most 200 index scans
+
+    # Durable background jobs run by `flask worker` (app/services/job_queue.py). Off: purges, image
+    # variants and author fan-out run on each web process's own thread pools, as configured above/below.
+    JOB_QUEUE_ENABLED = os.environ.get('JOB_QUEUE_ENABLED', 'false').lower() == 'true'
+    JOB_WORKER_CONCURRENCY = int(os.environ.get('JOB_WORKER_CONCURRENCY', 4)) # Jobs one `flask worker` runs at once
+    JOB_CONCURRENCY = os.environ.get('JOB_CONCURRENCY', '') # Per-type limits per worker, e.g. 'purge=4,image-variants=2'
+    JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 1.0))
+    JOB_VISIBILITY_TIMEOUT_SECONDS = int(os.environ.get('JOB_VISIBILITY_TIMEOUT_SECONDS', 300)) # Lease, renewed while running
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+    JOB_RETRY_BASE_SECONDS = float(os.environ.get('JOB_RETRY_BASE_SECONDS', 5)) # Doubles per attempt
+    JOB_RETRY_MAX_SECONDS = float(os.environ.get('JOB_RETRY_MAX_SECONDS', 600))
+    JOB_RETENTION_SECONDS = int(os.environ.get('JOB_RETENTION_SECONDS', 7 * 24 * 3600)) # Done jobs (latency metrics); failed ones are kept
+    # Counter drift repair (app/services/counter_reconciler.py; `flask reconcile-counters`)
+    RECONCILE_QUIET_SECONDS = float(os.environ.get('RECONCILE_QUIET_SECONDS', 30)) # > any counter flush delay
+    # Materialized "new" timelines for small communities (app/services/timelines.py). On by default only
+    # with the job queue: without it, fan-out and join backfills run inside the posting/joining request.
+    TIMELINE_FANOUT_MAX_MEMBERS = int(os.environ.get('TIMELINE_FANOUT_MAX_MEMBERS', 200 if JOB_QUEUE_ENABLED else 0)) # Larger communities are read at request time; 0 = off
+    TIMELINE_MAX_ENTRIES = int(os.environ.get('TIMELINE_MAX_ENTRIES', 500)) # Per user; older posts are read at request time
+    TIMELINE_IDLE_DAYS = int(os.environ.get('TIMELINE_IDLE_DAYS', 30)) # Unread timelines expire and are rebuilt on the next read
+
+    # Resized WebP/JPEG variants of uploaded images (app/services/image_pipeline.py)
+    IMAGE_PIPELINE_ENABLED = os.environ.get('IMAGE_PIPELINE_ENABLED', 'true').lower() == 'true'
+    IMAGE_PIPELINE_WORKERS = int(os.environ.get('IMAGE_PIPELINE_WORKERS', 2))
+    IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', 40_000_000)) # Larger images are rejected from the header alone
+    IMAGE_MAX_SIDE = int(os.environ.get('IMAGE_MAX_SIDE', 12000))
+    IMAGE_WEBP_QUALITY = int(os.environ.get('IMAGE_WEBP_QUALITY', 80))
+    IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', 82))
+
     # --- THIS IS THE KEY CHANGE ---
     # The public base URL for accessing your backend, including the schema (https)
     # You can also set this via an environment variable: os.environ.get('BACKEND_PUBLIC_BASE_URL')
-    BACKEND_PUBLIC_BASE_URL = 'https://unicampusbackend.duckdns.org'
+    BACKEND_PUBLIC_BASE_URL = os.environ.get('BACKEND_PUBLIC_BASE_URL', 'https://unicampusbackend.duckdns.org')
 
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB
\ No newline at end of file
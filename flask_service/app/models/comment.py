@@ -4,6 +4,8 @@ from datetime import datetime
 from bson import ObjectId, errors as bson_errors # Import bson_errors
 from flask import current_app
 from app.models.user import User # <--- ADD THIS IMPORT LINE
+from app.services.counter_aggregator import COUNTER_AGGREGATOR, overlay_pending
+from app.services.purger import schedule_purge
 
 class Comment:
     MAX_COMMENT_LENGTH = 2000 # Define as a class constant
@@ -12,6 +14,17 @@ class Comment:
     def get_collection():
         return mongo.db.comments
 
+    @staticmethod
+    def ensure_indexes():
+        # Author snapshot fan-out (app/services/author_fanout.py) scans by author
+        Comment.get_collection().create_index([("author_id", 1), ("_id", 1)])
+        # Thread listings skip soft-deleted comments (deleted_at: null) in the index; the post purge scans by post_id
+        Comment.get_collection().create_index([("post_id", 1), ("parent_comment_id", 1), ("deleted_at", 1), ("created_at", -1)])
+        # Reply counts and the comment purge look up live replies of a comment
+        Comment.get_collection().create_index([("parent_comment_id", 1), ("deleted_at", 1)])
+        # The purger's queue: only soft-deleted comments are in this index
+        Comment.get_collection().create_index([("deleted_at", 1)], partialFilterExpression={"deleted_at": {"$type": "date"}})
+
     @staticmethod
     def create_comment(post_id_str, author_id_str, text, parent_comment_id_str=None):
         from app.models.post import Post # Local import to avoid circular dependency
@@ -28,7 +41,7 @@ class Comment:
         except bson_errors.InvalidId: 
             raise ValueError("Invalid Post ID or Author ID format.")
 
-        post = Post.get_collection().find_one({"_id": post_id_obj}) 
+        post = Post.get_collection().find_one({"_id": post_id_obj, "deleted_at": None}, {"_id": 1})
         if not post: 
             raise ValueError(f"Post '{post_id_str}' not found for comment.")
 
@@ -37,7 +50,7 @@ class Comment:
             try:
                 parent_obj_id = ObjectId(parent_comment_id_str)
                 # Validate parent comment exists and belongs to the same post
-                parent_comment = Comment.get_collection().find_one({"_id": parent_obj_id, "post_id": post_id_obj})
+                parent_comment = Comment.get_collection().find_one({"_id": parent_obj_id, "post_id": post_id_obj, "deleted_at": None})
                 if not parent_comment:
                     raise ValueError("Parent comment not found or does not belong to this post.")
                 # Optional: Limit nesting depth
@@ -49,9 +62,12 @@ class Comment:
                 raise ve
 
 
+        author_doc = User.find_by_id(author_id_obj, projection=User.AUTHOR_SNAPSHOT_PROJECTION)
+
         comment_data = {
             "post_id": post_id_obj, 
             "author_id": author_id_obj, 
+            "author_snapshot": User.author_snapshot(author_doc) if author_doc else None, # Reads need no user lookup; kept fresh by author_fanout
             "text": text.strip(),
             "parent_comment_id": parent_obj_id, 
             # "depth": depth if parent_obj_id else 0, # For threading depth
@@ -66,24 +82,19 @@ class Comment:
         result = Comment.get_collection().insert_one(comment_data)
         comment_data['_id'] = result.inserted_id
         
-        # Increment comment_count on the Post document
-        Post.get_collection().update_one(
-            {"_id": post_id_obj},
-            {"$inc": {"comment_count": 1}, "$set": {"last_activity_at": datetime.utcnow()}}
-        )
+        # Increment comment_count on the Post document (written through, or buffered by the counter aggregator)
+        COUNTER_AGGREGATOR.record("posts", post_id_obj, inc={"comment_count": 1}, latest={"last_activity_at": datetime.utcnow()})
         # If it's a reply, increment reply_count on parent comment
         if parent_obj_id:
-            Comment.get_collection().update_one(
-                {"_id": parent_obj_id},
-                {"$inc": {"reply_count": 1}, "$set": {"updated_at": datetime.utcnow()}} # Also update parent's timestamp
-            )
+            COUNTER_AGGREGATOR.record("comments", parent_obj_id, inc={"reply_count": 1},
+                                      latest={"updated_at": datetime.utcnow()}) # Also update parent's timestamp
         
         return Comment.to_dict(comment_data, str(author_id_obj))
 
     @staticmethod
     def find_by_id(comment_id_str, current_user_id_str=None):
         try:
-            comment_doc = Comment.get_collection().find_one({"_id": ObjectId(comment_id_str)})
+            comment_doc = Comment.get_collection().find_one({"_id": ObjectId(comment_id_str), "deleted_at": None})
             return Comment.to_dict(comment_doc, current_user_id_str) if comment_doc else None
         except bson_errors.InvalidId: return None # Invalid ID format
         except Exception: return None
@@ -94,7 +105,7 @@ class Comment:
         try:
             comment_id_obj = ObjectId(comment_id_str); user_id_obj = ObjectId(user_id_str)
         except bson_errors.InvalidId: raise ValueError("Invalid Comment/User ID for vote.")
-        comment = Comment.get_collection().find_one({"_id": comment_id_obj})
+        comment = Comment.get_collection().find_one({"_id": comment_id_obj, "deleted_at": None})
         if not comment: raise ValueError("Comment not found for vote.")
 
         is_up = user_id_obj in comment.get("upvoted_by", [])
@@ -120,7 +131,14 @@ class Comment:
         if pull_ops: update_q["$pull"] = pull_ops
         if add_ops: update_q["$addToSet"] = add_ops # Use addToSet for safety
         if inc_ops: update_q["$inc"] = inc_ops
-        if update_q:
+        if update_q and COUNTER_AGGREGATOR.enabled:
+            # Voter lists are written now; the counters and timestamp go through the write-behind buffer
+            counters = update_q.pop("$inc", None)
+            res = Comment.get_collection().update_one({"_id": comment_id_obj}, update_q)
+            if res.modified_count > 0:
+                COUNTER_AGGREGATOR.record("comments", comment_id_obj, inc=counters, latest={"updated_at": datetime.utcnow()})
+                msg = "Vote on comment processed."
+        elif update_q:
             update_q["$set"] = {"updated_at": datetime.utcnow()}
             res = Comment.get_collection().update_one({"_id": comment_id_obj}, update_q)
             if res.modified_count > 0 or (inc_ops and res.matched_count > 0): msg = "Vote on comment processed."
@@ -139,12 +157,13 @@ class Comment:
             comment_id_obj = ObjectId(comment_id_str); author_id_obj = ObjectId(author_id_str)
         except bson_errors.InvalidId: raise ValueError("Invalid Comment/Author ID for update.")
 
-        comment = Comment.get_collection().find_one({"_id": comment_id_obj})
+        comment = Comment.get_collection().find_one({"_id": comment_id_obj, "deleted_at": None})
         if not comment: raise ValueError("Comment not found for update.")
         if comment.get("author_id") != author_id_obj: raise PermissionError("Not authorized to edit this comment.")
 
         update_fields = {"text": new_text.strip(), "updated_at": datetime.utcnow()}
-        res = Comment.get_collection().update_one({"_id": comment_id_obj, "author_id": author_id_obj}, {"$set": update_fields})
+        res = Comment.get_collection().update_one({"_id": comment_id_obj, "author_id": author_id_obj, "deleted_at": None},
+                                                  {"$set": update_fields})
         
         if res.modified_count > 0:
             updated_doc = Comment.get_collection().find_one({"_id": comment_id_obj})
@@ -155,35 +174,26 @@ class Comment:
             
     @staticmethod
     def delete_comment(comment_id_str, user_id_str):
-        from app.models.post import Post # Local import
         try:
             comment_id_obj = ObjectId(comment_id_str); user_id_obj = ObjectId(user_id_str)
         except bson_errors.InvalidId: raise ValueError("Invalid Comment/User ID for delete.")
 
-        comment = Comment.get_collection().find_one({"_id": comment_id_obj})
+        comment = Comment.get_collection().find_one({"_id": comment_id_obj, "deleted_at": None})
         if not comment: raise ValueError("Comment not found to delete.")
         if comment.get("author_id") != user_id_obj: raise PermissionError("Not authorized to delete this comment.")
 
-        # If this comment was a parent, consider how to handle its replies (e.g., delete them, reparent them, or mark as deleted_parent)
-        # For now, we'll just delete this comment and its direct replies if any (simple cascade)
-        Comment.get_collection().delete_many({"parent_comment_id": comment_id_obj}) # Delete replies first
-        
-        delete_result = Comment.get_collection().delete_one({"_id": comment_id_obj, "author_id": user_id_obj})
+        # Soft delete: hidden now; its replies (at any depth) are hidden and removed by the background purger,
+        # which also takes them off the post's comment_count
+        delete_result = Comment.get_collection().update_one({"_id": comment_id_obj, "author_id": user_id_obj, "deleted_at": None},
+                                                            {"$set": {"deleted_at": datetime.utcnow()}})
 
-        if delete_result.deleted_count > 0:
+        if delete_result.modified_count > 0:
             post_id_obj = comment.get("post_id")
             if post_id_obj:
-                # Decrement post's comment_count by 1 (for the main comment) + number of replies deleted
-                # This logic for reply count needs to be more robust if replies can be deeply nested.
-                # For now, assuming only one level of replies are directly deleted this way for simplicity.
-                # A better approach might be to sum up all descendants or use a transaction if MongoDB version supports it.
-                num_replies_deleted = Comment.get_collection().count_documents({"parent_comment_id": comment_id_obj}) # This will be 0 now
-                                                                                                                     # We'd need count before delete_many
-                # Simpler: just decrement by 1, assuming flat comments for now or frontend handles reply counts
-                Post.get_collection().update_one(
-                    {"_id": post_id_obj},
-                    {"$inc": {"comment_count": -1}} 
-                )
+                COUNTER_AGGREGATOR.record("posts", post_id_obj, inc={"comment_count": -1})
+            if comment.get("parent_comment_id"):
+                COUNTER_AGGREGATOR.record("comments", comment["parent_comment_id"], inc={"reply_count": -1})
+            schedule_purge("comments", comment_id_obj)
             return True
         else:
             current_app.logger.warning(f"Comment {comment_id_str} delete by author {user_id_str} removed 0 docs.")
@@ -195,7 +205,7 @@ class Comment:
             post_id_obj = ObjectId(post_id_str)
         except bson_errors.InvalidId: raise ValueError("Invalid Post ID format for fetching comments.")
         
-        query = {"post_id": post_id_obj}
+        query = {"post_id": post_id_obj, "deleted_at": None}
         if parent_id_str: # Fetching replies for a specific comment
             try:
                 query["parent_comment_id"] = ObjectId(parent_id_str)
@@ -215,7 +225,7 @@ class Comment:
             comment_dict = Comment.to_dict(comment_doc, current_user_id_str)
             # For basic threading, add reply count to top-level comments
             if not parent_id_str: # Only for top-level comments
-                 comment_dict['reply_count'] = Comment.get_collection().count_documents({"parent_comment_id": comment_doc["_id"]})
+                 comment_dict['reply_count'] = Comment.get_collection().count_documents({"parent_comment_id": comment_doc["_id"], "deleted_at": None})
             comments_list.append(comment_dict)
 
         total_comments = Comment.get_collection().count_documents(query)
@@ -229,52 +239,22 @@ class Comment:
     def to_dict(comment_doc, current_user_id_str=None):
         if not comment_doc: return None
 
-        author_display_name = "Unknown Author" # Default
-        author_id_for_object = "unknown"
-        author_avatar_url = None
-
-        author_id_obj = comment_doc.get("author_id")
-        if author_id_obj:
-            author_id_for_object = str(author_id_obj)
-            author_doc_from_db = User.find_by_id(str(author_id_obj))
-            if author_doc_from_db:
-                full_name = author_doc_from_db.get("name")
-                usn = author_doc_from_db.get("usn")
-                
-                if full_name and usn:
-                    author_display_name = f"{full_name} - {usn.upper()}"
-                elif full_name:
-                    author_display_name = full_name
-                elif usn:
-                    author_display_name = usn.upper()
-                else:
-                    author_display_name = "User Details Missing"
-                
-                author_avatar_url = author_doc_from_db.get("avatar")
-            else:
-                author_display_name = f"User Not Found ({str(author_id_obj)[:8]}...)"
-        else:
-            author_display_name = "Author ID Missing"
-
-        author_details = {
-            "id": author_id_for_object,
-            "name": author_display_name, # Combined name and USN
-            "avatarUrl": author_avatar_url 
-        }
+        author_details = User.author_details(comment_doc.get("author_id"), comment_doc.get("author_snapshot"))
 
         data = {
-            "id": str(comment_doc["_id"]),
-            "post_id": str(comment_doc.get("post_id")),
-            "author": author_details, # EMBEDDED AUTHOR OBJECT with combined name
+            "id": comment_doc["_id"], # ObjectIds and datetimes are encoded by the app JSON provider
+            "post_id": comment_doc.get("post_id"),
+            "author": author_details, # EMBEDDED AUTHOR OBJECT with combined name (from the stored snapshot)
             "text": comment_doc.get("text"),
-            "parent_comment_id": str(comment_doc.get("parent_comment_id")) if comment_doc.get("parent_comment_id") else None,
-            "created_at": comment_doc.get("created_at").isoformat() if comment_doc.get("created_at") else None,
-            "updated_at": comment_doc.get("updated_at").isoformat() if comment_doc.get("updated_at") else None,
+            "parent_comment_id": comment_doc.get("parent_comment_id"),
+            "created_at": comment_doc.get("created_at"),
+            "updated_at": comment_doc.get("updated_at"),
             "upvotes": comment_doc.get("upvotes", 0), 
             "downvotes": comment_doc.get("downvotes", 0),
             "reply_count": comment_doc.get("reply_count", 0),
             "user_vote": None 
         }
+        overlay_pending("comments", comment_doc["_id"], data) # Deltas still in this worker's write-behind buffer
         # ... (user_vote logic remains the same) ...
         if current_user_id_str:
             try:
@@ -4,6 +4,12 @@ from datetime import datetime, timezone
 from bson import ObjectId, errors as bson_errors
 import re
 from flask import current_app
+from app.services.response_cache import invalidate_community
+from app.services.object_cache import COMMUNITY_CACHE
+from app.services.community_directory import COMMUNITY_DIRECTORY, invalidate_community_meta
+from app.services.image_pipeline import schedule_variants, srcset_fields
+from app.services.timelines import remove_community, schedule_backfill
+from app.models.upload import Upload
 
 # UserModelPlaceholder (keep as is or replace with your actual User model interactions)
 
@@ -12,31 +18,55 @@ class Community:
     def get_collection():
         return mongo.db.communities
 
+    @staticmethod
+    def ensure_indexes():
+        # Multikey: the home feed (app/services/home_feed.py) looks up a user's communities by member
+        Community.get_collection().create_index([("members", 1)])
+
     @staticmethod
     def to_dict(community_doc, current_user_id_str=None):
         if not community_doc: return None
-        community_id_str = str(community_doc["_id"])
         is_member_status = False
         if current_user_id_str and ObjectId.is_valid(current_user_id_str):
             user_obj_id_for_check = ObjectId(current_user_id_str)
             if user_obj_id_for_check in community_doc.get("members", []):
                 is_member_status = True
+        # Descriptive fields are cached per (_id, contentUpdatedAt), which only edits move; counts,
+        # membership and updatedAt (bumped by joins and new posts too) come from community_doc.
+        static_data = COMMUNITY_CACHE.get_or_build(community_doc["_id"], community_doc.get("contentUpdatedAt"),
+                                                   lambda: Community._static_dict(community_doc))
+        return dict(static_data,
+                    updatedAt=community_doc.get("updatedAt"),
+                    memberCount=community_doc.get("memberCount", 0),
+                    postCount=community_doc.get("postCount", 0),
+                    iconVariants=community_doc.get("iconVariants"), # Filled in later by the image pipeline
+                    iconSrcset=srcset_fields(community_doc.get("iconVariants")),
+                    bannerVariants=community_doc.get("bannerVariants"),
+                    bannerSrcset=srcset_fields(community_doc.get("bannerVariants")),
+                    is_member=is_member_status)
+
+    @staticmethod
+    def _schedule_image_variants(community_id_obj, icon_url=None, banner_image_url=None):
+        on_recorded = lambda: invalidate_community(community_id_obj)
+        if icon_url:
+            schedule_variants("communities", community_id_obj, "iconUrl", "iconVariants", "icon", icon_url, on_recorded)
+        if banner_image_url:
+            schedule_variants("communities", community_id_obj, "bannerImage", "bannerVariants", "image", banner_image_url, on_recorded)
+
+    @staticmethod
+    def _static_dict(community_doc):
         return {
-            "id": community_id_str,
-            "_id": community_id_str, 
+            "id": community_doc["_id"], # ObjectIds and datetimes are encoded by the app JSON provider
+            "_id": community_doc["_id"],
             "name": community_doc.get("name"),
             "slug": community_doc.get("slug"),
             "description": community_doc.get("description"),
             "rules": community_doc.get("rules", []),
             "icon": community_doc.get("iconUrl"), # DB: iconUrl -> JSON: icon
             "bannerImage": community_doc.get("bannerImage"), # DB: bannerImage -> JSON: bannerImage
-            "createdBy": str(community_doc.get("createdBy")) if community_doc.get("createdBy") else None,
-            "createdAt": community_doc.get("createdAt").isoformat() if community_doc.get("createdAt") else None,
-            "updatedAt": community_doc.get("updatedAt").isoformat() if community_doc.get("updatedAt") else None,
-            "memberCount": community_doc.get("memberCount", 0),
-            "postCount": community_doc.get("postCount", 0),
+            "createdBy": community_doc.get("createdBy"),
+            "createdAt": community_doc.get("createdAt"),
             "tags": community_doc.get("tags", []),
-            "is_member": is_member_status
         }
 
     @staticmethod
@@ -66,10 +96,15 @@ class Community:
             "rules": rules or [], "iconUrl": icon_url, "bannerImage": banner_image_url, # Stored as iconUrl, bannerImage
             "createdBy": creator_obj_id, "createdAt": datetime.now(timezone.utc), 
             "updatedAt": datetime.now(timezone.utc), "memberCount": 1,
+            "contentUpdatedAt": datetime.now(timezone.utc), # Internal: versions the cached serialization
             "members": [creator_obj_id], "postCount": 0,
             "tags": [tag.strip().lower() for tag in tags if isinstance(tag, str) and tag.strip()] if tags else []
         }
         result = Community.get_collection().insert_one(community_data)
+        Upload.retain(icon_url, banner_image_url)
+        invalidate_community(result.inserted_id)
+        invalidate_community_meta(slug) # Clears a cached "unknown slug" answer
+        Community._schedule_image_variants(result.inserted_id, icon_url, banner_image_url)
         inserted_doc = Community.get_collection().find_one({"_id": result.inserted_id})
         return Community.to_dict(inserted_doc, current_user_id_str=created_by_id_str)
 
@@ -111,30 +146,47 @@ class Community:
         # These expect URLs from the route, or None to clear
         if "iconUrl" in update_data: # Key from route is 'iconUrl'
             set_payload["iconUrl"] = update_data["iconUrl"] 
+            set_payload["iconVariants"] = None # Regenerated for the new image
         if "bannerImage" in update_data: # Key from route is 'bannerImage'
             set_payload["bannerImage"] = update_data["bannerImage"]
+            set_payload["bannerVariants"] = None
 
         if not set_payload:
             current_app.logger.info(f"No valid fields to update for community {community_id_str}.")
             return Community.to_dict(community_doc, user_id_str) # Return current if no changes
 
         set_payload["updatedAt"] = datetime.now(timezone.utc)
+        set_payload["contentUpdatedAt"] = datetime.now(timezone.utc) # New version of the cached serialization
         
         Community.get_collection().update_one({"_id": community_id_obj}, {"$set": set_payload})
+        if "iconUrl" in set_payload:
+            Upload.replace(community_doc.get("iconUrl"), set_payload["iconUrl"])
+        if "bannerImage" in set_payload:
+            Upload.replace(community_doc.get("bannerImage"), set_payload["bannerImage"])
+        invalidate_community(community_id_obj)
+        invalidate_community_meta(community_id_obj)
+        Community._schedule_image_variants(community_id_obj, set_payload.get("iconUrl"), set_payload.get("bannerImage"))
         
         updated_community_doc = Community.get_collection().find_one({"_id": community_id_obj})
         return Community.to_dict(updated_community_doc, user_id_str)
 
     # ... (find_by_id_or_slug, get_all_communities, _update_membership, join_community, leave_community, is_user_member, increment_post_count remain as you provided) ...
+    @staticmethod
+    def resolve_meta(id_or_slug_str):
+        """{"id", "slug", "name"} for a community id or slug from the cached directory, or None if unknown."""
+        return COMMUNITY_DIRECTORY.resolve(id_or_slug_str, Community.get_collection)
+
     @staticmethod
     def find_by_id_or_slug(id_or_slug_str, current_user_id_str=None):
-        community_doc = None
-        if ObjectId.is_valid(id_or_slug_str):
-            try: community_doc = Community.get_collection().find_one({"_id": ObjectId(id_or_slug_str)})
-            except bson_errors.InvalidId: pass # Will try slug search next
-        if not community_doc: # If not found by ID or ID was invalid
-            community_doc = Community.get_collection().find_one({"slug": id_or_slug_str})
-        return Community.to_dict(community_doc, current_user_id_str)
+        meta = Community.resolve_meta(id_or_slug_str)
+        if not meta:
+            return None
+        # The members array is never loaded; membership is a separate indexed count.
+        community_doc = Community.get_collection().find_one({"_id": meta["id"]}, {"members": 0})
+        community_dict = Community.to_dict(community_doc)
+        if community_dict and current_user_id_str:
+            community_dict["is_member"] = Community.is_user_member(str(meta["id"]), current_user_id_str)
+        return community_dict
 
     @staticmethod
     def get_all_communities(page=1, per_page=10, search_query=None, current_user_id_str=None):
@@ -194,6 +246,7 @@ class Community:
                 "updatedAt": datetime.now(timezone.utc)
             })
             result = Community.get_collection().update_one({"_id": community_id_obj}, update_op_main)
+            invalidate_community(community_id_obj)
             return result.modified_count > 0
         return False # No action taken
 
@@ -203,6 +256,7 @@ class Community:
             if Community.is_user_member(community_id_str, user_id_str):
                  return {"message": "Already a member.", "already_member": True, "modified": False}
             if Community._update_membership(community_id_str, user_id_str, "join"):
+                schedule_backfill(user_id_str, community_id_str) # Small communities' posts go into the home timeline
                 return {"message": "Successfully joined community.", "modified": True}
             # If _update_membership returned False without an exception (e.g. already member, though checked above)
             return {"message": "Could not join community (no change made).", "modified": False} 
@@ -220,6 +274,7 @@ class Community:
             if not Community.is_user_member(community_id_str, user_id_str):
                 return {"message": "Not a member of this community.", "not_member": True, "modified": False}
             if Community._update_membership(community_id_str, user_id_str, "leave"):
+                remove_community(user_id_str, community_id_str)
                 return {"message": "Successfully left community.", "modified": True}
             return {"message": "Could not leave community (no change made).", "modified": False}
         except ValueError as ve: 
@@ -230,6 +285,22 @@ class Community:
             raise ValueError("Could not leave community due to an unexpected error.")
 
 
+    @staticmethod
+    def member_community_ids(community_ids, user_id_str):
+        """Subset of `community_ids` (ObjectIds) that the user belongs to, in one query."""
+        if not community_ids or not user_id_str or not ObjectId.is_valid(user_id_str):
+            return set()
+        cursor = Community.get_collection().find(
+            {"_id": {"$in": list(community_ids)}, "members": ObjectId(user_id_str)}, {"_id": 1})
+        return {doc["_id"] for doc in cursor}
+
+    @staticmethod
+    def joined_communities(user_id_str):
+        """{"_id", "memberCount"} of every community the user is a member of."""
+        if not user_id_str or not ObjectId.is_valid(user_id_str):
+            return []
+        return list(Community.get_collection().find({"members": ObjectId(user_id_str)}, {"_id": 1, "memberCount": 1}))
+
     @staticmethod
     def is_user_member(community_id_str, user_id_str):
         if not community_id_str or not user_id_str or \
@@ -255,3 +326,4 @@ class Community:
             {"_id": community_id_obj},
             {"$inc": {"postCount": amount}, "$set": {"updatedAt": datetime.now(timezone.utc)}}
         )
+        invalidate_community(community_id_obj)
@@ -4,14 +4,31 @@ from datetime import datetime, timezone # Added timezone for consistency if need
 from bson import ObjectId, errors as bson_errors
 from app.models.community import Community 
 from flask import current_app
-from app.models.comment import Comment 
 from app.models.user import User # <--- ADD THIS IMPORT LINE
+from app.models.upload import Upload
+from app.services.response_cache import invalidate_community, invalidate_post
+from app.services.object_cache import POST_CACHE
+from app.services.counter_aggregator import COUNTER_AGGREGATOR, overlay_pending
+from app.services.image_pipeline import schedule_variants, srcset_fields
+from app.services.purger import schedule_purge
+from app.services.timelines import schedule_fanout
 
 class Post:
     @staticmethod
     def get_collection():
         return mongo.db.posts
 
+    @staticmethod
+    def ensure_indexes():
+        # Author snapshot fan-out (app/services/author_fanout.py) scans by author
+        Post.get_collection().create_index([("author_id", 1), ("_id", 1)])
+        # Community listings skip soft-deleted posts (deleted_at: null) in the index; _id breaks ties for
+        # the home feed's cursors, and a community_id $in over these is merge-sorted by the server
+        Post.get_collection().create_index([("community_id", 1), ("deleted_at", 1), ("created_at", -1), ("_id", -1)])
+        Post.get_collection().create_index([("community_id", 1), ("deleted_at", 1), ("last_activity_at", -1), ("_id", -1)])
+        # The purger's queue: only soft-deleted posts are in this index
+        Post.get_collection().create_index([("deleted_at", 1)], partialFilterExpression={"deleted_at": {"$type": "date"}})
+
     @staticmethod
     def create_post(community_id_str, author_id_str, title, content_type, content_text=None, image_url=None, link_url=None, tags=None):
         # --- Validations for required fields ---
@@ -28,16 +45,12 @@ class Post:
         if content_type == "image" and not image_url: raise ValueError("Image URL required for image post.")
         if content_type == "link" and not link_url: raise ValueError("Link URL required for link post.")
         
-        # --- Fetch and validate community using the existing find_by_id_or_slug method ---
-        # Pass None for current_user_id_str as it's likely not needed for this specific check.
-        # Your Community.find_by_id_or_slug should handle current_user_id_str=None.
-        community_dict = Community.find_by_id_or_slug(community_id_str, current_user_id_str=None) 
+        # --- Resolve the community (id, slug, name) from the cached community directory ---
+        community_dict = Community.resolve_meta(community_id_str)
         
         if not community_dict: 
             raise ValueError(f"Community '{community_id_str}' not found when creating post.")
         
-        # Get the resolved ID from the fetched community dictionary.
-        # Your Community.to_dict returns 'id' as the string representation of _id.
         resolved_community_id_str = community_dict.get('id')
         if not resolved_community_id_str:
              raise ValueError(f"Could not resolve community ID for '{community_id_str}' from fetched community data.")
@@ -52,11 +65,14 @@ class Post:
             current_app.logger.error(f"Post.create_post - Unexpected error during ObjectId conversion: {e}", exc_info=True)
             raise ValueError("Error processing Community or Author ID.")
 
+        author_doc = User.find_by_id(author_id_obj, projection=User.AUTHOR_SNAPSHOT_PROJECTION)
+
         post_data = {
             "community_id": community_id_obj, 
             "community_slug": community_dict.get('slug'), 
             "community_name": community_dict.get('name'), 
             "author_id": author_id_obj,
+            "author_snapshot": User.author_snapshot(author_doc) if author_doc else None, # Reads need no user lookup; kept fresh by author_fanout
             "title": title.strip(), 
             "content_type": content_type,
             "content_text": content_text.strip() if content_text else None,
@@ -70,10 +86,15 @@ class Post:
             "comment_count": 0, 
             "created_at": datetime.now(timezone.utc),
             "updated_at": datetime.now(timezone.utc), 
-            "last_activity_at": datetime.now(timezone.utc) 
+            "last_activity_at": datetime.now(timezone.utc),
+            "content_updated_at": datetime.now(timezone.utc) # Internal: versions the cached serialization
         }
         result = Post.get_collection().insert_one(post_data)
         post_data['_id'] = result.inserted_id
+        Upload.retain(image_url)
+        invalidate_community(community_id_obj) # New post shows up on the community's cached pages
+        schedule_fanout(post_data) # Home timelines of small communities' members (app/services/timelines.py)
+        Post._schedule_image_variants(post_data['_id'], image_url)
         # Pass author_id as current_user_id_str for initial vote status in to_dict
         return Post.to_dict(post_data, current_user_id_str=str(author_id_obj))
 
@@ -82,62 +103,20 @@ class Post:
     @staticmethod
     def to_dict(post_doc, current_user_id_str=None):
         if not post_doc: return None
-
-        author_display_name = "Unknown Author" # Default
-        author_id_for_object = "unknown"
-        author_avatar_url = None
-
-        author_id_obj = post_doc.get("author_id")
-        if author_id_obj:
-            author_id_for_object = str(author_id_obj) # Store the ID regardless
-            author_doc_from_db = User.find_by_id(str(author_id_obj)) 
-            if author_doc_from_db:
-                full_name = author_doc_from_db.get("name")
-                usn = author_doc_from_db.get("usn")
-                
-                if full_name and usn:
-                    author_display_name = f"{full_name} - {usn.upper()}"
-                elif full_name:
-                    author_display_name = full_name
-                elif usn: # Should ideally not happen if name is always present for a user
-                    author_display_name = usn.upper()
-                else: # Name and USN both missing from user doc
-                    author_display_name = "User Details Missing"
-                
-                author_avatar_url = author_doc_from_db.get("avatar")
-            else:
-                # Author ID present but user not found
-                author_display_name = f"User Not Found ({str(author_id_obj)[:8]}...)"
-        else:
-            # No author_id in post_doc
-            author_display_name = "Author ID Missing"
-            
-        author_details = {
-            "id": author_id_for_object,
-            "name": author_display_name, # Combined name and USN
-            "avatarUrl": author_avatar_url 
-        }
-
-        data = {
-            "id": str(post_doc["_id"]),
-            "community_id": str(post_doc.get("community_id")),
-            "community_slug": post_doc.get("community_slug"),
-            "community_name": post_doc.get("community_name"),
-            "author": author_details, # EMBEDDED AUTHOR OBJECT with combined name
-            "title": post_doc.get("title"), 
-            "content_type": post_doc.get("content_type"),
-            "content_text": post_doc.get("content_text"), 
-            "image_url": post_doc.get("image_url"),
-            "link_url": post_doc.get("link_url"), 
-            "tags": post_doc.get("tags", []),
-            "upvotes": post_doc.get("upvotes", 0), 
-            "downvotes": post_doc.get("downvotes", 0),
-            "comment_count": post_doc.get("comment_count", 0),
-            "created_at": post_doc.get("created_at").isoformat() if post_doc.get("created_at") else None,
-            "updated_at": post_doc.get("updated_at").isoformat() if post_doc.get("updated_at") else None,
-            "last_activity_at": post_doc.get("last_activity_at").isoformat() if post_doc.get("last_activity_at") else None,
-            "user_vote": None 
-        }
+        # User-independent part comes from the versioned object cache, keyed on content edits only;
+        # counters and timestamps that votes move are always read from post_doc.
+        static_data = POST_CACHE.get_or_build(post_doc["_id"], post_doc.get("content_updated_at"),
+                                              lambda: Post._static_dict(post_doc))
+        data = dict(static_data,
+                    upvotes=post_doc.get("upvotes", 0),
+                    downvotes=post_doc.get("downvotes", 0),
+                    comment_count=post_doc.get("comment_count", 0),
+                    updated_at=post_doc.get("updated_at"),
+                    last_activity_at=post_doc.get("last_activity_at"),
+                    image_variants=post_doc.get("image_variants"), # Filled in later by the image pipeline
+                    image_srcset=srcset_fields(post_doc.get("image_variants")),
+                    user_vote=None)
+        overlay_pending("posts", post_doc["_id"], data) # Deltas still in this worker's write-behind buffer
         # ... (user_vote logic remains the same) ...
         if current_user_id_str:
             try:
@@ -150,11 +129,49 @@ class Post:
                 current_app.logger.warning(f"Vote determination error for user {current_user_id_str} on post {data['id']}: {e}")
         return data
 
+    @staticmethod
+    def _static_dict(post_doc):
+        """Serialized fields that do not depend on the viewer or on counters (cached per post version)."""
+        author_details = User.author_details(post_doc.get("author_id"), post_doc.get("author_snapshot"))
+
+        return {
+            "id": post_doc["_id"], # ObjectIds and datetimes are encoded by the app JSON provider
+            "community_id": post_doc.get("community_id"),
+            "community_slug": post_doc.get("community_slug"),
+            "community_name": post_doc.get("community_name"),
+            "author": author_details, # EMBEDDED AUTHOR OBJECT with combined name (from the stored snapshot)
+            "title": post_doc.get("title"), 
+            "content_type": post_doc.get("content_type"),
+            "content_text": post_doc.get("content_text"), 
+            "image_url": post_doc.get("image_url"),
+            "link_url": post_doc.get("link_url"), 
+            "tags": post_doc.get("tags", []),
+            "created_at": post_doc.get("created_at"),
+        }
+
+    @staticmethod
+    def _schedule_image_variants(post_id_obj, image_url):
+        if image_url:
+            schedule_variants("posts", post_id_obj, "image_url", "image_variants", "image", image_url,
+                              on_recorded=lambda: invalidate_post(post_id_obj))
+
+    @staticmethod
+    def user_votes_for_posts(post_ids, user_id_str):
+        """Maps each post id (ObjectId) the user voted on to "up" or "down" for the given posts."""
+        if not post_ids or not user_id_str or not ObjectId.is_valid(user_id_str):
+            return {}
+        user_obj_id = ObjectId(user_id_str)
+        votes = {}
+        for field, direction in (("upvoted_by", "up"), ("downvoted_by", "down")):
+            for doc in Post.get_collection().find({"_id": {"$in": list(post_ids)}, field: user_obj_id}, {"_id": 1}):
+                votes[doc["_id"]] = direction
+        return votes
+
     # Example for find_by_id_for_user (should already exist based on your routes)
     @staticmethod
     def find_by_id_for_user(post_id_str, current_user_id_str=None):
         try:
-            post_doc = Post.get_collection().find_one({"_id": ObjectId(post_id_str)})
+            post_doc = Post.get_collection().find_one({"_id": ObjectId(post_id_str), "deleted_at": None})
             return Post.to_dict(post_doc, current_user_id_str) if post_doc else None
         except bson_errors.InvalidId:
             current_app.logger.warning(f"Post.find_by_id_for_user: Invalid post_id_str: {post_id_str}")
@@ -170,7 +187,7 @@ class Post:
             community_id_obj = ObjectId(community_id_str)
         except bson_errors.InvalidId: 
             raise ValueError("Invalid Community ID format")
-        query = {"community_id": community_id_obj}
+        query = {"community_id": community_id_obj, "deleted_at": None} # Soft-deleted posts wait for the purger
         sort_field, sort_order = "created_at", -1 
         if sort_by == "hot": sort_field = "last_activity_at" 
         elif sort_by == "top": sort_field = "upvotes" # Consider adding an index for this if used often
@@ -193,7 +210,7 @@ class Post:
             author_id_obj = ObjectId(author_id_str)
         except bson_errors.InvalidId: raise ValueError("Invalid Post/Author ID for update.")
         
-        post = Post.get_collection().find_one({"_id": post_id_obj})
+        post = Post.get_collection().find_one({"_id": post_id_obj, "deleted_at": None})
         if not post: raise ValueError("Post not found for update.")
         if post.get("author_id") != author_id_obj: raise PermissionError("Not authorized to edit this post.")
 
@@ -212,6 +229,7 @@ class Post:
         if "image_url" in update_data and content_type_from_db == "image":
             allowed_updates["image_url"] = update_data["image_url"]
             if not allowed_updates["image_url"]: raise ValueError("Image URL cannot be empty for an image post.")
+            allowed_updates["image_variants"] = None # Regenerated for the new image
         if "link_url" in update_data and content_type_from_db == "link":
             allowed_updates["link_url"] = update_data["link_url"]
             if not allowed_updates["link_url"]: raise ValueError("Link URL cannot be empty for a link post.")
@@ -225,8 +243,14 @@ class Post:
 
         allowed_updates["updated_at"] = datetime.now(timezone.utc)
         allowed_updates["last_activity_at"] = datetime.now(timezone.utc) # Also update last activity
+        allowed_updates["content_updated_at"] = datetime.now(timezone.utc) # New version of the cached serialization
 
-        res = Post.get_collection().update_one({"_id": post_id_obj, "author_id": author_id_obj}, {"$set": allowed_updates})
+        res = Post.get_collection().update_one({"_id": post_id_obj, "author_id": author_id_obj, "deleted_at": None},
+                                               {"$set": allowed_updates})
+        invalidate_post(post_id_obj)
+        if "image_url" in allowed_updates and res.modified_count > 0:
+            Upload.replace(post.get("image_url"), allowed_updates["image_url"])
+            Post._schedule_image_variants(post_id_obj, allowed_updates["image_url"])
         
         updated_doc = Post.get_collection().find_one({"_id": post_id_obj}) # Fetch the updated document
         msg = "No changes applied."
@@ -242,7 +266,7 @@ class Post:
         except bson_errors.InvalidId:
             raise ValueError("Invalid Post ID or User ID format for delete.")
 
-        post = Post.get_collection().find_one({"_id": post_id_obj})
+        post = Post.get_collection().find_one({"_id": post_id_obj, "deleted_at": None})
         if not post:
             raise ValueError("Post not found to delete.")
 
@@ -251,25 +275,20 @@ class Post:
         
         community_id_obj = post.get("community_id") # Get community_id from the post
 
-        # 1. Delete all comments associated with this post
-        try:
-            comment_delete_result = Comment.get_collection().delete_many({"post_id": post_id_obj})
-            current_app.logger.info(f"Cascaded delete: {comment_delete_result.deleted_count} comments for post {post_id_str}")
-        except Exception as e:
-            current_app.logger.error(f"Error during cascading delete of comments for post {post_id_str}: {e}", exc_info=True)
-            # Decide if this should halt the post deletion or just be logged
-
-        # 2. Delete the post itself
-        delete_result = Post.get_collection().delete_one({"_id": post_id_obj, "author_id": user_id_obj})
+        # Soft delete: hidden from every read now; comments and the image are purged in the background
+        delete_result = Post.get_collection().update_one({"_id": post_id_obj, "author_id": user_id_obj, "deleted_at": None},
+                                                         {"$set": {"deleted_at": datetime.now(timezone.utc)}})
 
-        if delete_result.deleted_count > 0:
-            # 3. Decrement postCount in the community
+        if delete_result.modified_count > 0:
+            invalidate_post(post_id_obj)
+            # Decrement postCount in the community
             if community_id_obj: # Check if community_id was found
                 Community.increment_post_count(community_id_obj, amount=-1)
+            schedule_purge("posts", post_id_obj)
             return True
         else:
             current_app.logger.warning(f"Post {post_id_str} delete operation by author {user_id_str} affected 0 documents, though post was initially found.")
-            return False # Should not happen if the initial find and permission check passed
+            return False # Deleted concurrently
 
     @staticmethod
     def vote_on_post(post_id_str, user_id_str, vote_direction):
@@ -278,7 +297,7 @@ class Post:
             user_id_obj = ObjectId(user_id_str)
         except bson_errors.InvalidId: raise ValueError("Invalid Post/User ID format for vote.")
         
-        post = Post.get_collection().find_one({"_id": post_id_obj})
+        post = Post.get_collection().find_one({"_id": post_id_obj, "deleted_at": None})
         if not post: raise ValueError("Post not found for vote.")
 
         is_up = user_id_obj in post.get("upvoted_by", [])
@@ -317,10 +336,20 @@ class Post:
         if inc_ops: 
             update_query.setdefault("$inc", {}).update(inc_ops)
         
-        if update_query: # Only update if there are actual operations
+        if update_query and COUNTER_AGGREGATOR.enabled:
+            # Voter lists are written now; the counters and activity time go through the write-behind buffer
+            counters = update_query.pop("$inc", None)
+            result = Post.get_collection().update_one({"_id": post_id_obj}, update_query)
+            if result.modified_count > 0:
+                COUNTER_AGGREGATOR.record("posts", post_id_obj, inc=counters,
+                                          latest={"updated_at": datetime.now(timezone.utc), "last_activity_at": datetime.now(timezone.utc)})
+                msg = "Vote processed successfully."
+        elif update_query: # Only update if there are actual operations
+            # content_updated_at, which versions the cached serialization, is left alone: votes are read live
             update_query.setdefault("$set", {}).update({"updated_at": datetime.now(timezone.utc), "last_activity_at": datetime.now(timezone.utc)})
             
             result = Post.get_collection().update_one({"_id": post_id_obj}, update_query)
+            invalidate_post(post_id_obj)
             
             if result.modified_count > 0 or (inc_ops and result.matched_count > 0):
                 msg = "Vote processed successfully."
@@ -333,4 +362,8 @@ class Post:
             "upvotes": current_post_dict.get("upvotes"), 
             "downvotes": current_post_dict.get("downvotes"), 
             "user_vote": current_post_dict.get("user_vote")
-        }
\ No newline at end of file
+        }
+
+
+# Counter writes (votes, comment counts) that reach Mongo drop the cached pages listing those posts
+COUNTER_AGGREGATOR.on_flush("posts", invalidate_post)
@@ -0,0 +1,70 @@
+# flask_service/app/models/upload.py
+import re
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from app import mongo
+
+# One document per distinct uploaded blob, keyed by the SHA-256 of its bytes:
+#   {_id: sha256, path, url, size, format, kinds, uploads, refcount, created_at, last_uploaded_at, last_released_at}
+# `uploads` counts store() calls (how often the same bytes were sent); `refcount` counts
+# document fields (post image_url, community iconUrl/bannerImage, user avatar) that point at it.
+
+SHA256_FILENAME = re.compile(r'/([0-9a-f]{64})\.[a-z0-9]+$')
+
+class Upload:
+    @staticmethod
+    def get_collection():
+        return mongo.db.uploads
+
+    @staticmethod
+    def ensure_indexes():
+        # Orphan sweeps look for unreferenced blobs oldest first
+        Upload.get_collection().create_index([("refcount", 1), ("last_released_at", 1)])
+
+    @staticmethod
+    def sha_for_url(url):
+        """SHA-256 of a content-addressed upload URL, or None for legacy/external URLs."""
+        match = SHA256_FILENAME.search(url) if isinstance(url, str) else None
+        return match.group(1) if match else None
+
+    @staticmethod
+    def record_upload(sha256, path, url, size, file_format, kind):
+        """Registers one upload of these bytes; returns True if the blob already existed (deduplicated)."""
+        now = datetime.now(timezone.utc)
+        previous = Upload.get_collection().find_one_and_update(
+            {"_id": sha256},
+            {"$inc": {"uploads": 1},
+             "$addToSet": {"kinds": kind},
+             "$set": {"last_uploaded_at": now},
+             "$setOnInsert": {"path": path, "url": url, "size": size, "format": file_format,
+                              "refcount": 0, "created_at": now, "last_released_at": now}},
+            upsert=True, projection={"_id": 1}, return_document=ReturnDocument.BEFORE
+        )
+        return previous is not None
+
+    @staticmethod
+    def retain(*urls):
+        """A document field now references these URLs."""
+        Upload._adjust(urls, 1)
+
+    @staticmethod
+    def release(*urls):
+        """A document field stopped referencing these URLs (replaced or deleted)."""
+        Upload._adjust(urls, -1)
+
+    @staticmethod
+    def replace(old_url, new_url):
+        if old_url != new_url:
+            Upload.retain(new_url)
+            Upload.release(old_url)
+
+    @staticmethod
+    def _adjust(urls, amount):
+        for url in urls:
+            sha256 = Upload.sha_for_url(url)
+            if not sha256:
+                continue # Legacy uuid-named and external URLs are not tracked
+            update = {"$inc": {"refcount": amount}}
+            if amount < 0:
+                update["$set"] = {"last_released_at": datetime.now(timezone.utc)} # Grace period for the orphan sweeper starts here
+            Upload.get_collection().update_one({"_id": sha256}, update)
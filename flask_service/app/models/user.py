@@ -1,6 +1,12 @@
 from app import mongo
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
+import hashlib
+import json
+from app.utils.helpers import make_etag
+from app.services.response_cache import invalidate_user
+from app.models.upload import Upload
 # from werkzeug.security import generate_password_hash, check_password_hash # Not used for this student login flow
 
 class User:
@@ -9,89 +15,147 @@ class User:
         return mongo.db.users
 
     @staticmethod
-    def create_user_from_scraped_data(scraped_data, requested_usn):
+    def ensure_indexes():
+        # Unique so concurrent first logins cannot create two users for one USN
+        User.get_collection().create_index("usn", unique=True)
+
+    # Heavy scraped fields, left out of documents returned for token issuance
+    SCRAPED_ARRAY_FIELDS = ("academic_summaries", "exam_history")
+
+    @staticmethod
+    def _scraped_fields(scraped_data, requested_usn):
         profile = scraped_data.get('studentProfile', {})
         exam_history_data = scraped_data.get('examHistory', {})
-        
-        usn_from_profile = profile.get('usn', requested_usn).upper() # Fallback to requested_usn if not in profile
-
-        user_data = {
-            "usn": usn_from_profile,
+        usn_from_profile = (profile.get('usn') or requested_usn).upper()
+        return usn_from_profile, {
             "name": profile.get('name'),
-            "email": f"{usn_from_profile.lower()}@unicampus.app",
-            "role": "student",
-            "password_hash": None,
             "college_profile": {
                 "officialName": profile.get('name'),
                 "department": profile.get('department'),
                 "semester": profile.get('semester'),
                 "section": profile.get('section'),
-                "usn": usn_from_profile 
+                "usn": usn_from_profile
             },
             "academic_summaries": scraped_data.get('dashboardSummaries', []),
             "exam_history": exam_history_data.get('semesters', []),
             "most_recent_cgpa": exam_history_data.get('mostRecentCGPA'),
-            "college_data_last_updated": datetime.utcnow(),
-            "avatar": None,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
         }
-        
-        existing_user_usn = User.get_collection().find_one({"usn": user_data["usn"]})
-        if existing_user_usn:
-            raise ValueError(f"User with USN {user_data['usn']} already exists. Update logic should be used.")
 
-        result = User.get_collection().insert_one(user_data)
-        user_data['_id'] = result.inserted_id
-        return user_data
+    @staticmethod
+    def compute_scrape_hash(scraped_fields):
+        canonical = json.dumps(scraped_fields, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
 
     @staticmethod
-    def update_user_with_scraped_data(user_id, scraped_data):
-        profile = scraped_data.get('studentProfile', {})
-        exam_history_data = scraped_data.get('examHistory', {})
-        usn_from_profile = profile.get('usn', '').upper()
+    def upsert_from_scraped_data(scraped_data, requested_usn):
+        """
+        Creates or refreshes the user for a successful portal login and returns the
+        final document (without the heavy scraped arrays) for token issuance.
 
+        Common case: the portal data is unchanged since the last login, so one
+        find_one_and_update matching the stored scrape_hash touches only the check
+        timestamp and the arrays are never sent. Otherwise a single atomic upsert writes
+        the full payload (and the create-only fields on first login); its pre-image
+        tells whether the author snapshot changed, and the returned document is that
+        pre-image with the update applied.
+        """
+        usn, scraped_fields = User._scraped_fields(scraped_data, requested_usn)
+        scrape_hash = User.compute_scrape_hash(scraped_fields)
+        now = datetime.utcnow()
+        now = now.replace(microsecond=now.microsecond // 1000 * 1000) # BSON precision, so the returned document matches the stored one
+        projection = {field: 0 for field in User.SCRAPED_ARRAY_FIELDS}
 
-        update_fields = {
-            "name": profile.get('name'),
-            "college_profile": {
-                "officialName": profile.get('name'),
-                "department": profile.get('department'),
-                "semester": profile.get('semester'),
-                "section": profile.get('section'),
-            },
-            "academic_summaries": scraped_data.get('dashboardSummaries', []),
-            "exam_history": exam_history_data.get('semesters', []),
-            "most_recent_cgpa": exam_history_data.get('mostRecentCGPA'),
-            "college_data_last_updated": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
+        unchanged_doc = User.get_collection().find_one_and_update(
+            {"usn": usn, "scrape_hash": scrape_hash},
+            {"$set": {"college_data_last_checked": now}},
+            projection=projection,
+            return_document=ReturnDocument.AFTER
+        )
+        if unchanged_doc:
+            return unchanged_doc
+
+        updated_fields = dict(scraped_fields, scrape_hash=scrape_hash, college_data_last_updated=now,
+                              college_data_last_checked=now, updated_at=now)
+        created_fields = {
+            "_id": ObjectId(), # Chosen here so a first login knows its id without reading the document back
+            "usn": usn,
+            "email": f"{usn.lower()}@unicampus.app",
+            "role": "student",
+            "password_hash": None,
+            "avatar": None,
+            "created_at": now,
         }
-        # Ensure USN is in college_profile if available from scrape
-        if usn_from_profile:
-            update_fields["college_profile"]["usn"] = usn_from_profile
-        else: # If USN not in scraped profile, try to keep existing from DB doc
-            existing_user = User.find_by_id(user_id)
-            if existing_user and existing_user.get("college_profile", {}).get("usn"):
-                 update_fields["college_profile"]["usn"] = existing_user["college_profile"]["usn"]
-
-
-        User.get_collection().update_one(
-            {"_id": ObjectId(user_id)},
-            {"$set": update_fields}
+        # Concurrent first logins race on the unique usn index; the server retries the losing upsert as an update
+        previous = User.get_collection().find_one_and_update(
+            {"usn": usn}, {"$set": updated_fields, "$setOnInsert": created_fields},
+            projection=projection, upsert=True, return_document=ReturnDocument.BEFORE
         )
-        return User.find_by_id(user_id)
+        user_doc = dict(previous or created_fields, **updated_fields)
+        for field in User.SCRAPED_ARRAY_FIELDS:
+            user_doc.pop(field, None)
+        if previous and User.author_snapshot(previous) != User.author_snapshot(user_doc):
+            User._refresh_author_snapshots(user_doc["_id"])
+        return user_doc
 
     @staticmethod
     def find_by_usn(usn):
         return User.get_collection().find_one({"usn": usn.upper()})
 
     @staticmethod
-    def find_by_id(user_id):
+    def find_by_id(user_id, projection=None):
+        # projection: optional Mongo projection so callers only load the fields they serve
         try:
-            return User.get_collection().find_one({"_id": ObjectId(user_id)})
+            return User.get_collection().find_one({"_id": ObjectId(user_id)}, projection)
         except Exception:
             return None
 
+    # Fields copied into posts/comments as their author snapshot
+    AUTHOR_SNAPSHOT_PROJECTION = {"name": 1, "usn": 1, "avatar": 1}
+
+    @staticmethod
+    def author_snapshot(user_doc):
+        """Small denormalized copy of the author stored on posts and comments."""
+        return {"name": user_doc.get("name"), "usn": user_doc.get("usn"), "avatarUrl": user_doc.get("avatar")}
+
+    @staticmethod
+    def author_details(author_id_obj, snapshot=None):
+        """
+        Embedded author object for post/comment responses. Built from the document's
+        author snapshot; documents written before snapshots existed fall back to a user lookup.
+        """
+        if not author_id_obj:
+            return {"id": "unknown", "name": "Author ID Missing", "avatarUrl": None}
+        if snapshot is None:
+            user_doc = User.find_by_id(str(author_id_obj), projection=User.AUTHOR_SNAPSHOT_PROJECTION)
+            if not user_doc:
+                return {"id": author_id_obj, "name": f"User Not Found ({str(author_id_obj)[:8]}...)", "avatarUrl": None}
+            snapshot = User.author_snapshot(user_doc)
+
+        full_name, usn = snapshot.get("name"), snapshot.get("usn")
+        if full_name and usn:
+            display_name = f"{full_name} - {usn.upper()}"
+        elif full_name:
+            display_name = full_name
+        elif usn: # Should ideally not happen if name is always present for a user
+            display_name = usn.upper()
+        else: # Name and USN both missing from user doc
+            display_name = "User Details Missing"
+        return {"id": author_id_obj, "name": display_name, "avatarUrl": snapshot.get("avatarUrl")}
+
+    # Every write that changes what a user endpoint serves moves one of these fields
+    VERSION_PROJECTION = {"updated_at": 1, "college_data_last_updated": 1, "scrape_hash": 1}
+
+    @staticmethod
+    def find_version_by_id(user_id):
+        """Projection-only read of the version fields, for cheap conditional GETs."""
+        return User.find_by_id(user_id, projection=User.VERSION_PROJECTION)
+
+    @staticmethod
+    def version_etag(user_doc, scope):
+        """Strong ETag for the `scope` representation of a user, from its version fields."""
+        return make_etag(scope, user_doc["_id"], user_doc.get("scrape_hash"),
+                         user_doc.get("college_data_last_updated"), user_doc.get("updated_at"))
+
     @staticmethod
     def update_profile(user_id, data_to_update):
         allowed_updates = {"avatar", "name"} 
@@ -99,9 +163,20 @@ class User:
         if not update_data:
             return False
         update_data["updated_at"] = datetime.utcnow()
-        User.get_collection().update_one({"_id": ObjectId(user_id)}, {"$set": update_data})
+        previous = User.get_collection().find_one_and_update({"_id": ObjectId(user_id)}, {"$set": update_data},
+                                                             projection={"avatar": 1})
+        if previous and "avatar" in update_data:
+            Upload.replace(previous.get("avatar"), update_data["avatar"])
+        User._refresh_author_snapshots(user_id)
         return True
 
+    @staticmethod
+    def _refresh_author_snapshots(user_id):
+        """Queues the background rewrite of the author snapshot on this user's posts and comments."""
+        from app.services.author_fanout import schedule_author_fanout # Local import to avoid circular dependency
+        invalidate_user(user_id) # Name/avatar are embedded in cached pages in every worker; the fan-out invalidates again per batch
+        schedule_author_fanout(user_id)
+
     @staticmethod
     def to_dict(user_doc):
         if not user_doc:
@@ -3,89 +3,130 @@
 from flask import Blueprint, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import User # Assuming your User model is in app.models.user
+from app.utils.helpers import fresh_etag_from_version, not_modified_response, with_etag
 from bson import ObjectId # For validating ObjectId if necessary
 
 academic_bp = Blueprint('academic_bp', __name__)
 
+# Each route projects only the fields it serves (plus the version fields for its ETag),
+# so the other endpoints' arrays are never loaded.
+CIE_PROJECTION = dict(User.VERSION_PROJECTION, **{"usn": 1, "academic_summaries.code": 1, "academic_summaries.name": 1, "academic_summaries.cieTotal": 1})
+ATTENDANCE_PROJECTION = dict(User.VERSION_PROJECTION, **{"usn": 1, "academic_summaries.code": 1, "academic_summaries.name": 1, "academic_summaries.attendancePercentage": 1})
+SEE_PROJECTION = dict(User.VERSION_PROJECTION, **{"usn": 1, "most_recent_cgpa": 1, "exam_history": 1})
+OVERVIEW_PROJECTION = dict(User.VERSION_PROJECTION, **{"usn": 1, "academic_summaries": 1, "exam_history": 1, "most_recent_cgpa": 1})
+
+def _fresh_etag(user_id, scope):
+    """ETag if the client's If-None-Match is current, checked with a version-only read."""
+    return fresh_etag_from_version(lambda: User.find_version_by_id(user_id),
+                                   lambda version_doc: User.version_etag(version_doc, scope))
+
+def _format_cie_subjects(academic_summaries):
+    return [{
+        "code": subject_summary.get("code"),
+        "name": subject_summary.get("name"),
+        "cieTotal": subject_summary.get("cieTotal")
+    } for subject_summary in academic_summaries]
+
+def _format_attendance_subjects(academic_summaries):
+    return [{
+        "code": subject_summary.get("code"),
+        "name": subject_summary.get("name"),
+        "attendancePercentage": subject_summary.get("attendancePercentage")
+    } for subject_summary in academic_summaries]
+
+def _format_see(user):
+    return {
+        "mostRecentCGPA": user.get("most_recent_cgpa"),
+        "semesters": user.get("exam_history", []) # This is the list of semester results
+    }
+
 @academic_bp.route('/results/cie', methods=['GET'])
 @jwt_required()
 def get_cie_results():
     current_user_id = get_jwt_identity()
-    user = User.find_by_id(current_user_id)
+    fresh_etag = _fresh_etag(current_user_id, "results-cie")
+    if fresh_etag:
+        return not_modified_response(fresh_etag)
+    user = User.find_by_id(current_user_id, projection=CIE_PROJECTION)
 
     if not user:
         current_app.logger.warning(f"CIE results: User not found for ID {current_user_id}")
         return jsonify({"status": "error", "message": "User not found"}), 404
 
     # academic_summaries should contain CIE and attendance data
-    cie_data = user.get("academic_summaries", [])
-    
-    # You can format this further if needed, or return as is
-    # Example: Extracting only relevant fields for CIE
-    formatted_cie_results = []
-    for subject_summary in cie_data:
-        formatted_cie_results.append({
-            "code": subject_summary.get("code"),
-            "name": subject_summary.get("name"),
-            "cieTotal": subject_summary.get("cieTotal")
-            # Add other fields if your frontend expects them for CIE display
-        })
-    
+    formatted_cie_results = _format_cie_subjects(user.get("academic_summaries", []))
+
     current_app.logger.info(f"CIE results retrieved for user {user.get('usn')}")
-    return jsonify({
+    return with_etag((jsonify({
         "status": "success",
         "data": {
-            "subjects": formatted_cie_results 
-            # Or simply: "subjects": cie_data if no specific formatting is needed
+            "subjects": formatted_cie_results
         }
-    }), 200
+    }), 200), User.version_etag(user, "results-cie"))
 
 @academic_bp.route('/results/see', methods=['GET'])
 @jwt_required()
 def get_see_results():
     current_user_id = get_jwt_identity()
-    user = User.find_by_id(current_user_id)
+    fresh_etag = _fresh_etag(current_user_id, "results-see")
+    if fresh_etag:
+        return not_modified_response(fresh_etag)
+    user = User.find_by_id(current_user_id, projection=SEE_PROJECTION)
 
     if not user:
         current_app.logger.warning(f"SEE results: User not found for ID {current_user_id}")
         return jsonify({"status": "error", "message": "User not found"}), 404
 
-    see_data = {
-        "mostRecentCGPA": user.get("most_recent_cgpa"),
-        "semesters": user.get("exam_history", []) # This is the list of semester results
-    }
-    
+    see_data = _format_see(user)
+
     current_app.logger.info(f"SEE results retrieved for user {user.get('usn')}")
-    return jsonify({"status": "success", "data": see_data}), 200
+    return with_etag((jsonify({"status": "success", "data": see_data}), 200), User.version_etag(user, "results-see"))
 
 @academic_bp.route('/attendance/summary', methods=['GET'])
 @jwt_required()
 def get_attendance_summary():
     current_user_id = get_jwt_identity()
-    user = User.find_by_id(current_user_id)
+    fresh_etag = _fresh_etag(current_user_id, "attendance-summary")
+    if fresh_etag:
+        return not_modified_response(fresh_etag)
+    user = User.find_by_id(current_user_id, projection=ATTENDANCE_PROJECTION)
 
     if not user:
         current_app.logger.warning(f"Attendance summary: User not found for ID {current_user_id}")
         return jsonify({"status": "error", "message": "User not found"}), 404
 
     # academic_summaries should contain CIE and attendance data
-    attendance_data = user.get("academic_summaries", [])
-
-    # Example: Extracting only relevant fields for attendance
-    formatted_attendance_summary = []
-    for subject_summary in attendance_data:
-        formatted_attendance_summary.append({
-            "code": subject_summary.get("code"),
-            "name": subject_summary.get("name"),
-            "attendancePercentage": subject_summary.get("attendancePercentage")
-            # Add color or other frontend-specific hints if desired
-        })
-        
+    formatted_attendance_summary = _format_attendance_subjects(user.get("academic_summaries", []))
+
     current_app.logger.info(f"Attendance summary retrieved for user {user.get('usn')}")
-    return jsonify({
+    return with_etag((jsonify({
         "status": "success",
         "data": {
             "subjects": formatted_attendance_summary
-            # Or simply: "subjects": attendance_data
         }
-    }), 200
\ No newline at end of file
+    }), 200), User.version_etag(user, "attendance-summary"))
+
+@academic_bp.route('/academics/overview', methods=['GET'])
+@jwt_required()
+def get_academic_overview():
+    """CIE, attendance, SEE and CGPA for the home screen from one projected read."""
+    current_user_id = get_jwt_identity()
+    fresh_etag = _fresh_etag(current_user_id, "academics-overview")
+    if fresh_etag:
+        return not_modified_response(fresh_etag)
+    user = User.find_by_id(current_user_id, projection=OVERVIEW_PROJECTION)
+
+    if not user:
+        current_app.logger.warning(f"Academic overview: User not found for ID {current_user_id}")
+        return jsonify({"status": "error", "message": "User not found"}), 404
+
+    academic_summaries = user.get("academic_summaries", [])
+    overview = {
+        "cie": {"subjects": _format_cie_subjects(academic_summaries)},
+        "attendance": {"subjects": _format_attendance_subjects(academic_summaries)},
+        "see": _format_see(user),
+        "cgpa": user.get("most_recent_cgpa"),
+        "collegeDataLastUpdated": user.get("college_data_last_updated")
+    }
+    current_app.logger.info(f"Academic overview retrieved for user {user.get('usn')}")
+    return with_etag((jsonify({"status": "success", "data": overview}), 200), User.version_etag(user, "academics-overview"))
@@ -53,17 +53,11 @@ def login_student():
         return jsonify({"status": "fail", "message": final_message, "debug_details": error_messages}), status_code
 
     current_app.logger.info(f"Scraping successful for USN {usn}. Name: {scraped_college_data.get('studentProfile',{}).get('name')}")
-    app_user = User.find_by_usn(usn)
 
     try:
-        if app_user:
-            current_app.logger.info(f"Updating existing user in DB: {usn}")
-            updated_user_doc = User.update_user_with_scraped_data(app_user['_id'], scraped_college_data)
-            app_user = updated_user_doc
-        else:
-            current_app.logger.info(f"Creating new user in DB: {usn}")
-            new_user_doc = User.create_user_from_scraped_data(scraped_college_data, usn) 
-            app_user = new_user_doc
+        # Single diff-aware upsert: heavy arrays are only rewritten when the scraped content changed
+        app_user = User.upsert_from_scraped_data(scraped_college_data, usn)
+        current_app.logger.info(f"User record synced for USN {usn}")
     except ValueError as ve:
         current_app.logger.error(f"Database ValueError for {usn}: {str(ve)}")
         return jsonify({"status":"error", "message": f"Database error: {str(ve)}"}), 409
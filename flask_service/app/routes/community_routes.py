@@ -6,9 +6,22 @@ from app.models.post import Post
 from app.models.comment import Comment
 from bson import ObjectId, errors as bson_errors
 from app.services.file_handler import save_base64_image # Ensure this service exists
+from app.services.home_feed import FEED_SORTS, get_home_feed
+from app.services.response_cache import cache_key, cached_payload
 
 community_bp = Blueprint('community_bp', __name__)
 
+# The GET routes below cache the anonymous view of their payload (app/services/response_cache.py)
+# and overlay the caller's is_member / user_vote afterwards with one small query.
+
+def _overlay_membership(communities, current_user_id_str):
+    member_ids = Community.member_community_ids([c["id"] for c in communities], current_user_id_str)
+    return [dict(c, is_member=c["id"] in member_ids) for c in communities]
+
+def _overlay_votes(posts, current_user_id_str):
+    votes = Post.user_votes_for_posts([p["id"] for p in posts], current_user_id_str)
+    return [dict(p, user_vote=votes.get(p["id"])) for p in posts]
+
 # === Community Management Routes ===
 
 @community_bp.route('/communities', methods=['POST'])
@@ -24,7 +37,7 @@ def create_community_route():
 
     if icon_url_for_db and isinstance(icon_url_for_db, str) and icon_url_for_db.startswith('data:image'):
         try:
-            icon_url_for_db = save_base64_image(icon_url_for_db, 'community_icons', "cicon_new")
+            icon_url_for_db = save_base64_image(icon_url_for_db, 'community_icon')
         except Exception as e:
             current_app.logger.error(f"Icon processing error during community creation: {e}", exc_info=True)
             return jsonify({"status": "error", "message": f"Icon processing error: {str(e)}"}), 400
@@ -34,7 +47,7 @@ def create_community_route():
 
     if banner_url_for_db and isinstance(banner_url_for_db, str) and banner_url_for_db.startswith('data:image'):
         try:
-            banner_url_for_db = save_base64_image(banner_url_for_db, 'community_banners', "cbanner_new")
+            banner_url_for_db = save_base64_image(banner_url_for_db, 'community_banner')
         except Exception as e:
             current_app.logger.error(f"Banner processing error during community creation: {e}", exc_info=True)
             return jsonify({"status": "error", "message": f"Banner processing error: {str(e)}"}), 400
@@ -77,7 +90,7 @@ def update_community_route(community_id):
         icon_data = data['icon']
         if icon_data and isinstance(icon_data, str) and icon_data.startswith('data:image'):
             try:
-                icon_public_url = save_base64_image(icon_data, 'community_icons', f"cicon_{community_id}")
+                icon_public_url = save_base64_image(icon_data, 'community_icon')
                 update_payload_for_model['iconUrl'] = icon_public_url
             except Exception as e:
                 current_app.logger.error(f"Icon processing error for community {community_id}: {e}", exc_info=True)
@@ -92,7 +105,7 @@ def update_community_route(community_id):
         banner_data = data['bannerImage']
         if banner_data and isinstance(banner_data, str) and banner_data.startswith('data:image'):
             try:
-                banner_public_url = save_base64_image(banner_data, 'community_banners', f"cbanner_{community_id}")
+                banner_public_url = save_base64_image(banner_data, 'community_banner')
                 update_payload_for_model['bannerImage'] = banner_public_url
             except Exception as e:
                 current_app.logger.error(f"Banner processing error for community {community_id}: {e}", exc_info=True)
@@ -130,17 +143,25 @@ def get_communities_route():
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('limit', 10, type=int)
-        search_query = request.args.get('searchQuery', type=str)
-        result = Community.get_all_communities(page=page, per_page=per_page, search_query=search_query, current_user_id_str=current_user_id_str)
-        # Ensure pagination is consistently named, e.g., result['pagination'] if that's what get_all_communities returns
-        pagination_data = result.get('pagination', {
-            "totalItems": result.get('total', 0),
-            "totalPages": result.get('pages', 0),
-            "currentPage": result.get('page', 1),
-            "perPage": result.get('per_page', 10)
-        })
-        return jsonify({"status": "success", "data": result.get('communities', []), "results": result.get('total', 0),
-                        "pagination": pagination_data}), 200
+        search_query = (request.args.get('searchQuery', type=str) or '').strip().lower() or None # Search is case-insensitive
+
+        def build_payload():
+            result = Community.get_all_communities(page=page, per_page=per_page, search_query=search_query, current_user_id_str=None)
+            # Ensure pagination is consistently named, e.g., result['pagination'] if that's what get_all_communities returns
+            pagination_data = result.get('pagination', {
+                "totalItems": result.get('total', 0),
+                "totalPages": result.get('pages', 0),
+                "currentPage": result.get('page', 1),
+                "perPage": result.get('per_page', 10)
+            })
+            return {"status": "success", "data": result.get('communities', []), "results": result.get('total', 0),
+                    "pagination": pagination_data}
+
+        payload, _ = cached_payload(cache_key('communities', page=page, limit=per_page, q=search_query), build_payload,
+                                    lambda p: ["communities"] + [f"community:{c['id']}" for c in p["data"]])
+        if current_user_id_str:
+            payload = dict(payload, data=_overlay_membership(payload["data"], current_user_id_str))
+        return jsonify(payload), 200
     except Exception as e:
         current_app.logger.error(f"Error listing communities: {e}", exc_info=True)
         return jsonify({"status": "error", "message": "Failed to list communities."}), 500
@@ -154,8 +175,12 @@ def get_community_detail_route(community_id_or_slug):
         current_user_id_str = str(user_identity) if user_identity else None
     except Exception: pass
     try:
-        community_dict = Community.find_by_id_or_slug(community_id_or_slug, current_user_id_str)
+        community_dict, _ = cached_payload(cache_key('community', ref=community_id_or_slug),
+                                           lambda: Community.find_by_id_or_slug(community_id_or_slug, current_user_id_str=None),
+                                           lambda c: [f"community:{c['id']}"])
         if not community_dict: return jsonify({"status": "fail", "message": "Community not found."}), 404
+        if current_user_id_str:
+            community_dict = dict(community_dict, is_member=Community.is_user_member(str(community_dict["id"]), current_user_id_str))
         return jsonify({"status": "success", "data": {"community": community_dict}}), 200
     except Exception as e:
         current_app.logger.error(f"Error getting community detail {community_id_or_slug}: {e}", exc_info=True)
@@ -224,7 +249,7 @@ def create_post_in_community_route(community_id_from_url):
 
     if image_base64 and isinstance(image_base64, str) and image_base64.startswith('data:image'):
         try:
-            image_url_for_db = save_base64_image(image_base64, 'post_images', f"postimg_{community_id_from_url}_new")
+            image_url_for_db = save_base64_image(image_base64, 'post_image')
         except Exception as e:
             current_app.logger.error(f"Post image processing error during post creation: {e}", exc_info=True)
             return jsonify({"status": "error", "message": f"Post image processing error: {str(e)}"}), 400
@@ -268,25 +293,57 @@ def get_posts_for_community_route(community_id):
         elif per_page > 50: per_page = 50
         if sort_by not in ['new', 'hot', 'top']: sort_by = 'new'
 
-        result = Post.get_posts_for_community_for_user(
-            community_id_str=community_id, current_user_id_str=current_user_id_str,
-            page=page, per_page=per_page, sort_by=sort_by
-        )
-        pagination_data = result.get('pagination', {
-            "totalItems": result.get('total',0), 
-            "totalPages": result.get('pages',0),
-            "currentPage": result.get('page',1), 
-            "perPage": result.get('per_page',10), 
-            "sortBy": sort_by
-        })
-        return jsonify({"status": "success", "data": result.get('posts',[]), "results": result.get('total',0),
-                        "pagination": pagination_data }), 200
+        def build_payload():
+            result = Post.get_posts_for_community_for_user(
+                community_id_str=community_id, current_user_id_str=None,
+                page=page, per_page=per_page, sort_by=sort_by
+            )
+            pagination_data = result.get('pagination', {
+                "totalItems": result.get('total',0), 
+                "totalPages": result.get('pages',0),
+                "currentPage": result.get('page',1), 
+                "perPage": result.get('per_page',10), 
+                "sortBy": sort_by
+            })
+            return {"status": "success", "data": result.get('posts',[]), "results": result.get('total',0),
+                    "pagination": pagination_data }
+
+        payload, _ = cached_payload(cache_key('community-posts', community=community_id, page=page, limit=per_page, sort=sort_by),
+                                    build_payload,
+                                    lambda p: [f"community:{ObjectId(community_id)}"] + [f"post:{post['id']}" for post in p["data"]]
+                                                + [f"user:{post['author']['id']}" for post in p["data"]])
+        if current_user_id_str:
+            payload = dict(payload, data=_overlay_votes(payload["data"], current_user_id_str))
+        return jsonify(payload), 200
     except ValueError as ve:
         return jsonify({"status": "fail", "message": str(ve)}), 404
     except Exception as e:
         current_app.logger.error(f"Error getting posts for C:{community_id}: {e}", exc_info=True)
         return jsonify({"status": "error", "message": "Failed to get posts."}), 500
 
+@community_bp.route('/feed', methods=['GET'])
+@jwt_required()
+def get_home_feed_route():
+    current_user_id = get_jwt_identity()
+    per_page = request.args.get('limit', 20, type=int)
+    sort_by = request.args.get('sortBy', 'new', type=str).lower()
+    cursor = request.args.get('cursor')
+
+    if per_page < 1: per_page = 1
+    elif per_page > 50: per_page = 50
+    if sort_by not in FEED_SORTS: sort_by = 'new'
+
+    try:
+        result = get_home_feed(current_user_id, sort_by=sort_by, cursor=cursor, limit=per_page)
+    except ValueError as ve:
+        return jsonify({"status": "fail", "message": str(ve)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error building home feed for U:{current_user_id}: {e}", exc_info=True)
+        return jsonify({"status": "error", "message": "Failed to get feed."}), 500
+    return jsonify({"status": "success", "data": result["posts"], "results": len(result["posts"]),
+                    "pagination": {"nextCursor": result["next_cursor"], "hasMore": result["next_cursor"] is not None,
+                                   "perPage": per_page, "sortBy": sort_by}}), 200
+
 @community_bp.route('/posts/<string:post_id>', methods=['GET'])
 @jwt_required(optional=True)
 def get_post_detail_route(post_id):
@@ -322,7 +379,7 @@ def update_post_route(post_id):
         image_data_base64 = data['image_base64']
         if image_data_base64 and isinstance(image_data_base64, str) and image_data_base64.startswith('data:image'):
             try:
-                image_public_url = save_base64_image(image_data_base64, 'post_images', f"postimg_{post_id}")
+                image_public_url = save_base64_image(image_data_base64, 'post_image')
                 update_payload['image_url'] = image_public_url
             except Exception as e:
                 current_app.logger.error(f"Post image processing error for post {post_id}: {e}", exc_info=True)
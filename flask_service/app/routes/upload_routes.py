@@ -0,0 +1,85 @@
+# flask_service/app/routes/upload_routes.py
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from werkzeug.exceptions import RequestEntityTooLarge
+from app.services.file_handler import (UPLOAD_KINDS, complete_direct_upload, presign_direct_upload,
+                                       save_image_stream, save_multipart_image)
+
+upload_bp = Blueprint('upload_bp', __name__)
+
+# Images are uploaded here first and the returned URL is sent to the JSON endpoints
+# (community icon/bannerImage, post image_url), instead of a base64 data URI in the JSON body.
+# Accepts multipart/form-data with a "file" part, or the raw image bytes as the body.
+# With object storage, clients can skip sending the bytes through here: presign, PUT to the
+# bucket, then complete (see presign_direct_upload in app/services/file_handler.py).
+
+def _unknown_kind():
+    return jsonify({"status": "fail", "message": f"Unknown upload kind. Use one of: {', '.join(sorted(UPLOAD_KINDS))}."}), 404
+
+@upload_bp.route('/uploads/<string:kind>', methods=['POST'])
+@jwt_required()
+def upload_image_route(kind):
+    if kind not in UPLOAD_KINDS:
+        return _unknown_kind()
+    max_bytes = current_app.config['UPLOAD_MAX_IMAGE_BYTES']
+    if request.content_length is not None and request.content_length > max_bytes + 64 * 1024: # Room for multipart framing
+        return jsonify({"status": "fail", "message": f"Image exceeds the {max_bytes // (1024 * 1024)} MB upload limit."}), 413
+
+    try:
+        if request.mimetype == 'multipart/form-data':
+            upload = save_multipart_image(request.stream, request.mimetype, request.mimetype_params, request.content_length,
+                                          kind, max_bytes)
+        elif request.mimetype.startswith('image/') or request.mimetype == 'application/octet-stream':
+            upload = save_image_stream(request.stream, kind, max_bytes)
+        else:
+            return jsonify({"status": "fail", "message": "Send multipart/form-data with a 'file' part, or the raw image bytes."}), 415
+    except RequestEntityTooLarge as e:
+        return jsonify({"status": "fail", "message": e.description}), 413
+    except ValueError as ve:
+        return jsonify({"status": "fail", "message": str(ve)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Upload of {kind} by user {get_jwt_identity()} failed: {e}", exc_info=True)
+        return jsonify({"status": "error", "message": "Could not store the upload due to an internal server error."}), 500
+
+    return jsonify({"status": "success", "data": upload}), 201
+
+@upload_bp.route('/uploads/<string:kind>/presign', methods=['POST'])
+@jwt_required()
+def presign_upload_route(kind):
+    """Body: {"sha256": hex digest of the bytes, "contentType": "image/png", "size": bytes}."""
+    if kind not in UPLOAD_KINDS:
+        return _unknown_kind()
+    data = request.get_json(silent=True) or {}
+    try:
+        result = presign_direct_upload(kind, data.get("sha256"), data.get("contentType"), data.get("size"),
+                                       current_app.config['UPLOAD_MAX_IMAGE_BYTES'])
+    except RequestEntityTooLarge as e:
+        return jsonify({"status": "fail", "message": e.description}), 413
+    except ValueError as ve:
+        return jsonify({"status": "fail", "message": str(ve)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Presigning {kind} upload for user {get_jwt_identity()} failed: {e}", exc_info=True)
+        return jsonify({"status": "error", "message": "Could not prepare the upload due to an internal server error."}), 500
+    # 200 with data.upload when the bytes are already stored; otherwise PUT them to data.target, then complete
+    return jsonify({"status": "success", "data": result}), 200
+
+@upload_bp.route('/uploads/<string:kind>/complete', methods=['POST'])
+@jwt_required()
+def complete_upload_route(kind):
+    """Body: {"sha256", "contentType"} as sent to /presign, after the PUT succeeded."""
+    if kind not in UPLOAD_KINDS:
+        return _unknown_kind()
+    data = request.get_json(silent=True) or {}
+    try:
+        upload = complete_direct_upload(kind, data.get("sha256"), data.get("contentType"),
+                                        current_app.config['UPLOAD_MAX_IMAGE_BYTES'])
+    except LookupError as le:
+        return jsonify({"status": "fail", "message": str(le)}), 404
+    except RequestEntityTooLarge as e:
+        return jsonify({"status": "fail", "message": e.description}), 413
+    except ValueError as ve:
+        return jsonify({"status": "fail", "message": str(ve)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Completing {kind} upload for user {get_jwt_identity()} failed: {e}", exc_info=True)
+        return jsonify({"status": "error", "message": "Could not store the upload due to an internal server error."}), 500
+    return jsonify({"status": "success", "data": upload}), 201
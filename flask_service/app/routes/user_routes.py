@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify, current_app
 from app.models.user import User
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson import ObjectId
+from app.utils.helpers import fresh_etag_from_version, not_modified_response, with_etag
 
 user_bp = Blueprint('user_bp', __name__)
 
@@ -12,17 +13,23 @@ def get_current_user():
     if not ObjectId.is_valid(current_user_id):
         current_app.logger.warning(f"/me GET: Invalid user ID format in token: {current_user_id}")
         return jsonify({"status": "error", "message": "Invalid user ID format in token"}), 400
-        
+
+    # If-None-Match still current? Answer 304 from a version-only read, without loading the profile.
+    fresh_etag = fresh_etag_from_version(lambda: User.find_version_by_id(current_user_id),
+                                         lambda version_doc: User.version_etag(version_doc, "users-me"))
+    if fresh_etag:
+        return not_modified_response(fresh_etag)
+
     user_doc = User.find_by_id(current_user_id)
     if not user_doc:
         current_app.logger.warning(f"/me GET: User not found for ID: {current_user_id}")
         return jsonify({"status": "error", "message": "User not found"}), 404
     
     current_app.logger.info(f"/me GET: Successfully retrieved profile for user ID: {current_user_id}")
-    return jsonify({
+    return with_etag((jsonify({
         "status": "success",
         "data": {"user": User.to_dict(user_doc)}
-    }), 200
+    }), 200), User.version_etag(user_doc, "users-me"))
 
 @user_bp.route('/me', methods=['PUT'])
 @jwt_required()
@@ -0,0 +1,132 @@
+# app/services/author_fanout.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from flask import current_app
+
+from app import mongo
+from app.models.user import User
+from app.services.job_queue import enqueue, register_job_handler
+from app.services.response_cache import invalidate_user
+
+# Posts and comments carry a denormalized `author_snapshot` (name, USN, avatar).
+# When a user's name or avatar changes, this fan-out rewrites the snapshot on all of
+# their posts and comments in batched update_many calls, off the request thread.
+# Progress is tracked in `author_fanout_jobs` (one document per author). Runs are
+# idempotent: each batch selects only documents whose snapshot still differs, so a
+# retry or a re-run resumes where the previous attempt stopped. Each rewritten post also gets a
+# new content_updated_at, so a serialization cached from its old snapshot can no longer be served.
+
+FANOUT_COLLECTIONS = ("posts", "comments")
+
+
+def _jobs_collection():
+    return mongo.db.author_fanout_jobs
+
+
+def _current_snapshot(user_obj_id):
+    user_doc = User.get_collection().find_one({"_id": user_obj_id}, User.AUTHOR_SNAPSHOT_PROJECTION)
+    return User.author_snapshot(user_doc) if user_doc else None
+
+
+def run_author_fanout(user_id, batch_size=None):
+    """
+    Copies the user's current snapshot onto their posts and comments and returns the
+    job document, or None when nothing was stale. Stops early (status "superseded")
+    if the profile changes again mid-run; the newer run finishes the job.
+    """
+    user_obj_id = ObjectId(user_id)
+    batch_size = batch_size or current_app.config['AUTHOR_FANOUT_BATCH_SIZE']
+    snapshot = _current_snapshot(user_obj_id)
+    if snapshot is None:
+        return None
+    stale_query = {"author_id": user_obj_id, "author_snapshot": {"$ne": snapshot}}
+    if not any(mongo.db[name].find_one(stale_query, {"_id": 1}) for name in FANOUT_COLLECTIONS):
+        return None # Common for scrapes that did not change the name
+
+    jobs = _jobs_collection()
+    jobs.update_one(
+        {"_id": user_obj_id},
+        {"$set": {"snapshot": snapshot, "status": "running", "started_at": datetime.utcnow(),
+                  "finished_at": None, "error": None, "progress": {name: 0 for name in FANOUT_COLLECTIONS}},
+         "$inc": {"attempts": 1}},
+        upsert=True
+    )
+    for name in FANOUT_COLLECTIONS:
+        collection = mongo.db[name]
+        while True:
+            if _current_snapshot(user_obj_id) != snapshot:
+                jobs.update_one({"_id": user_obj_id}, {"$set": {"status": "superseded", "finished_at": datetime.utcnow()}})
+                return jobs.find_one({"_id": user_obj_id})
+            batch_ids = [doc["_id"] for doc in collection.find(stale_query, {"_id": 1}).sort("_id", 1).limit(batch_size)]
+            if not batch_ids:
+                break
+            rewrite = {"author_snapshot": snapshot}
+            if name == "posts":
+                rewrite["content_updated_at"] = datetime.now(timezone.utc) # New version of the cached serialization
+            result = collection.update_many({"_id": {"$in": batch_ids}, "author_id": user_obj_id}, {"$set": rewrite})
+            jobs.update_one({"_id": user_obj_id}, {"$inc": {f"progress.{name}": result.modified_count}})
+            invalidate_user(user_id) # Cached pages embed the snapshots this batch replaced
+
+    jobs.update_one({"_id": user_obj_id}, {"$set": {"status": "done", "finished_at": datetime.utcnow()}})
+    current_app.logger.info(f"Author fan-out finished for user {user_id}")
+    return jobs.find_one({"_id": user_obj_id})
+
+
+def _run_with_retries(app, user_id):
+    with app.app_context():
+        max_attempts = app.config['AUTHOR_FANOUT_MAX_ATTEMPTS']
+        for attempt in range(1, max_attempts + 1):
+            try:
+                return run_author_fanout(user_id)
+            except Exception as e:
+                app.logger.warning(f"Author fan-out attempt {attempt}/{max_attempts} failed for user {user_id}: {e}")
+                _jobs_collection().update_one({"_id": ObjectId(user_id)},
+                                              {"$set": {"status": "failed" if attempt == max_attempts else "retrying",
+                                                        "error": str(e)}})
+                if attempt < max_attempts:
+                    time.sleep(app.config['AUTHOR_FANOUT_RETRY_BASE_SECONDS'] * 2 ** (attempt - 1))
+        return None
+
+
+_fanout_pool = None
+_fanout_pool_lock = threading.Lock()
+
+
+def schedule_author_fanout(user_id):
+    """
+    Runs the fan-out for `user_id` on a small background pool and returns the Future, or
+    queues it for `flask worker` with JOB_QUEUE_ENABLED and returns the job id.
+    """
+    global _fanout_pool
+    if current_app.config.get('JOB_QUEUE_ENABLED'):
+        # Queued repeats collapse: the run reads the snapshot current when it starts
+        return enqueue("author-fanout", {"user_id": str(user_id)}, dedupe_key=f"author-fanout:{user_id}")
+    if _fanout_pool is None:
+        with _fanout_pool_lock:
+            if _fanout_pool is None:
+                _fanout_pool = ThreadPoolExecutor(max_workers=current_app.config['AUTHOR_FANOUT_WORKERS'],
+                                                  thread_name_prefix='author-fanout')
+    return _fanout_pool.submit(_run_with_retries, current_app._get_current_object(), str(user_id))
+
+
+def _fanout_job(payload):
+    try:
+        return run_author_fanout(payload["user_id"])
+    except Exception as e:
+        _jobs_collection().update_one({"_id": ObjectId(payload["user_id"])}, {"$set": {"status": "retrying", "error": str(e)}})
+        raise # The job queue retries with backoff
+
+
+def _fanout_job_failed(payload, error):
+    _jobs_collection().update_one({"_id": ObjectId(payload["user_id"])}, {"$set": {"status": "failed", "error": error}})
+
+
+register_job_handler("author-fanout", _fanout_job, concurrency=2, priority=5, on_failure=_fanout_job_failed)
+
+
+def get_fanout_status(user_id):
+    return _jobs_collection().find_one({"_id": ObjectId(user_id)})
@@ -1,22 +1,52 @@
 # app/services/college_portal_scraper.py
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import re
 import json
 import ast
 from urllib.parse import urljoin
 from app.config import Config # Import Config to access URLs
+from app.services.portal_transport import portal_session, settle_page_fetches, submit_page_fetch
 import warnings
 
 # Suppress InsecureRequestWarning:
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 warnings.simplefilter('ignore', InsecureRequestWarning)
 
-# --- PARSING HELPER FUNCTIONS (UNCHANGED, assumed to be working if HTML structure is consistent) ---
-# _extract_basic_student_info, _extract_dashboard_subject_summaries, _extract_exam_history
-# (Your existing parsing functions go here)
+# --- PRECOMPILED PATTERNS ---
+# Compiled once at import time instead of on every call / every <script> tag.
+SEM_RE = re.compile(r'SEM\s*(\d+)', re.IGNORECASE)
+SEC_RE = re.compile(r'SEC\s*([A-Z])', re.IGNORECASE)
+CHART_COLUMNS_RE = re.compile(r'columns:\s*(\[[\s\S]*?\])\s*,?\s*(?:type|padding|radius|bindto|gauge|size)', re.IGNORECASE)
+SEM_NAME_RE = re.compile(r'^(.*?)\s+Credits Registered', re.IGNORECASE)
+CREDITS_REGISTERED_RE = re.compile(r'Credits Registered\s*:\s*(\d+)', re.IGNORECASE)
+CREDITS_EARNED_RE = re.compile(r'Credits Earned\s*:\s*(\d+)', re.IGNORECASE)
+SGPA_RE = re.compile(r'SGPA\s*:\s*([\d.]+)', re.IGNORECASE)
+CGPA_RE = re.compile(r'CGPA\s*:\s*(?:CGPA\s*:\s*)?([\d.]+)', re.IGNORECASE)
+JOOMLA_TOKEN_NAME_RE = re.compile(r'^[a-f0-9]{32}$')
+
+CIE_CHART_MARKERS = ('bindto: "#barPadding"', 'type: "bar"')
+ATTENDANCE_CHART_MARKERS = ('bindto: "#gaugeTypeMulti"', 'type: "gauge"')
+
+# Targeted strainers: only these parts of the page are turned into a tree.
+LOGIN_FORM_STRAINER = SoupStrainer(['form', 'input'])
+EXAM_HISTORY_STRAINER = SoupStrainer('div', class_='result-table')
+
+
+def _make_soup(html_or_soup, parse_only=None):
+    """
+    Returns a BeautifulSoup tree for raw HTML, or the tree itself if one was
+    already built, so the dashboard page is only parsed once per login.
+    """
+    if isinstance(html_or_soup, BeautifulSoup):
+        return html_or_soup
+    return BeautifulSoup(html_or_soup, 'lxml', parse_only=parse_only)
+
+
+# --- PARSING HELPER FUNCTIONS ---
+# Each extractor accepts raw HTML or an already-parsed tree (see _make_soup).
 def _extract_basic_student_info(dashboard_html_content):
-    soup = BeautifulSoup(dashboard_html_content, 'lxml')
+    soup = _make_soup(dashboard_html_content)
     student_info = {
         "name": None, "usn": None, "semester": None,
         "section": None, "department": "Unknown"
@@ -35,11 +65,11 @@ def _extract_basic_student_info(dashboard_html_content):
         sem_dept_sec_tag = soup.select_one('.cn-stu-data1 p')
         if sem_dept_sec_tag:
             sem_dept_sec_raw = sem_dept_sec_tag.text.strip()
-            sem_match = re.search(r'SEM\s*(\d+)', sem_dept_sec_raw, re.IGNORECASE)
+            sem_match = SEM_RE.search(sem_dept_sec_raw)
             if sem_match:
                 student_info["semester"] = int(sem_match.group(1))
             
-            sec_match = re.search(r'SEC\s*([A-Z])', sem_dept_sec_raw, re.IGNORECASE)
+            sec_match = SEC_RE.search(sem_dept_sec_raw)
             if sec_match:
                 student_info["section"] = sec_match.group(1)
 
@@ -58,7 +88,7 @@ def _extract_basic_student_info(dashboard_html_content):
 
 
 def _extract_dashboard_subject_summaries(dashboard_html_content):
-    soup = BeautifulSoup(dashboard_html_content, 'lxml')
+    soup = _make_soup(dashboard_html_content)
     results = {}
     course_name_map = {}
     error_messages = []
@@ -93,39 +123,41 @@ def _extract_dashboard_subject_summaries(dashboard_html_content):
             if not script_content:
                 continue
 
-            columns_content_regex = re.compile(r'columns:\s*(\[[\s\S]*?\])\s*,?\s*(?:type|padding|radius|bindto|gauge|size)', re.IGNORECASE)
-            columns_match = columns_content_regex.search(script_content)
+            # Cheap substring checks first: only CIE/attendance charts are worth
+            # running the regex and ast.literal_eval on.
+            is_cie_script = all(marker in script_content for marker in CIE_CHART_MARKERS)
+            is_attendance_script = all(marker in script_content for marker in ATTENDANCE_CHART_MARKERS)
+            if not (is_cie_script or is_attendance_script):
+                continue
+
+            columns_match = CHART_COLUMNS_RE.search(script_content)
 
             if columns_match and columns_match.group(1):
                 array_string = columns_match.group(1)
                 course_code_from_script_for_error = 'Unknown' # For error reporting
                 try:
                     data_array = ast.literal_eval(array_string) 
-                    
-                    is_cie_script = 'bindto: "#barPadding"' in script_content and 'type: "bar"' in script_content
-                    is_attendance_script = 'bindto: "#gaugeTypeMulti"' in script_content and 'type: "gauge"' in script_content
-
-                    if is_cie_script or is_attendance_script:
-                        for item in data_array:
-                            if isinstance(item, list) and len(item) == 2:
-                                course_code_from_script = str(item[0]).strip()
-                                course_code_from_script_for_error = course_code_from_script # Update for error context
-                                value = item[1]
-                                if not course_code_from_script:
-                                    continue
-                                
-                                if course_code_from_script not in results:
-                                    results[course_code_from_script] = {
-                                        "code": course_code_from_script,
-                                        "name": course_name_map.get(course_code_from_script, course_code_from_script),
-                                        "cieTotal": None,
-                                        "attendancePercentage": None
-                                    }
-                                
-                                if is_cie_script:
-                                    results[course_code_from_script]["cieTotal"] = value
-                                elif is_attendance_script:
-                                    results[course_code_from_script]["attendancePercentage"] = value
+
+                    for item in data_array:
+                        if isinstance(item, list) and len(item) == 2:
+                            course_code_from_script = str(item[0]).strip()
+                            course_code_from_script_for_error = course_code_from_script # Update for error context
+                            value = item[1]
+                            if not course_code_from_script:
+                                continue
+                            
+                            if course_code_from_script not in results:
+                                results[course_code_from_script] = {
+                                    "code": course_code_from_script,
+                                    "name": course_name_map.get(course_code_from_script, course_code_from_script),
+                                    "cieTotal": None,
+                                    "attendancePercentage": None
+                                }
+                            
+                            if is_cie_script:
+                                results[course_code_from_script]["cieTotal"] = value
+                            elif is_attendance_script:
+                                results[course_code_from_script]["attendancePercentage"] = value
                 except (SyntaxError, ValueError) as e:
                     error_messages.append(f"Chart data parse error from script (Code: {course_code_from_script_for_error}): {str(e)}")
                     pass
@@ -143,7 +175,7 @@ def _extract_dashboard_subject_summaries(dashboard_html_content):
 
 
 def _extract_exam_history(exam_history_html_content):
-    soup = BeautifulSoup(exam_history_html_content, 'lxml')
+    soup = _make_soup(exam_history_html_content, parse_only=EXAM_HISTORY_STRAINER)
     exam_history_data = {"semesters": [], "mostRecentCGPA": None}
     error_messages = []
 
@@ -155,13 +187,13 @@ def _extract_exam_history(exam_history_html_content):
             
             caption_text = caption_tag.text.strip()
             
-            sem_name_match = re.search(r'^(.*?)\s+Credits Registered', caption_text, re.IGNORECASE)
+            sem_name_match = SEM_NAME_RE.search(caption_text)
             semester_name = sem_name_match.group(1).strip() if sem_name_match else f"Semester (Unknown Name)"
 
-            cr_match = re.search(r'Credits Registered\s*:\s*(\d+)', caption_text, re.IGNORECASE)
-            ce_match = re.search(r'Credits Earned\s*:\s*(\d+)', caption_text, re.IGNORECASE)
-            sgpa_match = re.search(r'SGPA\s*:\s*([\d.]+)', caption_text, re.IGNORECASE)
-            cgpa_match = re.search(r'CGPA\s*:\s*(?:CGPA\s*:\s*)?([\d.]+)', caption_text, re.IGNORECASE)
+            cr_match = CREDITS_REGISTERED_RE.search(caption_text)
+            ce_match = CREDITS_EARNED_RE.search(caption_text)
+            sgpa_match = SGPA_RE.search(caption_text)
+            cgpa_match = CGPA_RE.search(caption_text)
 
             sem_result = {
                 "semesterName": semester_name,
@@ -178,6 +210,45 @@ def _extract_exam_history(exam_history_html_content):
         
     return exam_history_data, error_messages
 
+def parse_dashboard_html(dashboard_html_content):
+    """Parses the dashboard page once; pass the result to both dashboard extractors."""
+    return _make_soup(dashboard_html_content)
+
+
+def parse_dashboard(dashboard_html_content):
+    """
+    Single-parse dashboard pipeline. Returns (student_profile, subject_summaries, errors),
+    identical to running the two extractors on the raw HTML separately.
+    """
+    soup = parse_dashboard_html(dashboard_html_content)
+    student_profile, profile_errors = _extract_basic_student_info(soup)
+    subject_summaries, summary_errors = _extract_dashboard_subject_summaries(soup)
+    return student_profile, subject_summaries, profile_errors + summary_errors
+
+# --- POST-LOGIN PAGES ---
+# Pages fetched concurrently on the authenticated session once the login redirect
+# arrives. Adding a page (fees, timetable, ...) is one entry here plus its parser;
+# it downloads alongside the dashboard instead of adding serial latency.
+POST_LOGIN_PAGES = [
+    {
+        "output_key": "examHistory",
+        "label": "exam history",
+        "path_setting": "COLLEGE_EXAM_HISTORY_PATH", # Attribute on Config
+        "parser": _extract_exam_history,
+    },
+]
+
+PAGE_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+    'Accept-Language': 'en-GB,en;q=0.9',
+    'Connection': 'keep-alive',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'same-origin',
+    'Sec-Fetch-User': '?1',
+    'Upgrade-Insecure-Requests': '1',
+}
+
 # --- MAIN SCRAPING FUNCTION ---
 
 def scrape_and_parse_college_data(usn, dob_dd, dob_mm, dob_yyyy):
@@ -192,8 +263,8 @@ def scrape_and_parse_college_data(usn, dob_dd, dob_mm, dob_yyyy):
         "errorMessages": []
     }
 
-    with requests.Session() as session:
-        session.headers.update({'User-Agent': Config.SCRAPER_USER_AGENT})
+    # Pooled keep-alive transport shared across logins, with a cookie jar private to this login.
+    with portal_session() as session:
 
         # --- Step 0: GET login page to extract Joomla token ---
         joomla_token_name = None
@@ -209,11 +280,11 @@ def scrape_and_parse_college_data(usn, dob_dd, dob_mm, dob_yyyy):
                 }
             )
             login_page_response.raise_for_status()
-            login_page_soup = BeautifulSoup(login_page_response.text, 'lxml')
+            login_page_soup = _make_soup(login_page_response.text, parse_only=LOGIN_FORM_STRAINER)
             
             # Find the Joomla security token. It's usually a hidden input with a 32-char hex name and value "1".
             # <input type="hidden" name="abcdef1234567890abcdef1234567890" value="1">
-            token_input = login_page_soup.find('input', {'type': 'hidden', 'value': '1', 'name': re.compile(r'^[a-f0-9]{32}$')})
+            token_input = login_page_soup.find('input', {'type': 'hidden', 'value': '1', 'name': JOOMLA_TOKEN_NAME_RE})
             if token_input and token_input.get('name'):
                 joomla_token_name = token_input['name']
                 print(f"Found Joomla token name: {joomla_token_name}")
@@ -311,78 +382,68 @@ def scrape_and_parse_college_data(usn, dob_dd, dob_mm, dob_yyyy):
             else:
                 dashboard_url = urljoin(Config.COLLEGE_BASE_URL, dashboard_url_path)
             
-            print(f"Login successful, redirecting to dashboard: {dashboard_url}")
-
-            # --- Step 2: GET Dashboard Page ---
-            dashboard_headers = {
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-                'Accept-Language': 'en-GB,en;q=0.9',
-                'Cache-Control': 'max-age=0',
-                'Connection': 'keep-alive',
-                'Referer': Config.COLLEGE_LOGIN_URL, # Referer from login page or previous redirect source
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'same-origin', # was same-origin in cURL
-                'Sec-Fetch-User': '?1',
-                'Upgrade-Insecure-Requests': '1',
-            }
-            print(f"Fetching dashboard for USN: {student_usn}...")
-            dashboard_response = session.get(
-                dashboard_url,
-                headers=dashboard_headers,
-                verify=False # Bypass SSL verification
-            )
-            dashboard_response.raise_for_status() # Now we expect 200
-            dashboard_html = dashboard_response.text
+            # --- Step 2: Start the post-login page downloads ---
+            # These pages only need the authenticated cookies, not the dashboard content, so they are
+            # requested now and download while the dashboard is fetched and parsed. A login that fails
+            # the checks below still pays for their requests; whichever way this block is left, every
+            # fetch is settled before portal_session() clears the cookie jar.
+            page_fetches = []
+            try:
+                for page in POST_LOGIN_PAGES:
+                    page_url = urljoin(Config.COLLEGE_BASE_URL, getattr(Config, page["path_setting"]))
+                    page_headers = dict(PAGE_HEADERS, Referer=dashboard_url) # Referer is the dashboard URL
+                    page_fetches.append((page, page_url, submit_page_fetch(session, page_url, page_headers)))
+
+                # --- Step 3: GET Dashboard Page ---
+                dashboard_headers = {
+                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+                    'Accept-Language': 'en-GB,en;q=0.9',
+                    'Cache-Control': 'max-age=0',
+                    'Connection': 'keep-alive',
+                    'Referer': Config.COLLEGE_LOGIN_URL, # Referer from login page or previous redirect source
+                    'Sec-Fetch-Dest': 'document',
+                    'Sec-Fetch-Mode': 'navigate',
+                    'Sec-Fetch-Site': 'same-origin', # was same-origin in cURL
+                    'Sec-Fetch-User': '?1',
+                    'Upgrade-Insecure-Requests': '1',
+                }
+                dashboard_response = session.get(
+                    dashboard_url,
+                    headers=dashboard_headers,
+                    verify=False # Bypass SSL verification
+                )
+                dashboard_response.raise_for_status() # Now we expect 200
+                dashboard_html = dashboard_response.text
             
-            # Parse Dashboard
-            scraped_data_output["studentProfile"], profile_errors = _extract_basic_student_info(dashboard_html)
-            all_errors.extend(profile_errors)
+                # Parse Dashboard (one tree shared by both extractors)
+                dashboard_soup = parse_dashboard_html(dashboard_html)
+                scraped_data_output["studentProfile"], profile_errors = _extract_basic_student_info(dashboard_soup)
+                all_errors.extend(profile_errors)
             
-            if not scraped_data_output["studentProfile"].get("usn"):
-                all_errors.append("Failed to extract student USN from dashboard. Login might have been incomplete or page structure changed.")
-                # print(f"DEBUG: Dashboard HTML (first 500 chars): {dashboard_html[:500]}")
-                scraped_data_output["errorMessages"] = all_errors
-                return scraped_data_output, False 
-
-            if scraped_data_output["studentProfile"]["usn"].upper() != student_usn:
-                all_errors.append(f"USN mismatch! Login USN: {student_usn}, Dashboard USN: {scraped_data_output['studentProfile']['usn']}.")
-                scraped_data_output["errorMessages"] = all_errors
-                return scraped_data_output, False 
-
-            scraped_data_output["dashboardSummaries"], summary_errors = _extract_dashboard_subject_summaries(dashboard_html)
-            all_errors.extend(summary_errors)
-            print("Dashboard data extracted.")
+                if not scraped_data_output["studentProfile"].get("usn"):
+                    all_errors.append("Failed to extract student USN from dashboard. Login might have been incomplete or page structure changed.")
+                    # print(f"DEBUG: Dashboard HTML (first 500 chars): {dashboard_html[:500]}")
+                    scraped_data_output["errorMessages"] = all_errors
+                    return scraped_data_output, False 
 
-            # --- Step 3: GET Exam History Page ---
-            exam_history_full_url = urljoin(Config.COLLEGE_BASE_URL, Config.COLLEGE_EXAM_HISTORY_PATH)
-            
-            exam_history_headers = {
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-                'Accept-Language': 'en-GB,en;q=0.9',
-                'Connection': 'keep-alive',
-                'Referer': dashboard_url, # Referer is the dashboard URL
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'same-origin',
-                'Sec-Fetch-User': '?1',
-                'Upgrade-Insecure-Requests': '1',
-            }
-            print(f"Fetching exam history for USN: {student_usn} from {exam_history_full_url}...")
-            exam_history_response = session.get(
-                exam_history_full_url,
-                headers=exam_history_headers,
-                verify=False # Bypass SSL verification
-            )
-            
-            if exam_history_response.status_code == 200:
-                exam_history_html = exam_history_response.text
-                scraped_data_output["examHistory"], eh_errors = _extract_exam_history(exam_history_html)
-                all_errors.extend(eh_errors)
-                print("Exam history data extracted.")
-            else:
-                all_errors.append(f"Failed to fetch exam history. Status: {exam_history_response.status_code}. URL: {exam_history_full_url}")
-                print(f"Warning: Exam history fetch failed with status {exam_history_response.status_code}")
+                if scraped_data_output["studentProfile"]["usn"].upper() != student_usn:
+                    all_errors.append(f"USN mismatch! Login USN: {student_usn}, Dashboard USN: {scraped_data_output['studentProfile']['usn']}.")
+                    scraped_data_output["errorMessages"] = all_errors
+                    return scraped_data_output, False 
+
+                scraped_data_output["dashboardSummaries"], summary_errors = _extract_dashboard_subject_summaries(dashboard_soup)
+                all_errors.extend(summary_errors)
+
+                # --- Step 4: Collect the concurrently fetched pages ---
+                for page, page_url, page_future in page_fetches:
+                    page_response = page_future.result() # Re-raises RequestException from the fetch thread
+                    if page_response.status_code == 200:
+                        scraped_data_output[page["output_key"]], page_errors = page["parser"](page_response.text)
+                        all_errors.extend(page_errors)
+                    else:
+                        all_errors.append(f"Failed to fetch {page['label']}. Status: {page_response.status_code}. URL: {page_url}")
+            finally:
+                settle_page_fetches([page_future for _, _, page_future in page_fetches])
 
         except requests.exceptions.RequestException as e:
             all_errors.append(f"Network or HTTP error during scraping: {str(e)}")
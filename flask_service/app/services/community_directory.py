@@ -0,0 +1,124 @@
+# app/services/community_directory.py
+import threading
+import time
+
+from bson import ObjectId
+from flask import current_app
+
+from app.services.invalidation_bus import INVALIDATION_BUS
+
+# Cached community metadata (id <-> slug <-> name) for write paths that only need to
+# resolve a community reference. Misses read a three-field projection instead of the
+# whole document (whose `members` array grows with the community); unknown slugs are
+# cached as negatives for a short TTL. Community.update_community/create_community
+# publish 'community-meta' invalidations so every worker drops its copy.
+
+META_PROJECTION = {"_id": 1, "slug": 1, "name": 1}
+
+
+class CommunityDirectory:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id = {} # ObjectId -> (expires_at, meta)
+        self._id_by_slug = {} # slug -> (expires_at, ObjectId or None for a known-missing slug)
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def resolve(self, id_or_slug, get_collection):
+        """Returns {"id", "slug", "name"} for an ObjectId string or slug, or None if no community matches."""
+        if not id_or_slug:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._id_by_slug.get(id_or_slug)
+            if entry and entry[0] > now and entry[1] is None:
+                self.negative_hits += 1
+                return None
+        if entry and entry[0] > now:
+            meta = self._cached_meta(entry[1], now)
+            if meta:
+                return meta
+
+        if ObjectId.is_valid(id_or_slug):
+            meta = self._cached_meta(ObjectId(id_or_slug), now) or \
+                self._load(get_collection, {"_id": ObjectId(id_or_slug)}, now)
+            if meta:
+                return meta
+            # Not an existing id; it may still be a 24-hex-character slug.
+        meta = self._load(get_collection, {"slug": id_or_slug}, now)
+        if meta is None:
+            self._store_negative(id_or_slug, now)
+        return meta
+
+    def _cached_meta(self, community_id, now):
+        with self._lock:
+            entry = self._by_id.get(community_id)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+        return None
+
+    def _load(self, get_collection, query, now):
+        with self._lock:
+            self.misses += 1
+        doc = get_collection().find_one(query, META_PROJECTION)
+        if not doc:
+            return None
+        meta = {"id": doc["_id"], "slug": doc.get("slug"), "name": doc.get("name")}
+        config = current_app.config
+        expires_at = now + config['COMMUNITY_META_TTL_SECONDS']
+        with self._lock:
+            if len(self._by_id) >= config['COMMUNITY_META_MAX_ENTRIES']:
+                self._by_id.clear() # Metadata is tiny and cheap to reload; a full reset keeps this simple
+                self._id_by_slug.clear()
+            self._by_id[meta["id"]] = (expires_at, meta)
+            if meta["slug"]:
+                self._id_by_slug[meta["slug"]] = (expires_at, meta["id"])
+        return meta
+
+    def _store_negative(self, slug, now):
+        config = current_app.config
+        with self._lock:
+            if len(self._id_by_slug) >= config['COMMUNITY_META_MAX_ENTRIES']:
+                self._id_by_slug.clear()
+            self._id_by_slug[slug] = (now + config['COMMUNITY_META_NEGATIVE_TTL_SECONDS'], None)
+
+    def invalidate(self, *keys):
+        """Keys are community ids and/or slugs (as strings)."""
+        with self._lock:
+            for key in keys:
+                if ObjectId.is_valid(key):
+                    entry = self._by_id.pop(ObjectId(key), None)
+                    if entry and entry[1]["slug"]:
+                        self._id_by_slug.pop(entry[1]["slug"], None)
+                self._id_by_slug.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._by_id.clear()
+            self._id_by_slug.clear()
+            self.hits = self.negative_hits = self.misses = 0
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "entries": len(self._by_id),
+                "hits": self.hits,
+                "negativeHits": self.negative_hits,
+                "misses": self.misses,
+                "hitRatio": round((self.hits + self.negative_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+
+COMMUNITY_DIRECTORY = CommunityDirectory()
+INVALIDATION_BUS.register('community-meta', COMMUNITY_DIRECTORY.invalidate)
+
+
+def invalidate_community_meta(*ids_or_slugs):
+    INVALIDATION_BUS.publish('community-meta', *ids_or_slugs)
+
+
+def get_community_directory_metrics():
+    return COMMUNITY_DIRECTORY.snapshot()
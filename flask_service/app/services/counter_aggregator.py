@@ -0,0 +1,273 @@
+# app/services/counter_aggregator.py
+import atexit
+import os
+import threading
+import time
+from datetime import timezone
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+# Optional write-behind for hot counters (post/comment votes, comment_count, reply_count)
+# and their activity timestamps. With COUNTER_AGGREGATOR_ENABLED each worker buffers
+# deltas per document and flushes them with one unordered bulk_write per collection,
+# every COUNTER_AGGREGATOR_FLUSH_SECONDS or once COUNTER_AGGREGATOR_MAX_PENDING documents
+# are buffered. Staleness is bounded: a record() that finds a delta older than
+# COUNTER_AGGREGATOR_MAX_STALENESS_SECONDS flushes inline. Timestamps are merged with
+# $max so out-of-order flushes from different workers never move them backwards.
+# The buffer is flushed on interpreter exit (gunicorn's graceful worker shutdown).
+# Disabled (the default), record() writes through immediately.
+
+
+def _as_utc(value):
+    # Models mix naive utcnow() and aware now(timezone.utc); compare them on one footing
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+class _PendingUpdate:
+    __slots__ = ("inc", "latest", "since")
+
+    def __init__(self, since):
+        self.inc = {}
+        self.latest = {}
+        self.since = since
+
+    def merge(self, inc, latest):
+        for field, delta in (inc or {}).items():
+            self.inc[field] = self.inc.get(field, 0) + delta
+        for field, value in (latest or {}).items():
+            current = self.latest.get(field)
+            if current is None or _as_utc(value) > _as_utc(current):
+                self.latest[field] = value
+
+    def as_update(self):
+        update = {}
+        inc = {field: delta for field, delta in self.inc.items() if delta}
+        if inc:
+            update["$inc"] = inc
+        if self.latest:
+            update["$max"] = dict(self.latest)
+        return update
+
+
+class CounterAggregator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock() # One flush at a time so a failed batch can be merged back in order
+        self._pending = {} # (collection name, _id) -> _PendingUpdate
+        self._oldest = None # monotonic time of the oldest buffered delta
+        self._listeners = {}
+        self._get_database = None
+        self.logger = None
+        self.enabled = False
+        self.flush_seconds = 1.0
+        self.max_pending = 1000
+        self.max_staleness = 5.0
+        self._thread = None
+        self._pid = None
+        self._stop_event = threading.Event()
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self.recorded = 0
+        self.flushes = 0
+        self.flushed_updates = 0
+        self.flush_errors = 0
+        self.max_flush_ms = 0.0
+        self.max_staleness_ms = 0.0
+
+    def configure(self, get_database, enabled=False, flush_seconds=1.0, max_pending=1000, max_staleness=5.0, logger=None):
+        self.stop()
+        self._get_database = get_database
+        self.enabled = enabled
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.max_staleness = max(max_staleness, flush_seconds)
+        self.logger = logger
+
+    def on_flush(self, collection_name, handler):
+        """Runs handler(*ids) after counters for those documents reach Mongo (write-through included)."""
+        self._listeners.setdefault(collection_name, []).append(handler)
+
+    def record(self, collection_name, doc_id, inc=None, latest=None):
+        """
+        Adds counter deltas (`inc`) and activity timestamps (`latest`, merged with $max)
+        for one document. Buffered when enabled, written immediately otherwise.
+        """
+        if not inc and not latest:
+            return
+        if not self.enabled:
+            update = _PendingUpdate(0)
+            update.merge(inc, latest)
+            self._get_database()[collection_name].update_one({"_id": doc_id}, update.as_update())
+            self._notify(collection_name, [doc_id])
+            return
+
+        self._ensure_flusher()
+        now = time.monotonic()
+        with self._lock:
+            key = (collection_name, doc_id)
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = _PendingUpdate(now)
+            pending.merge(inc, latest)
+            self.recorded += 1
+            if self._oldest is None:
+                self._oldest = now
+            needs_flush = len(self._pending) >= self.max_pending or now - self._oldest >= self.max_staleness
+        if needs_flush:
+            self.flush()
+
+    def pending(self, collection_name, doc_id):
+        """Buffered (not yet written) deltas for one document: {"inc": {...}, "latest": {...}}."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._pending.get((collection_name, doc_id))
+            return {"inc": dict(entry.inc), "latest": dict(entry.latest)} if entry else None
+
+    def flush(self):
+        """Writes every buffered delta; returns the number of documents updated. Failed batches are re-buffered."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                oldest, self._oldest = self._oldest, None
+            if not batch:
+                return 0
+            started = time.monotonic()
+            by_collection = {}
+            for (collection_name, doc_id), pending in batch.items():
+                update = pending.as_update()
+                if update:
+                    by_collection.setdefault(collection_name, []).append((doc_id, update))
+
+            written = 0
+            for collection_name, updates in by_collection.items():
+                try:
+                    self._get_database()[collection_name].bulk_write(
+                        [UpdateOne({"_id": doc_id}, update) for doc_id, update in updates], ordered=False)
+                except BulkWriteError as e:
+                    # Unordered: everything but the reported writeErrors was applied
+                    failed = [updates[error["index"]][0] for error in e.details.get("writeErrors", [])]
+                    self._requeue(collection_name, batch, failed)
+                    self.flush_errors += 1
+                    if self.logger:
+                        self.logger.warning(f"Counter flush to {collection_name}: {len(failed)} updates failed and were re-buffered")
+                    failed_ids = set(failed)
+                    applied = [doc_id for doc_id, _ in updates if doc_id not in failed_ids]
+                    written += len(applied)
+                    self._notify(collection_name, applied)
+                    continue
+                except Exception as e: # Retryable writes already retried once; keep the deltas for the next flush
+                    self._requeue(collection_name, batch, [doc_id for doc_id, _ in updates])
+                    self.flush_errors += 1
+                    if self.logger:
+                        self.logger.warning(f"Counter flush to {collection_name} failed, {len(updates)} updates re-buffered: {e}")
+                    continue
+                written += len(updates)
+                self._notify(collection_name, [doc_id for doc_id, _ in updates])
+
+            elapsed_ms = (time.monotonic() - started) * 1000
+            self.flushes += 1
+            self.flushed_updates += written
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.max_staleness_ms = max(self.max_staleness_ms, (time.monotonic() - oldest) * 1000)
+            return written
+
+    def _requeue(self, collection_name, batch, doc_ids):
+        with self._lock:
+            for doc_id in doc_ids:
+                key = (collection_name, doc_id)
+                pending, newer = batch[key], self._pending.get(key)
+                if newer is not None:
+                    pending.merge(newer.inc, newer.latest)
+                self._pending[key] = pending
+                self._oldest = pending.since if self._oldest is None else min(self._oldest, pending.since)
+
+    def _notify(self, collection_name, doc_ids):
+        for handler in self._listeners.get(collection_name, ()):
+            try:
+                handler(*doc_ids)
+            except Exception as e: # A cache hook must not lose counter writes
+                if self.logger:
+                    self.logger.warning(f"Counter flush listener for {collection_name} failed: {e}")
+
+    def _ensure_flusher(self):
+        """Starts this process's interval flusher (again after a fork, since threads do not survive it)."""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                self._pending, self._oldest = {}, None # Buffered by the parent; it flushes its own copy
+            self._pid = os.getpid()
+            self._stop_event = threading.Event()
+            self._thread = threading.Thread(target=self._flush_forever, args=(self._stop_event,),
+                                            name='counter-aggregator', daemon=True)
+            self._thread.start()
+
+    def _flush_forever(self, stop_event):
+        while not stop_event.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"Counter aggregator flush loop error: {e}")
+
+    def stop(self):
+        """Stops the flusher and writes whatever is still buffered."""
+        self._stop_event.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self._thread = None
+        if self._get_database is not None:
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            pending, oldest = len(self._pending), self._oldest
+        return {
+            "enabled": self.enabled,
+            "pendingDocuments": pending,
+            "oldestPendingMs": round((time.monotonic() - oldest) * 1000, 3) if oldest is not None else None,
+            "recorded": self.recorded,
+            "flushes": self.flushes,
+            "flushedUpdates": self.flushed_updates,
+            "flushErrors": self.flush_errors,
+            "coalescing": round(self.recorded / self.flushed_updates, 2) if self.flushed_updates else None,
+            "maxFlushMs": round(self.max_flush_ms, 3),
+            "maxStalenessMs": round(self.max_staleness_ms, 3),
+        }
+
+
+COUNTER_AGGREGATOR = CounterAggregator()
+atexit.register(COUNTER_AGGREGATOR.stop) # Graceful shutdown: gunicorn workers exit normally on SIGTERM
+
+
+def init_counter_aggregator(app):
+    from app import mongo
+    config = app.config
+    COUNTER_AGGREGATOR.configure(lambda: mongo.db,
+                                 enabled=config.get('COUNTER_AGGREGATOR_ENABLED', False),
+                                 flush_seconds=config['COUNTER_AGGREGATOR_FLUSH_SECONDS'],
+                                 max_pending=config['COUNTER_AGGREGATOR_MAX_PENDING'],
+                                 max_staleness=config['COUNTER_AGGREGATOR_MAX_STALENESS_SECONDS'],
+                                 logger=app.logger)
+
+
+def overlay_pending(collection_name, doc_id, data):
+    """Adds this worker's buffered deltas to serialized counters, so a voter sees their own vote before the flush."""
+    pending = COUNTER_AGGREGATOR.pending(collection_name, doc_id)
+    if pending:
+        for field, delta in pending["inc"].items():
+            if field in data:
+                data[field] = (data[field] or 0) + delta
+        for field, value in pending["latest"].items():
+            if field in data and (data[field] is None or _as_utc(value) > _as_utc(data[field])):
+                data[field] = value
+    return data
+
+
+def get_counter_aggregator_metrics():
+    return COUNTER_AGGREGATOR.snapshot()
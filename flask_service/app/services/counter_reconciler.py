@@ -0,0 +1,123 @@
+# app/services/counter_reconciler.py
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from flask import current_app
+
+from app import mongo
+from app.services.job_queue import enqueue, register_job_handler
+from app.services.response_cache import invalidate_post
+
+# Repairs drift in denormalized counters: a post's upvotes/downvotes/comment_count and its
+# comments' upvotes/downvotes/reply_count. Drift comes from write-behind deltas lost with a
+# killed worker (counter_aggregator.py) or partial failures. The voter arrays and the live
+# comments are the truth.
+# A counter that disagrees may also just have a delta in flight, so repair takes two looks:
+# observe() records the drifted documents, and apply() - RECONCILE_QUIET_SECONDS later, longer
+# than any flush delay - rewrites only those whose stored and true values are both unchanged,
+# with a compare-and-set on the stored values. In-flight deltas land in between and either
+# clear the drift or change the stored value, which skips the document until the next run.
+
+POST_COUNTERS = ("upvotes", "downvotes", "comment_count")
+COMMENT_COUNTERS = ("upvotes", "downvotes", "reply_count")
+
+
+def _vote_sizes():
+    return {"up": {"$size": {"$ifNull": ["$upvoted_by", []]}}, "down": {"$size": {"$ifNull": ["$downvoted_by", []]}}}
+
+
+def observe(post_id):
+    """{"posts": {id: {"stored", "actual"}}, "comments": {...}} for the post and its comments whose counters drifted."""
+    post_id = ObjectId(post_id)
+    drift = {"posts": {}, "comments": {}}
+    posts = list(mongo.db.posts.aggregate([
+        {"$match": {"_id": post_id, "deleted_at": None}},
+        {"$project": dict(_vote_sizes(), **{field: 1 for field in POST_COUNTERS})},
+    ]))
+    if not posts:
+        return drift
+    comments = list(mongo.db.comments.aggregate([
+        {"$match": {"post_id": post_id, "deleted_at": None}},
+        {"$project": dict(_vote_sizes(), parent_comment_id=1, **{field: 1 for field in COMMENT_COUNTERS})},
+    ]))
+    replies = {}
+    for comment in comments:
+        if comment.get("parent_comment_id"):
+            replies[comment["parent_comment_id"]] = replies.get(comment["parent_comment_id"], 0) + 1
+
+    def record(collection_name, doc, fields, actual):
+        stored = {field: doc.get(field, 0) for field in fields}
+        if stored != actual:
+            drift[collection_name][str(doc["_id"])] = {"stored": stored, "actual": actual}
+
+    post = posts[0]
+    record("posts", post, POST_COUNTERS, {"upvotes": post["up"], "downvotes": post["down"], "comment_count": len(comments)})
+    for comment in comments:
+        record("comments", comment, COMMENT_COUNTERS,
+               {"upvotes": comment["up"], "downvotes": comment["down"], "reply_count": replies.get(comment["_id"], 0)})
+    return drift
+
+
+def apply(post_id, observed):
+    """Rewrites counters that drifted identically in `observed` and now; returns the number of documents fixed."""
+    current = observe(post_id)
+    fixed = 0
+    for collection_name, docs in observed.items():
+        for doc_id, seen in docs.items():
+            if current[collection_name].get(doc_id) != seen:
+                continue # Settled or still moving; the next run looks again
+            result = mongo.db[collection_name].update_one(
+                {"_id": ObjectId(doc_id), **seen["stored"]}, {"$set": seen["actual"]})
+            fixed += result.modified_count
+    if fixed:
+        invalidate_post(ObjectId(post_id))
+        current_app.logger.info(f"Reconciled counters on {fixed} documents of post {post_id}")
+    return fixed
+
+
+def _has_drift(observed):
+    return any(observed.values())
+
+
+def recent_post_ids(since_seconds):
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=since_seconds)
+    query = {"deleted_at": None, "$or": [{"last_activity_at": {"$gte": cutoff}}, {"created_at": {"$gte": cutoff}}]}
+    return [doc["_id"] for doc in mongo.db.posts.find(query, {"_id": 1})]
+
+
+def reconcile_recent_posts(since_seconds, quiet_seconds=None):
+    """
+    Reconciles posts active within since_seconds. With JOB_QUEUE_ENABLED this only queues a job
+    per post and returns {"queued": n}; otherwise it observes all of them, waits quiet_seconds
+    once and applies, returning {"checked", "drifted", "fixed"}.
+    """
+    config = current_app.config
+    quiet_seconds = config['RECONCILE_QUIET_SECONDS'] if quiet_seconds is None else quiet_seconds
+    post_ids = recent_post_ids(since_seconds)
+    if config.get('JOB_QUEUE_ENABLED'):
+        for post_id in post_ids:
+            enqueue("reconcile-counters", {"post_id": str(post_id)}, dedupe_key=f"reconcile-counters:{post_id}")
+        return {"queued": len(post_ids)}
+    drifted = {}
+    for post_id in post_ids:
+        observed = observe(post_id)
+        if _has_drift(observed):
+            drifted[post_id] = observed
+    if drifted and quiet_seconds:
+        time.sleep(quiet_seconds)
+    fixed = sum(apply(post_id, observed) for post_id, observed in drifted.items())
+    return {"checked": len(post_ids), "drifted": len(drifted), "fixed": fixed}
+
+
+def _reconcile_job(payload):
+    if payload.get("observed") is None:
+        observed = observe(payload["post_id"])
+        if _has_drift(observed): # Look again once in-flight deltas have landed
+            enqueue("reconcile-counters", {"post_id": payload["post_id"], "observed": observed},
+                    delay_seconds=current_app.config['RECONCILE_QUIET_SECONDS'])
+        return
+    apply(payload["post_id"], payload["observed"])
+
+
+register_job_handler("reconcile-counters", _reconcile_job, concurrency=1, priority=-5)
@@ -1,57 +1,273 @@
 # Example: app/services/file_handler.py (or wherever save_base64_image is)
+import io
 import os
 import base64
+import hashlib
+import re
 import uuid
 from flask import current_app # To access app.config
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import FormDataParser
+from app.models.upload import Upload
+from app.services.upload_storage import IMMUTABLE_CACHE_CONTROL, get_storage
+
+try:
+    from PIL import Image
+except ImportError: # Optional: without Pillow uploads are only sniffed, not dimension-checked or resized
+    Image = None
 
 # Ensure this directory exists or is created when the app starts
 # UPLOAD_FOLDER_BASE = current_app.config['UPLOAD_FOLDER'] # This will be an absolute path on the server
 
-def save_base64_image(base64_string_with_prefix: str, subfolder_name: str, base_filename_prefix: str) -> str:
+# Upload kinds accepted by POST /api/v1/uploads/<kind> (recorded on the blob's metadata)
+UPLOAD_KINDS = ("community_icon", "community_banner", "post_image")
+
+# Uploads are content-addressed: bytes are stored once as <UPLOAD_BLOB_SUBFOLDER>/<sha[:2]>/<sha256>.<ext>
+# and tracked in the `uploads` collection (app/models/upload.py). A hash-named URL never
+# changes content, so it can be cached forever; identical uploads reuse the existing file.
+# Files written before this (<subfolder>/<prefix>_<uuid>.<ext>) are still served as they are.
+# The bytes go to the configured storage backend (app/services/upload_storage.py); with the S3
+# backend, clients can also upload directly: presign_direct_upload() then complete_direct_upload().
+
+CONTENT_TYPES = {"png": "image/png", "jpg": "image/jpeg", "gif": "image/gif", "webp": "image/webp"}
+EXTENSIONS = {content_type: extension for extension, content_type in CONTENT_TYPES.items()}
+HEADER_PROBE_BYTES = 256 * 1024 # Enough of a directly uploaded object to sniff it and read its dimensions
+SHA256_HEX = re.compile(r'^[0-9a-f]{64}$')
+
+def check_image_dimensions(fp):
+    """
+    Reads only the image header and rejects images whose pixel count or sides exceed
+    IMAGE_MAX_PIXELS / IMAGE_MAX_SIDE (decompression bombs) before anything decodes them.
+    Returns (width, height), or None when Pillow is not installed.
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(fp) as img:
+            width, height = img.size
+    except Image.DecompressionBombError:
+        raise ValueError("Image dimensions are too large.")
+    except (OSError, SyntaxError):
+        raise ValueError("Upload is not a readable image.")
+    if width * height > current_app.config['IMAGE_MAX_PIXELS'] or max(width, height) > current_app.config['IMAGE_MAX_SIDE']:
+        raise ValueError(f"Image dimensions {width}x{height} are too large.")
+    return width, height
+
+def sniff_image_extension(head: bytes):
+    """File extension from the image's magic bytes (never trust the declared type), or None."""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+def blob_key(sha256: str, file_extension: str) -> str:
+    return f"{current_app.config['UPLOAD_BLOB_SUBFOLDER']}/{sha256[:2]}/{sha256}.{file_extension}"
+
+def _store_blob(sha256, file_extension, size, kind, place_object):
+    """
+    Records the blob and makes sure its object exists; place_object(storage, key) writes or moves
+    the bytes there and is skipped when an identical upload is already stored. Direct uploads
+    pass None: their object is already in place.
+    """
+    storage = get_storage()
+    key = blob_key(sha256, file_extension)
+    public_url = storage.url(key)
+    deduplicated = Upload.record_upload(sha256, key, public_url, size, file_extension, kind)
+    # New records always write: the orphan sweeper deletes a blob's record before its object and skips
+    # objects whose record has reappeared. Otherwise only when the object is missing, e.g. a concurrent
+    # first upload is still moving it
+    if place_object is not None and (not deduplicated or not storage.exists(key)):
+        place_object(storage, key)
+    current_app.logger.info(f"Stored {kind} upload {key} ({size} bytes, deduplicated={deduplicated})")
+    return {"url": public_url, "size": size, "format": file_extension, "sha256": sha256, "deduplicated": deduplicated}
+
+def save_base64_image(base64_string_with_prefix: str, kind: str) -> str:
     """
-    Saves a base64 encoded image to the specified subfolder within UPLOAD_FOLDER
-    and returns the full public HTTPS URL.
+    Saves a base64 encoded image in the content-addressed store and returns the full public HTTPS URL.
+    Kept as a fallback for clients that still embed images in JSON; new clients
+    upload with POST /api/v1/uploads/<kind> and send the returned URL instead.
     """
     if not base64_string_with_prefix or not base64_string_with_prefix.startswith('data:image'):
         raise ValueError("Invalid base64 image string")
 
     header, encoded_data = base64_string_with_prefix.split(',', 1)
     image_data = base64.b64decode(encoded_data)
-    
-    # Determine file extension
-    # e.g., 'data:image/png;base64' -> 'png'
+    file_extension = sniff_image_extension(image_data[:16])
+    if not file_extension:
+        raise ValueError("Image is not a PNG, JPEG, GIF or WebP image.")
+    check_image_dimensions(io.BytesIO(image_data))
+
+    def write_object(storage, key):
+        storage.put_bytes(key, image_data, CONTENT_TYPES[file_extension], IMMUTABLE_CACHE_CONTROL)
+
+    return _store_blob(hashlib.sha256(image_data).hexdigest(), file_extension, len(image_data), kind, write_object)["url"]
+
+
+class _UploadSpool(io.FileIO):
+    """
+    Temporary upload file that enforces the size limit as chunks arrive, hashes them
+    for the content address, and keeps the leading bytes for sniffing.
+    """
+
+    HEAD_BYTES = 16
+
+    def __init__(self, path, max_bytes):
+        super().__init__(path, 'w+')
+        self.max_bytes = max_bytes
+        self.bytes_written = 0
+        self.head = b""
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        if self.bytes_written > self.max_bytes:
+            raise RequestEntityTooLarge(f"Image exceeds the {self.max_bytes // (1024 * 1024)} MB upload limit.")
+        if len(self.head) < self.HEAD_BYTES:
+            self.head += bytes(data[:self.HEAD_BYTES - len(self.head)])
+        self.sha256.update(data)
+        return super().write(data)
+
+
+def _open_spool(max_bytes):
+    # Local storage spools inside the blob root so the final move is a same-filesystem rename
+    target_dir = get_storage().spool_dir(current_app.config['UPLOAD_BLOB_SUBFOLDER'])
+    return _UploadSpool(os.path.join(target_dir, f".upload-{uuid.uuid4().hex}.part"), max_bytes)
+
+def _discard(spool):
+    spool.close()
+    try:
+        os.remove(spool.name)
+    except FileNotFoundError:
+        pass
+
+def _finalize_spool(spool, kind):
+    """Checks the spooled bytes are an image and moves them to their content address in storage; returns upload info."""
+    spool.close()
+    file_extension = sniff_image_extension(spool.head)
+    if spool.bytes_written == 0 or not file_extension:
+        _discard(spool)
+        raise ValueError("Upload is not a PNG, JPEG, GIF or WebP image.")
+    try:
+        check_image_dimensions(spool.name)
+    except ValueError:
+        _discard(spool)
+        raise
+    try:
+        upload = _store_blob(spool.sha256.hexdigest(), file_extension, spool.bytes_written, kind,
+                             lambda storage, key: storage.put_file(key, spool.name, CONTENT_TYPES[file_extension],
+                                                                   IMMUTABLE_CACHE_CONTROL))
+    finally:
+        _discard(spool) # No-op once moved; drops the spool of a deduplicated or failed upload
+    return upload
+
+def save_image_stream(stream, kind: str, max_bytes: int) -> dict:
+    """
+    Copies a raw image request body to a spool file in UPLOAD_CHUNK_SIZE chunks, so memory use
+    stays at one chunk regardless of image size. Raises RequestEntityTooLarge as soon as
+    max_bytes is crossed and ValueError if the bytes are not a supported image.
+    """
+    chunk_size = current_app.config['UPLOAD_CHUNK_SIZE']
+    spool = _open_spool(max_bytes)
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            spool.write(chunk)
+    except BaseException:
+        _discard(spool)
+        raise
+    return _finalize_spool(spool, kind)
+
+def save_multipart_image(stream, mimetype: str, mimetype_params: dict, content_length, kind: str,
+                         max_bytes: int, field_name: str = "file") -> dict:
+    """
+    Parses a multipart/form-data body and streams the `field_name` file part straight
+    into a spool file next to its final location (instead of Werkzeug's default
+    in-memory/temp-file spooling). Other file parts are discarded.
+    """
+    spools = []
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        spool = _open_spool(max_bytes)
+        spools.append(spool)
+        return spool
+
+    parser = FormDataParser(stream_factory=stream_factory, max_form_memory_size=64 * 1024, silent=False)
+    try:
+        _, _, files = parser.parse(stream, mimetype, content_length, mimetype_params)
+    except BaseException:
+        for spool in spools:
+            _discard(spool)
+        raise
+    upload = files.get(field_name)
+    for spool in spools:
+        if upload is None or spool is not upload.stream:
+            _discard(spool)
+    if upload is None:
+        raise ValueError(f"Multipart upload must include a '{field_name}' file part.")
+    return _finalize_spool(upload.stream, kind)
+
+def _validate_direct_upload(sha256, content_type):
+    if not isinstance(sha256, str) or not SHA256_HEX.match(sha256):
+        raise ValueError("'sha256' must be the lowercase hex SHA-256 of the image bytes.")
+    if content_type not in EXTENSIONS:
+        raise ValueError(f"'contentType' must be one of: {', '.join(sorted(EXTENSIONS))}.")
+    return EXTENSIONS[content_type]
+
+def presign_direct_upload(kind: str, sha256: str, content_type: str, size, max_bytes: int) -> dict:
+    """
+    Step 1 of a direct-to-bucket upload. Returns {"upload": info} when these bytes are already
+    stored (nothing to send), otherwise {"target": {"method", "url", "headers", "expiresIn"}}:
+    the client PUTs the bytes there with those headers, then calls complete_direct_upload().
+    """
+    storage = get_storage()
+    if not storage.supports_direct_uploads:
+        raise ValueError("Direct uploads need UPLOAD_STORAGE_BACKEND='s3'; upload through this API instead.")
+    file_extension = _validate_direct_upload(sha256, content_type)
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        raise ValueError("'size' must be the image size in bytes.")
+    if size > max_bytes:
+        raise RequestEntityTooLarge(f"Image exceeds the {max_bytes // (1024 * 1024)} MB upload limit.")
+
+    key = blob_key(sha256, file_extension)
+    if Upload.get_collection().find_one({"_id": sha256}, {"_id": 1}) and storage.exists(key):
+        return {"upload": _store_blob(sha256, file_extension, size, kind, None), "target": None}
+    target = storage.presign_put(key, content_type, size, sha256, current_app.config['UPLOAD_PRESIGN_EXPIRES_SECONDS'],
+                                 cache_control=IMMUTABLE_CACHE_CONTROL)
+    return {"upload": None, "target": target}
+
+def complete_direct_upload(kind: str, sha256: str, content_type: str, max_bytes: int) -> dict:
+    """
+    Step 2: verifies the object the client PUT (checksum, size, image type and dimensions) and
+    records it like any other upload. Rejected objects are deleted. Raises LookupError if
+    nothing was uploaded to the key.
+    """
+    storage = get_storage()
+    if not storage.supports_direct_uploads:
+        raise ValueError("Direct uploads need UPLOAD_STORAGE_BACKEND='s3'; upload through this API instead.")
+    file_extension = _validate_direct_upload(sha256, content_type)
+    key = blob_key(sha256, file_extension)
+    info = storage.stat(key)
+    if info is None:
+        raise LookupError("Nothing has been uploaded for this image yet; PUT it to the presigned URL first.")
+
     try:
-        file_extension = header.split('/')[1].split(';')[0]
-        if not file_extension or file_extension not in ['png', 'jpg', 'jpeg', 'gif', 'webp']:
-            file_extension = 'png' # Default to png if unknown or invalid
-    except IndexError:
-        file_extension = 'png' # Default if parsing fails
-
-    unique_id = uuid.uuid4().hex
-    filename_on_disk = f"{base_filename_prefix}_{unique_id}.{file_extension}"
-
-    # Get the absolute base upload directory from Flask config
-    # This UPLOAD_FOLDER should be the root for all uploads, e.g., /path/to/your/project/instance/uploads
-    base_upload_dir_on_server = current_app.config['UPLOAD_FOLDER'] 
-    
-    # Create the full path to the subfolder on the server
-    target_subfolder_on_server = os.path.join(base_upload_dir_on_server, subfolder_name)
-    os.makedirs(target_subfolder_on_server, exist_ok=True) # Create subfolder if it doesn't exist
-
-    file_path_on_server = os.path.join(target_subfolder_on_server, filename_on_disk)
-
-    with open(file_path_on_server, 'wb') as f:
-        f.write(image_data)
-    
-    current_app.logger.info(f"Saved image to: {file_path_on_server}")
-
-    # --- CONSTRUCT THE PUBLIC HTTPS URL ---
-    backend_public_base_url = current_app.config['BACKEND_PUBLIC_BASE_URL'].rstrip('/')
-    static_upload_url_segment = current_app.config['STATIC_UPLOAD_SUBPATH'].strip('/')
-    
-    # The public URL path will be /<STATIC_UPLOAD_SUBPATH>/<subfolder_name>/<filename_on_disk>
-    # e.g., /uploads/community_icons/cicon_communityId_uuid.png
-    public_url = f"{backend_public_base_url}/{static_upload_url_segment}/{subfolder_name}/{filename_on_disk}"
-    
-    current_app.logger.info(f"Generated public URL: {public_url}")
-    return public_url
\ No newline at end of file
+        if info["sha256"] != sha256:
+            raise ValueError("Uploaded bytes do not match the declared SHA-256.")
+        if info["size"] > max_bytes:
+            raise RequestEntityTooLarge(f"Image exceeds the {max_bytes // (1024 * 1024)} MB upload limit.")
+        head = storage.read_range(key, HEADER_PROBE_BYTES)
+        if sniff_image_extension(head[:_UploadSpool.HEAD_BYTES]) != file_extension:
+            raise ValueError("Upload is not the declared image type.")
+        check_image_dimensions(io.BytesIO(head))
+    except (ValueError, RequestEntityTooLarge):
+        if not Upload.get_collection().find_one({"_id": sha256}, {"_id": 1}):
+            storage.delete(key) # Never referenced by anything; a recorded blob at this key was verified earlier
+        raise
+    return _store_blob(sha256, file_extension, info["size"], kind, None)
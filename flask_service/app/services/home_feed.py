@@ -0,0 +1,152 @@
+# app/services/home_feed.py
+import base64
+import heapq
+from datetime import datetime, timezone
+
+from bson import ObjectId, errors as bson_errors
+from flask import current_app
+
+from app.models.community import Community
+from app.models.post import Post
+from app.models.user import User
+from app.services.timelines import fanout_enabled, load_timeline
+
+# GET /feed: posts from every community the caller has joined, newest ("new") or most
+# recently active ("hot") first. One query with community_id $in [...] walks the
+# (community_id, deleted_at, <sort field>, _id) index per community and the server
+# merge-sorts the scans, which it only does for a bounded number of them. Users in more
+# than FEED_COMMUNITIES_PER_QUERY communities get one such query per chunk, merged here
+# (k-way, each stream already sorted), so no query falls back to an in-memory sort.
+# Pagination is keyset: the cursor is the (sort value, _id) of the last post served.
+# Pages never skip posts for "new"; for "hot", a post that gets new activity moves to
+# the top and may be served again.
+# With timelines on (timelines.py), "new" reads small communities' posts from the caller's
+# materialized timeline and only queries the large ones; both streams are merged by
+# (created_at, _id), so the cursors are the same either way.
+
+FEED_SORTS = {"new": "created_at", "hot": "last_activity_at"}
+# Voter arrays grow with the audience; the caller's own votes are looked up in one batched query
+FEED_PROJECTION = {"upvoted_by": 0, "downvoted_by": 0, "purge_tokens": 0}
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _as_utc(value):
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def encode_cursor(sort_value, post_id):
+    micros = int((_as_utc(sort_value or _EPOCH) - _EPOCH).total_seconds() * 1_000_000)
+    return base64.urlsafe_b64encode(f"{micros}.{post_id}".encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(sort value, post ObjectId) from a cursor; ValueError when it was not made by encode_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        micros, _, post_id = raw.partition('.')
+        return datetime.fromtimestamp(int(micros) / 1_000_000, timezone.utc), ObjectId(post_id)
+    except (ValueError, UnicodeDecodeError, bson_errors.InvalidId):
+        raise ValueError("Invalid feed cursor.")
+
+
+def sort_key(post_doc, sort_field):
+    value = post_doc.get(sort_field)
+    return (_as_utc(value) if value else _EPOCH, post_doc["_id"])
+
+
+def _after(sort_field, after):
+    if after is None:
+        return {}
+    value, post_id = after
+    return {"$or": [{sort_field: {"$lt": value}}, {sort_field: value, "_id": {"$lt": post_id}}]}
+
+
+def query_posts(community_ids, sort_field, after, limit, per_query=None):
+    """Up to `limit` live posts of community_ids after the cursor position, in feed order."""
+    if not community_ids:
+        return []
+    per_query = per_query or current_app.config['FEED_COMMUNITIES_PER_QUERY']
+    community_ids = list(community_ids)
+    streams = []
+    for start in range(0, len(community_ids), per_query):
+        query = {"community_id": {"$in": community_ids[start:start + per_query]}, "deleted_at": None,
+                 **_after(sort_field, after)}
+        streams.append(Post.get_collection().find(query, FEED_PROJECTION)
+                       .sort([(sort_field, -1), ("_id", -1)]).limit(limit))
+    if len(streams) == 1:
+        return list(streams[0])
+    merged = heapq.merge(*streams, key=lambda doc: sort_key(doc, sort_field), reverse=True)
+    return [doc for _, doc in zip(range(limit), merged)]
+
+
+def hydrate(post_docs, current_user_id_str):
+    """Serializes feed posts with one author lookup for any without a snapshot and one vote lookup for the page."""
+    missing = {doc["author_id"] for doc in post_docs if doc.get("author_snapshot") is None and doc.get("author_id")}
+    if missing:
+        authors = {user["_id"]: User.author_snapshot(user) for user in
+                   User.get_collection().find({"_id": {"$in": list(missing)}}, User.AUTHOR_SNAPSHOT_PROJECTION)}
+        post_docs = [dict(doc, author_snapshot=authors.get(doc.get("author_id")))
+                     if doc.get("author_snapshot") is None and doc.get("author_id") in authors else doc
+                     for doc in post_docs]
+    votes = Post.user_votes_for_posts([doc["_id"] for doc in post_docs], current_user_id_str)
+    return [dict(Post.to_dict(doc), user_vote=votes.get(doc["_id"])) for doc in post_docs]
+
+
+def _timeline_candidates(timeline, covered, after, limit):
+    """[(sort key, post id)] from the timeline, continued by a query once past its oldest entry if it was trimmed."""
+    candidates, seen = [], set()
+    for entry in timeline["entries"]:
+        key = (_as_utc(entry["created_at"]), entry["post_id"])
+        if entry["community_id"] in covered and (after is None or key < after) and entry["post_id"] not in seen:
+            seen.add(entry["post_id"]) # Timelines written before pushes were deduplicated can hold a post twice
+            candidates.append((key, entry["post_id"]))
+            if len(candidates) == limit:
+                return candidates
+    if not timeline["complete"] and timeline["entries"]:
+        oldest = (_as_utc(timeline["entries"][-1]["created_at"]), timeline["entries"][-1]["post_id"])
+        start = after if after is not None and after < oldest else oldest
+        candidates += [(sort_key(doc, "created_at"), doc["_id"])
+                       for doc in query_posts(covered, "created_at", start, limit - len(candidates))]
+    return candidates
+
+
+def _hybrid_page(current_user_id_str, joined, after, limit):
+    """Up to `limit` live posts in "new" order: small communities from the timeline, large ones queried."""
+    timeline = load_timeline(current_user_id_str, joined)
+    joined_ids = [community["_id"] for community in joined]
+    covered = timeline["covered"].intersection(joined_ids)
+    read_time_ids = [community_id for community_id in joined_ids if community_id not in covered]
+    docs = []
+    while len(docs) < limit:
+        wanted = limit - len(docs)
+        queried = query_posts(read_time_ids, "created_at", after, wanted)
+        candidates = sorted(_timeline_candidates(timeline, covered, after, wanted) +
+                            [(sort_key(doc, "created_at"), doc["_id"]) for doc in queried], reverse=True)[:wanted]
+        if not candidates:
+            break
+        fetched = {doc["_id"]: doc for doc in queried}
+        missing = [post_id for _, post_id in candidates if post_id not in fetched]
+        if missing: # One lookup for the page; soft-deleted posts drop out here
+            fetched.update((doc["_id"], doc) for doc in Post.get_collection().find(
+                {"_id": {"$in": missing}, "deleted_at": None}, FEED_PROJECTION))
+        docs += [fetched[post_id] for _, post_id in candidates if post_id in fetched]
+        if len(candidates) < wanted:
+            break
+        after = candidates[-1][0] # Deleted posts left the page short; continue after the last candidate
+    return docs
+
+
+def get_home_feed(current_user_id_str, sort_by="new", cursor=None, limit=20):
+    """{"posts": [...], "next_cursor": str or None} for the user's joined communities."""
+    sort_field = FEED_SORTS.get(sort_by, FEED_SORTS["new"])
+    after = decode_cursor(cursor) if cursor else None
+    joined = Community.joined_communities(current_user_id_str)
+    # One extra post tells whether there is a next page
+    if sort_field == "created_at" and fanout_enabled() and joined:
+        docs = _hybrid_page(current_user_id_str, joined, after, limit + 1)
+    else:
+        docs = query_posts([community["_id"] for community in joined], sort_field, after, limit + 1)
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = encode_cursor(docs[-1].get(sort_field), docs[-1]["_id"]) if has_more else None
+    return {"posts": hydrate(docs, current_user_id_str), "next_cursor": next_cursor}
@@ -0,0 +1,207 @@
+# app/services/image_pipeline.py
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from bson import ObjectId
+from flask import current_app
+
+from app import mongo
+from app.services.file_handler import CONTENT_TYPES, Image, check_image_dimensions
+from app.services.job_queue import enqueue, register_job_handler
+from app.services.response_cache import invalidate_community, invalidate_post
+from app.services.upload_storage import IMMUTABLE_CACHE_CONTROL, get_storage
+
+try:
+    from PIL import ImageOps
+except ImportError: # Pillow is optional; without it no variants are produced and serializers fall back to the original
+    ImageOps = None
+
+# Resized variants of uploaded images, produced off the request thread.
+# After a post image or community icon/banner URL is stored, the owning model calls
+# schedule_variants(); a small worker pool decodes the original once, writes every
+# variant in WebP and JPEG next to it (metadata stripped, EXIF orientation applied),
+# and records their URLs on the document, but only if it still points at the same
+# original. Serializers expose them as `*_variants` plus `srcset` strings.
+# With an object-storage backend the original is downloaded to a temporary directory,
+# and the variants are generated there and then uploaded beside it.
+
+# variant set -> ((name, target width, square crop), ...)
+VARIANT_SETS = {
+    "icon": (("icon64", 64, True), ("icon128", 128, True)),
+    "image": (("thumb320", 320, False), ("feed1080", 1080, False)),
+}
+
+OUTPUT_FORMATS = ("webp", "jpeg")
+
+
+def _flatten(img, keep_alpha):
+    has_alpha = img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+    if has_alpha and keep_alpha:
+        return img.convert("RGBA")
+    if has_alpha:
+        rgba = img.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+def _save_variant(img, path, output_format, config):
+    tmp_path = f"{path}.part"
+    if output_format == "webp":
+        _flatten(img, keep_alpha=True).save(tmp_path, "WEBP", quality=config['IMAGE_WEBP_QUALITY'], method=4)
+    else:
+        _flatten(img, keep_alpha=False).save(tmp_path, "JPEG", quality=config['IMAGE_JPEG_QUALITY'],
+                                              optimize=True, progressive=True)
+    os.replace(tmp_path, path) # Readers never see a half-written variant
+
+
+def _variant_filename(stem, name, output_format):
+    return f"{stem}.{name}.{'jpg' if output_format == 'jpeg' else output_format}"
+
+
+def _existing_variants(directory, stem, specs):
+    """Variants already on disk for this (content-addressed) original, read from their headers; None if any is missing."""
+    results = {}
+    for name, _, _ in specs:
+        filenames = {fmt: _variant_filename(stem, name, fmt) for fmt in OUTPUT_FORMATS}
+        if not all(os.path.exists(os.path.join(directory, filename)) for filename in filenames.values()):
+            return None
+        with Image.open(os.path.join(directory, filenames["webp"])) as img:
+            results[name] = dict(filenames, width=img.width, height=img.height)
+    return results
+
+
+def generate_variants(source_path, variant_set):
+    """
+    Writes the variants of `source_path` beside it as <stem>.<variant>.<webp|jpg>.
+    Returns {variant: {"width", "height", "webp": filename, "jpeg": filename}}.
+    Images are never upscaled. Nothing is written for images over the dimension limits.
+    Uploads are content-addressed, so variants found on disk from an earlier upload of
+    the same bytes are reused instead of re-encoded.
+    """
+    config = current_app.config
+    specs = VARIANT_SETS[variant_set]
+    directory, filename = os.path.split(source_path)
+    stem = os.path.splitext(filename)[0]
+    existing = _existing_variants(directory, stem, specs)
+    if existing:
+        return existing
+    check_image_dimensions(source_path)
+    results = {}
+    with Image.open(source_path) as original:
+        largest = max(size for _, size, _ in specs)
+        original.draft("RGB", (largest, largest)) # JPEG: decode at a reduced scale when that is still big enough
+        img = ImageOps.exif_transpose(original) # Orientation is metadata too; bake it in before it is dropped
+        img.load()
+        for name, size, square in specs:
+            if square:
+                side = min(size, img.width, img.height)
+                variant = ImageOps.fit(img, (side, side), Image.LANCZOS)
+            else:
+                width = min(size, img.width)
+                height = max(1, round(img.height * width / img.width))
+                variant = img.resize((width, height), Image.LANCZOS) if width != img.width else img.copy()
+            variant.info = {} # No EXIF/ICC/comments carried into the variant files
+            entry = {"width": variant.width, "height": variant.height}
+            for output_format in OUTPUT_FORMATS:
+                variant_filename = _variant_filename(stem, name, output_format)
+                _save_variant(variant, os.path.join(directory, variant_filename), output_format, config)
+                entry[output_format] = variant_filename
+            results[name] = entry
+    return results
+
+
+def process_variants(collection_name, doc_id, url_field, variants_field, variant_set, source_url, on_recorded=None):
+    """
+    Generates and records the variants for one image field. Returns the stored variants,
+    or None when the URL is external, the file is gone, or the field changed meanwhile.
+    """
+    storage = get_storage()
+    key = storage.key_for_url(source_url)
+    if Image is None or not key or not storage.exists(key):
+        return None
+    key_prefix = key.rsplit('/', 1)[0]
+    with storage.local_copy(key) as source_path:
+        files = generate_variants(source_path, variant_set)
+        directory = os.path.dirname(source_path)
+        for entry in files.values():
+            for fmt in OUTPUT_FORMATS:
+                # No-op for local storage, where the variant is already in place
+                storage.put_file(f"{key_prefix}/{entry[fmt]}", os.path.join(directory, entry[fmt]),
+                                 CONTENT_TYPES['jpg' if fmt == 'jpeg' else fmt], IMMUTABLE_CACHE_CONTROL)
+    base_url = source_url.rsplit('/', 1)[0]
+    variants = {
+        name: dict(entry, **{fmt: f"{base_url}/{entry[fmt]}" for fmt in OUTPUT_FORMATS})
+        for name, entry in files.items()
+    }
+    result = mongo.db[collection_name].update_one({"_id": doc_id, url_field: source_url},
+                                                  {"$set": {variants_field: variants}})
+    if result.modified_count == 0:
+        return None # A newer image replaced this one; its own job records its variants
+    if on_recorded:
+        on_recorded()
+    return variants
+
+
+def srcset(variants, output_format):
+    """'url 320w, url 1080w' for one format, smallest first, or None without variants."""
+    if not variants:
+        return None
+    entries = sorted(variants.values(), key=lambda entry: entry["width"])
+    return ", ".join(f"{entry[output_format]} {entry['width']}w" for entry in entries if entry.get(output_format))
+
+
+def srcset_fields(variants):
+    return {fmt: srcset(variants, fmt) for fmt in OUTPUT_FORMATS} if variants else None
+
+
+def _run_job(app, *args, **kwargs):
+    with app.app_context():
+        try:
+            return process_variants(*args, **kwargs)
+        except Exception as e:
+            app.logger.warning(f"Image variants for {args[0]} {args[1]} ({args[5]}) failed: {e}")
+            return None
+
+
+_pipeline_pool = None
+_pipeline_pool_lock = threading.Lock()
+
+
+def schedule_variants(collection_name, doc_id, url_field, variants_field, variant_set, source_url, on_recorded=None):
+    """
+    Queues process_variants on the image worker pool and returns the Future; with JOB_QUEUE_ENABLED
+    it becomes a job for `flask worker` (the job id is returned, and on_recorded is replaced by the
+    collection's cache invalidation). None when nothing needs doing.
+    """
+    global _pipeline_pool
+    if not current_app.config.get('IMAGE_PIPELINE_ENABLED', True) or Image is None or not get_storage().key_for_url(source_url):
+        return None
+    if current_app.config.get('JOB_QUEUE_ENABLED'):
+        payload = {"collection": collection_name, "id": str(doc_id), "url_field": url_field,
+                   "variants_field": variants_field, "variant_set": variant_set, "source_url": source_url}
+        return enqueue("image-variants", payload,
+                       dedupe_key=f"image-variants:{collection_name}:{doc_id}:{url_field}:{source_url}")
+    if _pipeline_pool is None:
+        with _pipeline_pool_lock:
+            if _pipeline_pool is None:
+                _pipeline_pool = ThreadPoolExecutor(max_workers=current_app.config['IMAGE_PIPELINE_WORKERS'],
+                                                    thread_name_prefix='image-pipeline')
+    return _pipeline_pool.submit(_run_job, current_app._get_current_object(), collection_name, doc_id, url_field,
+                                 variants_field, variant_set, source_url, on_recorded=on_recorded)
+
+
+_RECORDED_HOOKS = {"posts": invalidate_post, "communities": invalidate_community}
+
+
+def _variants_job(payload):
+    doc_id = ObjectId(payload["id"])
+    hook = _RECORDED_HOOKS.get(payload["collection"])
+    process_variants(payload["collection"], doc_id, payload["url_field"], payload["variants_field"],
+                     payload["variant_set"], payload["source_url"], on_recorded=hook and (lambda: hook(doc_id)))
+
+
+# Variants are visible to users right after an upload, so they go ahead of maintenance jobs
+register_job_handler("image-variants", _variants_job, concurrency=2, priority=10)
@@ -0,0 +1,305 @@
+# app/services/invalidation_bus.py
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+
+from pymongo import CursorType, ReturnDocument
+from pymongo.errors import CollectionInvalid
+
+try:
+    import redis
+except ImportError: # Optional dependency; only needed for INVALIDATION_BUS_BACKEND='redis'
+    redis = None
+
+# Broadcasts cache invalidations to every worker process on every node.
+# Each gunicorn worker keeps process-local caches (response_cache, object_cache, ...).
+# A write applies the invalidation locally and publishes {"kind", "keys"} through the
+# configured backend; a daemon thread in every other worker receives it and runs the
+# handlers that the cache modules registered for that kind.
+
+
+class BusMetrics:
+    """Counters and delivery lag (publish -> apply in another worker) for the bus."""
+
+    LAG_SAMPLES = 1024
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.published = 0
+            self.publish_errors = 0
+            self.received = 0
+            self.listener_errors = 0
+            self._lags_ms = deque(maxlen=self.LAG_SAMPLES)
+            self.max_lag_ms = 0.0
+
+    def record_publish(self, ok=True):
+        with self._lock:
+            if ok:
+                self.published += 1
+            else:
+                self.publish_errors += 1
+
+    def record_receive(self, lag_ms):
+        with self._lock:
+            self.received += 1
+            self._lags_ms.append(lag_ms)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+
+    def record_listener_error(self):
+        with self._lock:
+            self.listener_errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            lags = sorted(self._lags_ms)
+            return {
+                "published": self.published,
+                "publishErrors": self.publish_errors,
+                "received": self.received,
+                "listenerErrors": self.listener_errors,
+                "lastLagMs": round(self._lags_ms[-1], 3) if self._lags_ms else None,
+                "p50LagMs": round(lags[len(lags) // 2], 3) if lags else None,
+                "p99LagMs": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))], 3) if lags else None,
+                "maxLagMs": round(self.max_lag_ms, 3),
+            }
+
+
+class MongoCappedBackend:
+    """
+    Messages are documents in a capped collection; listeners tail it with a
+    tailable-await cursor. With tailable=False the listener polls instead
+    (for deployments or test doubles without tailable cursor support).
+    """
+
+    # A sequence number still missing after this long was lost (its publisher died between
+    # taking the number and inserting the message) and stops holding the resume point back.
+    GAP_TIMEOUT_SECONDS = 5.0
+
+    def __init__(self, get_database, collection_name='cache_invalidations', capped_bytes=1024 * 1024,
+                 poll_interval=0.5, tailable=True):
+        self._get_database = get_database
+        self.collection_name = collection_name
+        self.capped_bytes = capped_bytes
+        self.poll_interval = poll_interval
+        self.tailable = tailable
+        self._ready = False
+
+    def collection(self):
+        database = self._get_database()
+        if not self._ready:
+            try:
+                database.create_collection(self.collection_name, capped=True, size=self.capped_bytes)
+            except CollectionInvalid:
+                pass # Already exists
+            database[self.collection_name].create_index([("seq", 1)])
+            self._ready = True
+        return database[self.collection_name]
+
+    def _next_seq(self):
+        counter = self._get_database()[f"{self.collection_name}_seq"].find_one_and_update(
+            {"_id": self.collection_name}, {"$inc": {"seq": 1}}, upsert=True, return_document=ReturnDocument.AFTER)
+        return counter["seq"]
+
+    def publish(self, message):
+        collection = self.collection()
+        collection.insert_one(dict(message, seq=self._next_seq()))
+
+    def listen(self, deliver, stop_event):
+        # Publishers number messages from a shared counter, so a listener only reads what follows its
+        # resume point ({"seq": {"$gt": ...}}) instead of rescanning the collection. A number is taken
+        # before its insert, so messages can land out of order: the resume point only moves past a
+        # number once that message (or GAP_TIMEOUT_SECONDS) has gone by, and later ones already
+        # delivered are remembered so they are not delivered twice.
+        collection = self.collection()
+        newest = collection.find_one({"seq": {"$exists": True}}, {"seq": 1}, sort=[("seq", -1)])
+        # Only messages published after this worker started listening matter.
+        resume = {"seq": newest["seq"] if newest else 0, "ahead": set(), "gap_since": None}
+        while not stop_event.is_set():
+            if self.tailable:
+                cursor = collection.find({"seq": {"$gt": resume["seq"]}}, cursor_type=CursorType.TAILABLE_AWAIT,
+                                         max_await_time_ms=int(self.poll_interval * 1000))
+                while cursor.alive and not stop_event.is_set():
+                    for doc in cursor:
+                        self._deliver_in_order(doc, resume, deliver)
+                    self._advance(resume)
+            else:
+                for doc in collection.find({"seq": {"$gt": resume["seq"]}}).sort("seq", 1):
+                    self._deliver_in_order(doc, resume, deliver)
+                self._advance(resume)
+            stop_event.wait(self.poll_interval) # Tailable cursors on an empty result die immediately
+
+    @staticmethod
+    def _deliver_in_order(doc, resume, deliver):
+        seq = doc["seq"]
+        if seq <= resume["seq"] or seq in resume["ahead"]:
+            return # Delivered already
+        deliver(doc)
+        resume["ahead"].add(seq)
+        MongoCappedBackend._catch_up(resume)
+
+    @staticmethod
+    def _catch_up(resume):
+        while resume["seq"] + 1 in resume["ahead"]:
+            resume["seq"] += 1
+            resume["ahead"].discard(resume["seq"])
+
+    @classmethod
+    def _advance(cls, resume):
+        """Skips a missing number once it has held the resume point back for GAP_TIMEOUT_SECONDS."""
+        if not resume["ahead"]:
+            resume["gap_since"] = None
+            return
+        now = time.monotonic()
+        if resume["gap_since"] is None:
+            resume["gap_since"] = now
+        elif now - resume["gap_since"] >= cls.GAP_TIMEOUT_SECONDS:
+            resume["seq"] = min(resume["ahead"])
+            resume["ahead"].discard(resume["seq"])
+            cls._catch_up(resume)
+            resume["gap_since"] = now if resume["ahead"] else None
+
+
+class RedisPubSubBackend:
+    """Messages are JSON on a Redis pub/sub channel (lower lag, no persistence)."""
+
+    def __init__(self, url, channel='unicampus:cache-invalidations'):
+        if redis is None:
+            raise RuntimeError("INVALIDATION_BUS_BACKEND='redis' requires the redis package.")
+        self._client = redis.Redis.from_url(url)
+        self.channel = channel
+
+    def publish(self, message):
+        self._client.publish(self.channel, json.dumps(message))
+
+    def listen(self, deliver, stop_event):
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        try:
+            while not stop_event.is_set():
+                message = pubsub.get_message(timeout=1.0)
+                if message and message.get("type") == "message":
+                    deliver(json.loads(message["data"]))
+        finally:
+            pubsub.close()
+
+
+class InvalidationBus:
+    def __init__(self):
+        self._handlers = {}
+        self.backend = None
+        self.logger = None
+        self.metrics = BusMetrics()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._pid = None
+        self._origin = None
+
+    @property
+    def origin(self):
+        """Identifies this worker process; recomputed after a fork."""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._origin = f"{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}"
+        return self._origin
+
+    def register(self, kind, handler):
+        """Runs handler(*keys) whenever an invalidation of `kind` is published by any worker."""
+        self._handlers.setdefault(kind, []).append(handler)
+
+    def configure(self, backend, logger=None):
+        self.stop()
+        self.backend = backend
+        self.logger = logger
+
+    def publish(self, kind, *keys):
+        keys = [str(key) for key in keys]
+        self._apply(kind, keys)
+        if self.backend is None:
+            return
+        message = {"kind": kind, "keys": keys, "origin": self.origin, "sentAt": time.time()}
+        try:
+            self.backend.publish(message)
+            self.metrics.record_publish()
+        except Exception as e: # Other workers fall back to their TTLs; never fail the write
+            self.metrics.record_publish(ok=False)
+            if self.logger:
+                self.logger.warning(f"Invalidation bus publish failed for {kind} {keys}: {e}")
+
+    def ensure_listening(self):
+        """Starts this process's listener thread (again after a fork, since threads do not survive it)."""
+        if self.backend is None:
+            return
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stop_event = threading.Event()
+            self._thread = threading.Thread(target=self._listen_forever, args=(self.origin, self._stop_event),
+                                            name='invalidation-bus', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def _listen_forever(self, origin, stop_event):
+        backoff = 0.5
+        while not stop_event.is_set():
+            try:
+                self.backend.listen(lambda message: self._deliver(message, origin), stop_event)
+                backoff = 0.5
+            except Exception as e: # Connection drops, capped collection recreated, ...
+                self.metrics.record_listener_error()
+                if self.logger:
+                    self.logger.warning(f"Invalidation bus listener error, retrying in {backoff}s: {e}")
+                stop_event.wait(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def _deliver(self, message, origin):
+        if message.get("origin") == origin:
+            return # Already applied locally when it was published
+        sent_at = message.get("sentAt")
+        lag_ms = max(0.0, (time.time() - sent_at) * 1000) if sent_at else 0.0 # Cross-node lag includes clock skew
+        self.metrics.record_receive(lag_ms)
+        self._apply(message.get("kind"), message.get("keys", []))
+
+    def _apply(self, kind, keys):
+        for handler in self._handlers.get(kind, ()):
+            handler(*keys)
+
+
+INVALIDATION_BUS = InvalidationBus()
+
+
+def build_backend(app):
+    backend_name = app.config.get('INVALIDATION_BUS_BACKEND', 'none')
+    if backend_name == 'mongo':
+        from app import mongo
+        return MongoCappedBackend(lambda: mongo.db,
+                                  collection_name=app.config['INVALIDATION_BUS_COLLECTION'],
+                                  capped_bytes=app.config['INVALIDATION_BUS_CAPPED_BYTES'],
+                                  poll_interval=app.config['INVALIDATION_BUS_POLL_SECONDS'])
+    if backend_name == 'redis':
+        return RedisPubSubBackend(app.config['REDIS_URL'], channel=app.config['INVALIDATION_BUS_CHANNEL'])
+    return None # 'none': single-process deployments and tests
+
+
+def init_invalidation_bus(app):
+    INVALIDATION_BUS.configure(build_backend(app), logger=app.logger)
+    app.before_request(INVALIDATION_BUS.ensure_listening)
+
+
+def get_invalidation_bus_metrics():
+    return INVALIDATION_BUS.metrics.snapshot()
@@ -0,0 +1,422 @@
+# app/services/job_queue.py
+import importlib
+import multiprocessing
+import os
+import random
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from flask import current_app
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app import mongo
+
+# Durable background jobs in the `jobs` collection, run by `flask worker` processes on any node.
+# With JOB_QUEUE_ENABLED the slow paths that otherwise run on per-process thread pools (purges,
+# image variants, author fan-out, counter reconciliation) are enqueued here instead, so they
+# survive restarts and are spread across workers.
+#
+#   enqueue()  inserts {type, payload, priority, run_at, status: "queued"}. A dedupe_key collapses
+#              repeats while one is still queued (e.g. five profile edits -> one fan-out).
+#   claim      find_one_and_update takes the highest-priority ready job of a type that has a free
+#              slot and marks it running with a lease (visibility timeout). The worker extends the
+#              lease while the handler runs; a crashed worker's jobs become visible again when
+#              their lease expires.
+#   finish     done jobs record their wait and run times and expire after JOB_RETENTION_SECONDS.
+#              A failed attempt is re-queued with exponential backoff and jitter until the type's
+#              max_attempts, then kept as "failed" for inspection.
+# Handlers must be idempotent: a job can run again after a lease expires mid-run.
+
+JOB_HANDLER_MODULES = (
+    "app.services.purger",
+    "app.services.image_pipeline",
+    "app.services.author_fanout",
+    "app.services.counter_reconciler",
+    "app.services.timelines",
+)
+LATENCY_SAMPLE_SIZE = 1000
+
+
+class JobHandler:
+    __slots__ = ("name", "run", "concurrency", "max_attempts", "priority", "on_failure")
+
+    def __init__(self, name, run, concurrency, max_attempts, priority, on_failure):
+        self.name = name
+        self.run = run
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.priority = priority
+        self.on_failure = on_failure
+
+
+JOB_HANDLERS = {}
+
+
+def register_job_handler(name, run, concurrency=1, max_attempts=None, priority=0, on_failure=None):
+    """
+    Registers run(payload) for jobs of type `name`. concurrency is per worker process
+    (JOB_CONCURRENCY overrides it), priority is the default for enqueue() (higher runs first),
+    and on_failure(payload, error) is called once the last attempt has failed.
+    """
+    JOB_HANDLERS[name] = JobHandler(name, run, concurrency, max_attempts, priority, on_failure)
+
+
+def load_job_handlers():
+    for module_name in JOB_HANDLER_MODULES:
+        importlib.import_module(module_name) # Each module registers its handlers on import
+    return JOB_HANDLERS
+
+
+def _jobs_collection():
+    return mongo.db.jobs
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value):
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+_indexes_ready_for = None # The database ensure_indexes() last ran against in this process
+_indexes_lock = threading.Lock()
+
+
+def ensure_indexes():
+    jobs = _jobs_collection()
+    jobs.create_index([("status", 1), ("type", 1), ("priority", -1), ("run_at", 1)], name="jobs_claim")
+    jobs.create_index([("status", 1), ("lease_expires_at", 1)], name="jobs_lease")
+    jobs.create_index("dedupe_key", name="jobs_dedupe", unique=True,
+                      partialFilterExpression={"status": "queued", "dedupe_key": {"$type": "string"}})
+    jobs.create_index("finished_at", name="jobs_retention",
+                      expireAfterSeconds=current_app.config['JOB_RETENTION_SECONDS'],
+                      partialFilterExpression={"status": "done"})
+
+
+def ensure_indexes_once():
+    """
+    Runs ensure_indexes() the first time this process uses the queue. enqueue() relies on the unique
+    jobs_dedupe index: without it, concurrent upserts of one dedupe_key insert duplicate jobs silently.
+    """
+    global _indexes_ready_for
+    database = mongo.db
+    if _indexes_ready_for is database:
+        return
+    with _indexes_lock:
+        if _indexes_ready_for is not database:
+            ensure_indexes() # Raises on a conflicting index definition instead of queueing without one
+            _indexes_ready_for = database
+
+
+def enqueue(job_type, payload=None, priority=None, delay_seconds=0, max_attempts=None, dedupe_key=None):
+    """Queues a job and returns its id; with a dedupe_key, an already queued duplicate's id instead."""
+    ensure_indexes_once()
+    handler = JOB_HANDLERS.get(job_type)
+    now = _now()
+    run_at = now + timedelta(seconds=delay_seconds)
+    if priority is None:
+        priority = handler.priority if handler else 0
+    if max_attempts is None:
+        max_attempts = (handler.max_attempts if handler else None) or current_app.config['JOB_MAX_ATTEMPTS']
+    job = {"type": job_type, "payload": payload or {}, "attempts": 0, "max_attempts": max_attempts, "created_at": now}
+    jobs = _jobs_collection()
+    if dedupe_key is None:
+        return jobs.insert_one(dict(job, status="queued", priority=priority, run_at=run_at)).inserted_id
+    try:
+        # The queued duplicate keeps one slot; it runs no later and no less urgently than this request
+        jobs.update_one({"dedupe_key": dedupe_key, "status": "queued"},
+                        {"$setOnInsert": job,
+                         "$min": {"run_at": run_at}, "$max": {"priority": priority}},
+                        upsert=True)
+    except DuplicateKeyError:
+        pass # A concurrent enqueue inserted it first
+    existing = jobs.find_one({"dedupe_key": dedupe_key, "status": "queued"}, {"_id": 1})
+    return existing["_id"] if existing else None # None: claimed in the meantime
+
+
+def requeue_expired_leases():
+    """Makes running jobs whose lease expired (their worker died or hung) claimable again; returns how many."""
+    result = _jobs_collection().update_many(
+        {"status": "running", "lease_expires_at": {"$lt": _now()}},
+        {"$set": {"status": "queued", "run_at": _now(), "last_error": "Lease expired before the job finished"},
+         "$unset": {"worker": "", "claim_token": "", "lease_expires_at": ""}}
+    )
+    return result.modified_count
+
+
+def claim_job(job_types, worker_name, visibility_seconds):
+    """Atomically takes the next ready job of one of job_types; returns the job document or None."""
+    if not job_types:
+        return None
+    now = _now()
+    return _jobs_collection().find_one_and_update(
+        {"status": "queued", "run_at": {"$lte": now}, "type": {"$in": list(job_types)}},
+        {"$set": {"status": "running", "worker": worker_name, "claim_token": ObjectId(), "started_at": now,
+                  "lease_expires_at": now + timedelta(seconds=visibility_seconds)},
+         "$inc": {"attempts": 1},
+         "$unset": {"dedupe_key": ""}}, # Once it runs, a new enqueue must queue another run
+        sort=[("priority", -1), ("run_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _owned(job):
+    # Only the claim that ran the job may record its outcome; a stale worker's late result is dropped
+    return {"_id": job["_id"], "status": "running", "claim_token": job["claim_token"]}
+
+
+def extend_lease(job, visibility_seconds):
+    result = _jobs_collection().update_one(
+        _owned(job), {"$set": {"lease_expires_at": _now() + timedelta(seconds=visibility_seconds)}})
+    return result.modified_count == 1
+
+
+def complete_job(job):
+    """Marks a claimed job done; returns (wait_ms, run_ms), or None if the claim was lost."""
+    finished_at = _now()
+    started_at = _as_utc(job["started_at"])
+    wait_ms = max(0.0, (started_at - _as_utc(job["run_at"])).total_seconds() * 1000)
+    run_ms = (finished_at - started_at).total_seconds() * 1000
+    result = _jobs_collection().update_one(
+        _owned(job),
+        {"$set": {"status": "done", "finished_at": finished_at, "wait_ms": round(wait_ms, 3), "run_ms": round(run_ms, 3)},
+         "$unset": {"claim_token": "", "lease_expires_at": ""}}
+    )
+    return (wait_ms, run_ms) if result.modified_count else None
+
+
+def retry_delay_seconds(attempts, config):
+    """Exponential backoff with +-25% jitter, so jobs that failed together do not retry together."""
+    delay = min(config['JOB_RETRY_BASE_SECONDS'] * 2 ** max(attempts - 1, 0), config['JOB_RETRY_MAX_SECONDS'])
+    return delay * random.uniform(0.75, 1.25)
+
+
+def fail_job(job, error, config):
+    """Re-queues a failed attempt with backoff, or marks the job failed after its last attempt. Returns the new status."""
+    now = _now()
+    if job["attempts"] < job.get("max_attempts", 1):
+        update = {"$set": {"status": "queued", "last_error": error,
+                           "run_at": now + timedelta(seconds=retry_delay_seconds(job["attempts"], config))},
+                  "$unset": {"worker": "", "claim_token": "", "lease_expires_at": ""}}
+        status = "queued"
+    else:
+        update = {"$set": {"status": "failed", "last_error": error, "finished_at": now},
+                  "$unset": {"claim_token": "", "lease_expires_at": ""}}
+        status = "failed"
+    result = _jobs_collection().update_one(_owned(job), update)
+    return status if result.modified_count else None
+
+
+# --- Executing handlers ---
+
+_process_app = None
+
+
+def _init_process_executor():
+    global _process_app
+    from app import create_app # Spawned processes build their own app and Mongo client
+    _process_app = create_app()
+    load_job_handlers()
+
+
+def _run_handler(app, job_type, payload):
+    app = app or _process_app
+    with app.app_context():
+        return JOB_HANDLERS[job_type].run(payload)
+
+
+class JobWorker:
+    """
+    Claims and runs jobs until stopped. Claiming, lease renewal and recording outcomes happen
+    on the calling thread; handlers run on a thread pool, or on a process pool for CPU-bound
+    work (each process builds its own app from the environment).
+    """
+
+    def __init__(self, app, executor="thread", concurrency=None, job_types=None, poll_seconds=None, name=None):
+        config = app.config
+        self.app = app
+        self.executor_kind = executor
+        self.concurrency = concurrency or config['JOB_WORKER_CONCURRENCY']
+        self.poll_seconds = config['JOB_POLL_SECONDS'] if poll_seconds is None else poll_seconds
+        self.visibility_seconds = config['JOB_VISIBILITY_TIMEOUT_SECONDS']
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        handlers = load_job_handlers()
+        overrides = parse_concurrency(config.get('JOB_CONCURRENCY'))
+        self.limits = {job_type: overrides.get(job_type, handler.concurrency)
+                       for job_type, handler in handlers.items() if not job_types or job_type in job_types}
+        self._running = {} # Future -> job
+        self._lease_renewed = {} # job _id -> monotonic time
+        self._last_reclaim = 0.0
+        self._executor = None
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.lost_claims = 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLE_SIZE) # (wait_ms, run_ms)
+
+    def _make_executor(self):
+        if self.executor_kind == "process":
+            return ProcessPoolExecutor(max_workers=self.concurrency, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_process_executor)
+        return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job-worker")
+
+    def _submit(self, job):
+        app = None if self.executor_kind == "process" else self.app
+        future = self._executor.submit(_run_handler, app, job["type"], job["payload"])
+        self._running[future] = job
+        self._lease_renewed[job["_id"]] = time.monotonic()
+
+    def _free_types(self):
+        in_flight = {}
+        for job in self._running.values():
+            in_flight[job["type"]] = in_flight.get(job["type"], 0) + 1
+        return [job_type for job_type, limit in self.limits.items() if in_flight.get(job_type, 0) < limit]
+
+    def _claim_available(self):
+        claimed = 0
+        while len(self._running) < self.concurrency:
+            job = claim_job(self._free_types(), self.name, self.visibility_seconds)
+            if job is None:
+                break
+            if job["attempts"] > job.get("max_attempts", 1): # Its lease expired on the last attempt
+                self._record_failure(job, job.get("last_error") or "Exceeded max attempts")
+                continue
+            self._submit(job)
+            claimed += 1
+        return claimed
+
+    def _renew_leases(self):
+        now = time.monotonic()
+        for job in list(self._running.values()):
+            if now - self._lease_renewed[job["_id"]] >= self.visibility_seconds / 3:
+                extend_lease(job, self.visibility_seconds)
+                self._lease_renewed[job["_id"]] = now
+
+    def _record_failure(self, job, error):
+        status = fail_job(job, error, self.app.config)
+        if status == "queued":
+            self.retried += 1
+            self.app.logger.warning(f"Job {job['_id']} ({job['type']}) attempt {job['attempts']} failed, retrying: {error}")
+        elif status == "failed":
+            self.failed += 1
+            self.app.logger.error(f"Job {job['_id']} ({job['type']}) failed after {job['attempts']} attempts: {error}")
+            handler = JOB_HANDLERS.get(job["type"])
+            if handler and handler.on_failure:
+                try:
+                    handler.on_failure(job["payload"], error)
+                except Exception as e:
+                    self.app.logger.warning(f"on_failure for job {job['_id']} raised: {e}")
+        else:
+            self.lost_claims += 1
+
+    def _collect(self, futures):
+        for future in futures:
+            job = self._running.pop(future)
+            self._lease_renewed.pop(job["_id"], None)
+            error = future.exception()
+            if error is not None:
+                self._record_failure(job, f"{type(error).__name__}: {error}")
+                continue
+            latency = complete_job(job)
+            if latency is None:
+                self.lost_claims += 1 # Its lease expired and another worker took it over
+                continue
+            self.completed += 1
+            self._latencies.append(latency)
+
+    def run(self, stop_event=None, max_jobs=None):
+        """Runs until stop_event is set (then finishes in-flight jobs) or max_jobs have been handled."""
+        stop_event = stop_event or threading.Event()
+        self._executor = self._make_executor()
+        try:
+            with self.app.app_context():
+                ensure_indexes_once()
+                while not stop_event.is_set():
+                    if max_jobs is not None and self.completed + self.retried + self.failed >= max_jobs:
+                        break
+                    if time.monotonic() - self._last_reclaim >= self.poll_seconds:
+                        requeue_expired_leases()
+                        self._last_reclaim = time.monotonic()
+                    claimed = self._claim_available()
+                    self._renew_leases()
+                    if self._running:
+                        done, _ = wait(list(self._running), timeout=0 if claimed else self.poll_seconds,
+                                       return_when=FIRST_COMPLETED)
+                        self._collect(done)
+                    elif not claimed:
+                        stop_event.wait(self.poll_seconds)
+                while self._running: # Drain: a stopped worker still records the outcome of what it started
+                    done, _ = wait(list(self._running), timeout=self.poll_seconds, return_when=FIRST_COMPLETED)
+                    self._renew_leases()
+                    self._collect(done)
+        finally:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def snapshot(self):
+        waits = sorted(wait_ms for wait_ms, _ in self._latencies)
+        runs = sorted(run_ms for _, run_ms in self._latencies)
+        return {"worker": self.name, "executor": self.executor_kind, "concurrency": self.concurrency,
+                "limits": dict(self.limits), "inFlight": len(self._running), "completed": self.completed,
+                "retried": self.retried, "failed": self.failed, "lostClaims": self.lost_claims,
+                "waitMs": _summary(waits), "runMs": _summary(runs)}
+
+
+def parse_concurrency(setting):
+    """'purge=4,image-variants=2' -> {"purge": 4, "image-variants": 2}"""
+    limits = {}
+    for part in (setting or "").split(","):
+        job_type, _, value = part.strip().partition("=")
+        if job_type and value:
+            limits[job_type.strip()] = int(value)
+    return limits
+
+
+def _summary(sorted_values):
+    if not sorted_values:
+        return {"count": 0, "avg": None, "p50": None, "p95": None, "max": None}
+    count = len(sorted_values)
+    return {"count": count, "avg": round(sum(sorted_values) / count, 3),
+            "p50": round(sorted_values[(count - 1) // 2], 3),
+            "p95": round(sorted_values[min(count - 1, int(count * 0.95))], 3), "max": round(sorted_values[-1], 3)}
+
+
+def get_job_queue_metrics(window_seconds=3600):
+    """
+    Queue depth per type (queued, of which ready now, running, and the age of the oldest ready
+    job) plus wait/run latency and failures for jobs finished within window_seconds.
+    """
+    now = _now()
+    jobs = _jobs_collection()
+    depth = {}
+    for row in jobs.aggregate([{"$match": {"status": {"$in": ["queued", "running"]}}},
+                               {"$group": {"_id": {"type": "$type", "status": "$status"}, "count": {"$sum": 1}}}]):
+        entry = depth.setdefault(row["_id"]["type"], {"queued": 0, "ready": 0, "running": 0, "oldestReadyAgeSeconds": None})
+        entry[row["_id"]["status"]] = row["count"]
+    for row in jobs.aggregate([{"$match": {"status": "queued", "run_at": {"$lte": now}}},
+                               {"$group": {"_id": "$type", "count": {"$sum": 1}, "oldest": {"$min": "$run_at"}}}]):
+        entry = depth.setdefault(row["_id"], {"queued": 0, "ready": 0, "running": 0, "oldestReadyAgeSeconds": None})
+        entry["ready"] = row["count"]
+        entry["oldestReadyAgeSeconds"] = round((now - _as_utc(row["oldest"])).total_seconds(), 3)
+
+    since = now - timedelta(seconds=window_seconds)
+    latency = {}
+    recent = jobs.find({"status": {"$in": ["done", "failed"]}, "finished_at": {"$gte": since}},
+                       {"type": 1, "status": 1, "wait_ms": 1, "run_ms": 1}).sort("finished_at", -1).limit(10 * LATENCY_SAMPLE_SIZE)
+    for doc in recent:
+        entry = latency.setdefault(doc["type"], {"done": 0, "failed": 0, "waits": [], "runs": []})
+        entry[doc["status"]] += 1
+        if doc["status"] == "done":
+            entry["waits"].append(doc.get("wait_ms", 0))
+            entry["runs"].append(doc.get("run_ms", 0))
+    finished = {job_type: {"done": entry["done"], "failed": entry["failed"],
+                           "waitMs": _summary(sorted(entry["waits"])), "runMs": _summary(sorted(entry["runs"]))}
+                for job_type, entry in latency.items()}
+    return {"depth": depth, "windowSeconds": window_seconds, "finished": finished}
@@ -0,0 +1,109 @@
+# app/services/object_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from app.services.invalidation_bus import INVALIDATION_BUS
+
+# Per-process cache of the user-independent serialized form of individual documents
+# (Post.to_dict / Community.to_dict). Entries are keyed by (_id, version) where the
+# version is a timestamp only content edits move (posts: content_updated_at, communities:
+# contentUpdatedAt), so an edited document simply misses and the old entry ages out of the LRU. Counters and per-user fields are not cached; the
+# serializers copy them from the live document on every call.
+
+
+def _approx_size(value):
+    """Rough byte size of a serialized dict (strings dominate); cheap enough to run on every miss."""
+    if isinstance(value, dict):
+        return 64 + sum(len(k) + _approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(_approx_size(v) for v in value)
+    if isinstance(value, str):
+        return 49 + len(value)
+    return 32
+
+
+class VersionedObjectCache:
+    """Thread-safe LRU of id -> (version, built_at, value, size), bounded by entry count and approximate bytes."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_build(self, object_id, version, build):
+        config = current_app.config
+        if not config.get('OBJECT_CACHE_ENABLED', True):
+            return build()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(object_id)
+            # Also expire by age so data pulled from other collections (e.g. the author's name) refreshes.
+            if entry is not None and entry[0] == version and now - entry[1] < config['OBJECT_CACHE_MAX_AGE_SECONDS']:
+                self._entries.move_to_end(object_id)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        value = build()
+        size = _approx_size(value)
+        with self._lock:
+            if object_id in self._entries:
+                self._drop(object_id)
+            self._entries[object_id] = (version, now, value, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > config['OBJECT_CACHE_MAX_ENTRIES']
+                                     or self._bytes > config['OBJECT_CACHE_MAX_BYTES']):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return value
+
+    def invalidate(self, object_id):
+        with self._lock:
+            if object_id in self._entries:
+                self._drop(object_id)
+
+    def invalidate_where(self, predicate):
+        """Drops every entry whose value matches predicate(value). O(entries); for rare events like profile edits."""
+        with self._lock:
+            for object_id in [oid for oid, entry in self._entries.items() if predicate(entry[2])]:
+                self._drop(object_id)
+
+    def clear(self):
+        """Drops all entries and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def _drop(self, object_id):
+        self._bytes -= self._entries.pop(object_id)[3]
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "approxBytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRatio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+POST_CACHE = VersionedObjectCache('posts')
+COMMUNITY_CACHE = VersionedObjectCache('communities')
+# Edits bump the version and so never need a broadcast; only embedded author details do.
+INVALIDATION_BUS.register('user', lambda *user_ids: POST_CACHE.invalidate_where(
+    lambda value: str(value.get("author", {}).get("id")) in user_ids))
+
+
+def get_object_cache_metrics():
+    return {cache.name: cache.snapshot() for cache in (POST_CACHE, COMMUNITY_CACHE)}
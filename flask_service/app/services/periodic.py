@@ -0,0 +1,63 @@
+# app/services/periodic.py
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+from app import mongo
+
+# Maintenance work that should run every N seconds somewhere in the deployment (upload GC,
+# purging soft-deleted content). Every worker process runs a timer thread, and a lease in
+# `maintenance_leases` lets only one of them, across all nodes, do the work per interval.
+
+
+def acquire_lease(name, holder, seconds):
+    """True if `holder` now holds the lease `name` for `seconds`; False while another holder's lease is unexpired."""
+    now = datetime.now(timezone.utc)
+    try:
+        mongo.db.maintenance_leases.find_one_and_update(
+            {"_id": name, "expires_at": {"$lt": now}},
+            {"$set": {"holder": holder, "expires_at": now + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False # The upsert collided with the unexpired lease
+
+
+class PeriodicTask:
+    def __init__(self, name, run):
+        self.name = name
+        self._run_once = run
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_running(self, app, interval):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid() # Threads do not survive a fork; start one per worker
+            self._thread = threading.Thread(target=self._loop, args=(app, interval), name=self.name, daemon=True)
+            self._thread.start()
+
+    def _loop(self, app, interval):
+        holder = f"{socket.gethostname()}:{os.getpid()}"
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    if acquire_lease(self.name, holder, interval):
+                        self._run_once()
+                except Exception as e:
+                    app.logger.warning(f"Periodic task {self.name} failed: {e}")
+
+    def init_app(self, app, interval):
+        """Starts the timer in each worker on its first request; interval <= 0 disables it."""
+        if interval > 0:
+            app.before_request(lambda: self.ensure_running(app, interval))
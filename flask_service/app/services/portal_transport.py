@@ -0,0 +1,189 @@
+# app/services/portal_transport.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from app.config import Config
+
+# Process-wide HTTP transport for talking to the college portal.
+# One HTTPAdapter (and so one urllib3 pool of keep-alive connections) is shared by
+# every login; each login still gets its own requests.Session and therefore its own
+# cookie jar, so students' portal sessions never mix.
+
+
+class TransportMetrics:
+    """Thread-safe counters for connection reuse on the shared portal transport."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.connections_opened = 0
+            self.connect_seconds_total = 0.0
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connect(self, elapsed_seconds):
+        with self._lock:
+            self.connections_opened += 1
+            self.connect_seconds_total += elapsed_seconds
+
+    def snapshot(self):
+        with self._lock:
+            requests_sent = self.requests
+            opened = self.connections_opened
+            connect_total = self.connect_seconds_total
+        reused = max(0, requests_sent - opened)
+        avg_connect_ms = (connect_total / opened * 1000) if opened else 0.0
+        return {
+            "requests": requests_sent,
+            "connectionsOpened": opened,
+            "connectionsReused": reused,
+            "reuseRatio": round(reused / requests_sent, 3) if requests_sent else 0.0,
+            "avgHandshakeMs": round(avg_connect_ms, 3),
+            # Every reused connection skipped a TCP (+TLS) handshake of roughly average cost.
+            "estimatedHandshakeMsSaved": round(reused * avg_connect_ms, 3),
+        }
+
+
+TRANSPORT_METRICS = TransportMetrics()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        TRANSPORT_METRICS.record_connect(time.perf_counter() - start)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter() # Includes the TLS handshake
+        super().connect()
+        TRANSPORT_METRICS.record_connect(time.perf_counter() - start)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class PooledPortalAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools time new connections and count requests for TRANSPORT_METRICS."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+    def send(self, request, *args, **kwargs):
+        TRANSPORT_METRICS.record_request()
+        return super().send(request, *args, **kwargs)
+
+
+_shared_adapter = None
+_shared_adapter_lock = threading.Lock()
+
+
+def get_shared_adapter():
+    """Returns the process-wide adapter, creating it from Config on first use."""
+    global _shared_adapter
+    if _shared_adapter is None:
+        with _shared_adapter_lock:
+            if _shared_adapter is None:
+                _shared_adapter = PooledPortalAdapter(
+                    pool_connections=Config.SCRAPER_POOL_CONNECTIONS,
+                    pool_maxsize=Config.SCRAPER_POOL_MAXSIZE,
+                    pool_block=Config.SCRAPER_POOL_BLOCK,
+                    max_retries=0,
+                )
+    return _shared_adapter
+
+
+def reset_shared_adapter():
+    """Drops all pooled connections (e.g. after a fork or when COLLEGE_* settings change)."""
+    global _shared_adapter
+    with _shared_adapter_lock:
+        if _shared_adapter is not None:
+            _shared_adapter.close()
+        _shared_adapter = None
+
+
+_page_fetch_pool = None
+_page_fetch_pool_lock = threading.Lock()
+
+
+def _fetch_session(session):
+    """
+    A Session sharing `session`'s adapters and headers with a copy of its cookie jar, so a
+    page fetch never touches the login's jar (RequestsCookieJar is not thread-safe) while the
+    calling thread keeps using it. Cookies the page sets stay in the copy.
+    """
+    fetch_session = requests.Session()
+    fetch_session.adapters = session.adapters
+    fetch_session.headers = session.headers.copy()
+    fetch_session.cookies = session.cookies.copy()
+    return fetch_session
+
+
+def submit_page_fetch(session, url, headers):
+    """
+    GETs `url` with `session`'s authenticated cookies from a small process-wide thread pool and
+    returns the Future. Used to download independent post-login pages concurrently; callers
+    settle_page_fetches() every Future before leaving portal_session().
+    """
+    global _page_fetch_pool
+    if _page_fetch_pool is None:
+        with _page_fetch_pool_lock:
+            if _page_fetch_pool is None:
+                _page_fetch_pool = ThreadPoolExecutor(
+                    max_workers=Config.SCRAPER_PAGE_FETCH_WORKERS,
+                    thread_name_prefix='portal-page-fetch'
+                )
+    fetch_session = _fetch_session(session) # Copied now, on the caller's thread
+    return _page_fetch_pool.submit(fetch_session.get, url, headers=headers, verify=False) # Bypass SSL verification, as elsewhere
+
+
+def settle_page_fetches(futures):
+    """Cancels page fetches that have not started and waits for the running ones."""
+    for future in futures:
+        future.cancel()
+    wait(futures)
+
+
+def get_transport_metrics():
+    return TRANSPORT_METRICS.snapshot()
+
+
+@contextmanager
+def portal_session():
+    """
+    Yields a requests.Session with a fresh cookie jar that sends its traffic over
+    the shared connection pool. The session is deliberately not closed on exit,
+    since Session.close() would tear down the shared adapter's connections.
+    """
+    session = requests.Session()
+    adapter = get_shared_adapter()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'User-Agent': Config.SCRAPER_USER_AGENT})
+    try:
+        yield session
+    finally:
+        session.cookies.clear()
@@ -0,0 +1,161 @@
+# app/services/purger.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from flask import current_app
+
+from app import mongo
+from app.models.upload import Upload
+from app.services.job_queue import enqueue, register_job_handler
+from app.services.periodic import PeriodicTask
+from app.services.response_cache import invalidate_post
+
+# Deleting a post or comment only sets `deleted_at` (reads filter on it), so the DELETE
+# request does constant work. The cascade happens here, in bounded steps:
+#   post    - its comments are deleted in batches, then its image is released (once, guarded
+#             by `media_released_at`) for the upload sweeper, then the post itself is deleted.
+#   comment - its live replies are soft-deleted in batches, which queues them for their own
+#             purge, and the post's comment_count drops by the number hidden; then the comment
+#             itself is deleted.
+# Every step is idempotent and all state lives in the documents, so an interrupted purge
+# resumes on the next run_purge_pass(). A reply batch is journaled on the deleted comment
+# (`purge_batch`) and its token recorded on the post (`purge_tokens`), so a retried batch
+# never moves comment_count twice.
+
+PURGE_COLLECTIONS = ("posts", "comments")
+APPLIED_TOKENS_KEPT = 20
+
+
+def _purge_post_step(post_id, batch_size):
+    posts, comments = mongo.db.posts, mongo.db.comments
+    post = posts.find_one({"_id": post_id, "deleted_at": {"$type": "date"}}, {"image_url": 1, "media_released_at": 1})
+    if post is None:
+        return True # Already purged, or restored
+    comment_ids = [doc["_id"] for doc in comments.find({"post_id": post_id}, {"_id": 1}).limit(batch_size)]
+    if comment_ids:
+        comments.delete_many({"_id": {"$in": comment_ids}}) # Votes are embedded, so they go with the comments
+        return False
+    if post.get("media_released_at") is None:
+        released = posts.update_one({"_id": post_id, "media_released_at": None},
+                                    {"$set": {"media_released_at": datetime.now(timezone.utc)}})
+        if released.modified_count:
+            Upload.release(post.get("image_url")) # The upload sweeper deletes the file after its grace period
+    posts.delete_one({"_id": post_id, "deleted_at": {"$type": "date"}})
+    invalidate_post(post_id)
+    return True
+
+
+def _purge_comment_step(comment_id, batch_size):
+    comments = mongo.db.comments
+    comment = comments.find_one({"_id": comment_id, "deleted_at": {"$type": "date"}},
+                                {"post_id": 1, "purge_batch": 1})
+    if comment is None:
+        return True
+    batch = comment.get("purge_batch")
+    if batch is None:
+        reply_ids = [doc["_id"] for doc in comments.find({"parent_comment_id": comment_id, "deleted_at": None},
+                                                         {"_id": 1}).limit(batch_size)]
+        if not reply_ids:
+            comments.delete_one({"_id": comment_id, "deleted_at": {"$type": "date"}})
+            return True
+        batch = {"token": ObjectId(), "ids": reply_ids}
+        comments.update_one({"_id": comment_id}, {"$set": {"purge_batch": batch}})
+
+    token = batch["token"]
+    comments.update_many({"_id": {"$in": batch["ids"]}, "deleted_at": None},
+                         {"$set": {"deleted_at": datetime.now(timezone.utc), "deleted_by_purge": token}})
+    hidden = comments.count_documents({"_id": {"$in": batch["ids"]}, "deleted_by_purge": token})
+    post_id = comment.get("post_id")
+    if hidden and post_id:
+        applied = mongo.db.posts.update_one(
+            {"_id": post_id, "purge_tokens": {"$ne": token}},
+            {"$inc": {"comment_count": -hidden},
+             "$push": {"purge_tokens": {"$each": [token], "$slice": -APPLIED_TOKENS_KEPT}}}
+        )
+        if applied.modified_count:
+            invalidate_post(post_id)
+    comments.update_one({"_id": comment_id}, {"$unset": {"purge_batch": ""}})
+    return False
+
+
+_STEPS = {"posts": _purge_post_step, "comments": _purge_comment_step}
+
+
+def purge_document(collection_name, doc_id, batch_size=None, pause_seconds=None):
+    """Runs purge steps for one soft-deleted post or comment until it is gone; returns the steps taken."""
+    config = current_app.config
+    batch_size = batch_size or config['PURGE_BATCH_SIZE']
+    pause_seconds = config['PURGE_BATCH_PAUSE_SECONDS'] if pause_seconds is None else pause_seconds
+    step = _STEPS[collection_name]
+    steps = 1
+    while not step(ObjectId(doc_id), batch_size):
+        steps += 1
+        if pause_seconds:
+            time.sleep(pause_seconds) # Leave room for request traffic between batches
+    return steps
+
+
+def run_purge_pass(max_documents=None, batch_size=None):
+    """
+    Purges every soft-deleted post and comment, oldest deletion first; this is also what
+    resumes purges interrupted by a crash or restart. Returns {collection: documents purged}.
+    Comments soft-deleted by a cascade during the pass are picked up by the next one.
+    """
+    max_documents = max_documents or current_app.config['PURGE_MAX_DOCUMENTS_PER_PASS']
+    purged = {name: 0 for name in PURGE_COLLECTIONS}
+    for name in PURGE_COLLECTIONS:
+        pending = mongo.db[name].find({"deleted_at": {"$type": "date"}}, {"_id": 1}).sort("deleted_at", 1).limit(max_documents)
+        for doc in list(pending):
+            purge_document(name, doc["_id"], batch_size=batch_size)
+            purged[name] += 1
+    if any(purged.values()):
+        current_app.logger.info(f"Purge pass removed {purged['posts']} posts and {purged['comments']} comments")
+    return purged
+
+
+def _run_job(app, collection_name, doc_id):
+    with app.app_context():
+        try:
+            return purge_document(collection_name, doc_id)
+        except Exception as e: # The periodic pass retries it
+            app.logger.warning(f"Purge of {collection_name} {doc_id} failed, will resume on the next pass: {e}")
+            return None
+
+
+_purge_pool = None
+_purge_pool_lock = threading.Lock()
+
+
+def schedule_purge(collection_name, doc_id):
+    """
+    Starts purging a just soft-deleted document on the background pool (returns the Future),
+    or queues it for `flask worker` with JOB_QUEUE_ENABLED (returns the job id). None when off.
+    """
+    global _purge_pool
+    if not current_app.config.get('PURGE_ON_DELETE', True):
+        return None
+    if current_app.config.get('JOB_QUEUE_ENABLED'):
+        return enqueue("purge", {"collection": collection_name, "id": str(doc_id)},
+                       dedupe_key=f"purge:{collection_name}:{doc_id}")
+    if _purge_pool is None:
+        with _purge_pool_lock:
+            if _purge_pool is None:
+                _purge_pool = ThreadPoolExecutor(max_workers=current_app.config['PURGE_WORKERS'],
+                                                 thread_name_prefix='purger')
+    return _purge_pool.submit(_run_job, current_app._get_current_object(), collection_name, doc_id)
+
+
+def _purge_job(payload):
+    purge_document(payload["collection"], payload["id"])
+
+
+register_job_handler("purge", _purge_job, concurrency=2)
+
+_PURGE_TASK = PeriodicTask("purge-deleted", run_purge_pass)
+
+
+def init_purger(app):
+    _PURGE_TASK.init_app(app, app.config.get('PURGE_INTERVAL_SECONDS', 0))
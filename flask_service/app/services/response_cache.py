@@ -0,0 +1,132 @@
+# app/services/response_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from app.services.invalidation_bus import INVALIDATION_BUS
+
+# Per-process cache of the user-independent part of read-mostly API responses
+# (community list/detail, community post pages). Entries are tagged with the
+# documents they were built from ("community:<id>", "post:<id>", "communities")
+# and model writes drop every entry carrying an affected tag, in every worker
+# (via the invalidation bus). Per-user fields
+# (is_member, user_vote) are never cached; routes overlay them after the read.
+
+
+def cache_key(route, **params):
+    """Stable key from a route name and its already-normalized query parameters."""
+    parts = [route] + [f"{name}={params[name]}" for name in sorted(params) if params[name] is not None]
+    return "|".join(parts)
+
+
+class ResponseCache:
+    """Thread-safe TTL + LRU map from cache_key to payload, with tag-based invalidation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # key -> (expires_at, payload, tags)
+        self._keys_by_tag = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, payload, ttl_seconds, tags=(), max_entries=1024):
+        tags = frozenset(tags)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl_seconds, payload, tags)
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in self._keys_by_tag.pop(tag, ()):
+                    if key in self._entries:
+                        self._drop(key)
+                        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def _drop(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRatio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+RESPONSE_CACHE = ResponseCache()
+INVALIDATION_BUS.register('response-tags', RESPONSE_CACHE.invalidate)
+INVALIDATION_BUS.register('user', lambda *user_ids: RESPONSE_CACHE.invalidate(*[f"user:{user_id}" for user_id in user_ids]))
+
+
+def cached_payload(key, build, tags_for):
+    """
+    Returns (payload, was_cached). On a miss calls build(); payloads that are not None
+    are stored for RESPONSE_CACHE_TTL_SECONDS under the tags returned by tags_for(payload).
+    """
+    config = current_app.config
+    if not config.get('RESPONSE_CACHE_ENABLED', True):
+        return build(), False
+    payload = RESPONSE_CACHE.get(key)
+    if payload is not None:
+        return payload, True
+    payload = build()
+    if payload is not None:
+        RESPONSE_CACHE.set(key, payload, config['RESPONSE_CACHE_TTL_SECONDS'], tags_for(payload),
+                           max_entries=config['RESPONSE_CACHE_MAX_ENTRIES'])
+    return payload, False
+
+
+def invalidate_community(community_id):
+    """A community's own fields or its post list changed (also drops the community listings)."""
+    INVALIDATION_BUS.publish('response-tags', f"community:{community_id}", "communities")
+
+
+def invalidate_post(*post_ids):
+    """Posts' counters or content changed; drops every cached page that lists them."""
+    INVALIDATION_BUS.publish('response-tags', *[f"post:{post_id}" for post_id in post_ids])
+
+
+def invalidate_user(user_id):
+    """A user's name/avatar changed; drops cached pages and serialized posts that embed them."""
+    INVALIDATION_BUS.publish('user', user_id)
+
+
+def get_response_cache_metrics():
+    return RESPONSE_CACHE.snapshot()
@@ -0,0 +1,194 @@
+# app/services/timelines.py
+import threading
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from flask import current_app
+
+from app import mongo
+from app.services.job_queue import enqueue, register_job_handler
+
+# Materialized home timelines for the "new" feed (fan-out on write), used for small communities only.
+# A user's document in `timelines` holds the newest TIMELINE_MAX_ENTRIES {post_id, community_id,
+# created_at} of the communities listed in its `covered` array, newest first. Post.create_post
+# pushes the new post onto every timeline covering its community: one update_many, bounded
+# because only communities under TIMELINE_FANOUT_MAX_MEMBERS are covered. Every push uses
+# $sort/$slice, so a timeline never grows past its cap. A community that has grown to the
+# threshold is dropped from every `covered` array on its next post instead; from then on the feed
+# reads it at request time like any large community (home_feed.py merges both).
+# Invariant the reader relies on: a timeline holding fewer than TIMELINE_MAX_ENTRIES entries has
+# every post of its covered communities; a full one has everything newer than its oldest entry.
+# Timelines are built on a user's first feed read, extended on join (a backfill job), uncovered
+# on leave, and expire after TIMELINE_IDLE_DAYS without a read (rebuilt on the next one).
+# A post is held at most once: fan-out and backfill can race on the same post, and a duplicate
+# would take a slot from an older post while the timeline still counted as holding it.
+
+# read_at is only moved forward once it is this fraction of TIMELINE_IDLE_DAYS old, so feed reads stay reads
+READ_AT_REFRESH_FRACTION = 0.1
+
+_indexes_lock = threading.Lock()
+_indexes_ready_for = None # The database ensure_indexes() last ran against in this process
+
+
+def _timelines():
+    ensure_indexes_once()
+    return mongo.db.timelines
+
+
+def ensure_indexes():
+    timelines = mongo.db.timelines
+    timelines.create_index([("covered", 1)]) # Fan-out: every timeline that covers a community
+    timelines.create_index("read_at", expireAfterSeconds=current_app.config['TIMELINE_IDLE_DAYS'] * 24 * 3600)
+
+
+def ensure_indexes_once():
+    """
+    Runs ensure_indexes() the first time this process touches timelines. Without the covered index
+    every fan-out scans the collection, and without the read_at TTL idle timelines are never dropped.
+    """
+    global _indexes_ready_for
+    database = mongo.db
+    if _indexes_ready_for is database:
+        return
+    with _indexes_lock:
+        if _indexes_ready_for is not database:
+            ensure_indexes()
+            _indexes_ready_for = database
+
+
+def fanout_enabled():
+    return current_app.config.get('TIMELINE_FANOUT_MAX_MEMBERS', 0) > 0
+
+
+def _is_small(community_doc):
+    return community_doc.get("memberCount", 0) < current_app.config['TIMELINE_FANOUT_MAX_MEMBERS']
+
+
+def _entry(post_doc):
+    return {"post_id": post_doc["_id"], "community_id": post_doc["community_id"], "created_at": post_doc["created_at"]}
+
+
+def _push(entries):
+    return {"$push": {"entries": {"$each": entries, "$sort": {"created_at": -1, "post_id": -1},
+                                  "$slice": current_app.config['TIMELINE_MAX_ENTRIES']}}}
+
+
+def fanout_post(post_doc):
+    """Pushes a new post onto the timelines covering its community; returns the number of timelines written."""
+    community_id = post_doc["community_id"]
+    community = mongo.db.communities.find_one({"_id": community_id}, {"memberCount": 1})
+    if community is None:
+        return 0
+    if not _is_small(community): # Grown past the threshold: readers query it directly from now on
+        _timelines().update_many({"covered": community_id}, {"$pull": {"covered": community_id}})
+        return 0
+    return _timelines().update_many({"covered": community_id, "entries.post_id": {"$ne": post_doc["_id"]}},
+                                    _push([_entry(post_doc)])).modified_count
+
+
+def schedule_fanout(post_doc):
+    """Fans a new post out inline, or as a job with JOB_QUEUE_ENABLED; None when timelines are off."""
+    if not fanout_enabled():
+        return None
+    if current_app.config.get('JOB_QUEUE_ENABLED'):
+        return enqueue("timeline-fanout", {"post_id": str(post_doc["_id"])})
+    return fanout_post(post_doc)
+
+
+def _push_new(user_id, entries):
+    """
+    Pushes the entries the user's timeline does not hold yet. The $nin guard fails the push when
+    a racing fan-out got one of them in first; the retry leaves that one out.
+    """
+    while entries:
+        doc = _timelines().find_one({"_id": user_id}, {"entries.post_id": 1})
+        if doc is None:
+            return
+        held = {entry["post_id"] for entry in doc.get("entries", [])}
+        entries = [entry for entry in entries if entry["post_id"] not in held]
+        if not entries:
+            return
+        guard = {"_id": user_id, "entries.post_id": {"$nin": [entry["post_id"] for entry in entries]}}
+        if _timelines().update_one(guard, _push(entries)).matched_count:
+            return
+
+
+def _recent_entries(community_ids):
+    from app.services.home_feed import query_posts # home_feed imports the models, which import this module
+    docs = query_posts(community_ids, "created_at", None, current_app.config['TIMELINE_MAX_ENTRIES'])
+    return [_entry(doc) for doc in docs]
+
+
+def backfill(user_id, community_id):
+    """Covers a just-joined small community in the user's existing timeline and copies in its recent posts."""
+    user_id, community_id = ObjectId(user_id), ObjectId(community_id)
+    community = mongo.db.communities.find_one({"_id": community_id, "members": user_id}, {"memberCount": 1})
+    if community is None or not _is_small(community):
+        return False
+    # Cover first, then copy: a post created in between is pushed by its fan-out or by the copy,
+    # whichever comes first, whereas the other order could miss it
+    result = _timelines().update_one({"_id": user_id}, {"$addToSet": {"covered": community_id}})
+    if result.matched_count == 0:
+        return False # Built with this community on the user's next read
+    _push_new(user_id, _recent_entries([community_id]))
+    return True
+
+
+def schedule_backfill(user_id, community_id):
+    if not fanout_enabled():
+        return None
+    if current_app.config.get('JOB_QUEUE_ENABLED'):
+        return enqueue("timeline-backfill", {"user_id": str(user_id), "community_id": str(community_id)},
+                       dedupe_key=f"timeline-backfill:{user_id}:{community_id}")
+    return backfill(user_id, community_id)
+
+
+def remove_community(user_id, community_id):
+    """
+    On leave: the community stops being covered. Its entries stay until trimmed (readers skip them):
+    pulling them would shrink a full timeline below the cap without restoring what it trimmed.
+    """
+    if not fanout_enabled():
+        return
+    _timelines().update_one({"_id": ObjectId(user_id)}, {"$pull": {"covered": ObjectId(community_id)}})
+
+
+def load_timeline(user_id, joined_communities):
+    """
+    The user's timeline document, built on first use. joined_communities: [{"_id", "memberCount"}].
+    Returns {"covered": set of community ids, "entries": [...], "complete": bool}, where complete
+    means the entries hold every post of the covered communities (the timeline is not full).
+    """
+    user_id = ObjectId(user_id)
+    now = datetime.now(timezone.utc)
+    doc = _timelines().find_one({"_id": user_id})
+    if doc is None:
+        covered = [community["_id"] for community in joined_communities if _is_small(community)]
+        _timelines().update_one({"_id": user_id}, {"$setOnInsert": {"covered": covered, "entries": []},
+                                                   "$set": {"read_at": now}}, upsert=True)
+        _push_new(user_id, _recent_entries(covered))
+        doc = _timelines().find_one({"_id": user_id})
+    else:
+        stale = now - timedelta(days=current_app.config['TIMELINE_IDLE_DAYS'] * READ_AT_REFRESH_FRACTION)
+        read_at = doc.get("read_at")
+        if read_at is None or read_at.replace(tzinfo=read_at.tzinfo or timezone.utc) < stale:
+            # The filter keeps concurrent reads from all writing it
+            _timelines().update_one({"_id": user_id, "read_at": {"$not": {"$gte": stale}}}, {"$set": {"read_at": now}})
+    entries = doc.get("entries", [])
+    return {"covered": set(doc.get("covered", [])), "entries": entries,
+            "complete": len(entries) < current_app.config['TIMELINE_MAX_ENTRIES']}
+
+
+def _fanout_job(payload):
+    post = mongo.db.posts.find_one({"_id": ObjectId(payload["post_id"]), "deleted_at": None},
+                                   {"community_id": 1, "created_at": 1})
+    if post:
+        fanout_post(post)
+
+
+def _backfill_job(payload):
+    backfill(payload["user_id"], payload["community_id"])
+
+
+register_job_handler("timeline-fanout", _fanout_job, concurrency=4, priority=8) # New posts should show up promptly
+register_job_handler("timeline-backfill", _backfill_job, concurrency=2, priority=5)
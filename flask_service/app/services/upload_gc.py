@@ -0,0 +1,154 @@
+# app/services/upload_gc.py
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+
+from app import mongo
+from app.models.upload import Upload
+from app.services.periodic import PeriodicTask
+from app.services.upload_storage import get_storage
+
+# Deletes stored uploads that nothing points at any more: replaced community icons/banners
+# and post images, images of deleted posts, abandoned upload spools, and their variants.
+# The documents are the source of truth. Every URL in REFERENCE_FIELDS is mapped to its
+# storage key, and an object is kept when its name stem (the part before the first dot,
+# shared by an original and all of its <stem>.<variant>.<ext> files) is referenced.
+# An unreferenced object is only deleted when it is older than the grace period, and, for
+# content-addressed blobs, when its `uploads` record was not uploaded again or released
+# within the grace period and has no references counted. That covers files uploaded but
+# not yet attached to a post and URLs reused while the sweep runs.
+# Run it with `flask gc-uploads` (cron) or in the background with UPLOAD_GC_INTERVAL_SECONDS.
+
+REFERENCE_FIELDS = {
+    "communities": ("iconUrl", "bannerImage"),
+    "posts": ("image_url",),
+    "users": ("avatar",),
+}
+REPORT_SAMPLE_SIZE = 20
+SHA256_STEM = re.compile(r'^[0-9a-f]{64}$')
+
+
+def _object_stem(key):
+    directory, _, filename = key.rpartition('/')
+    return f"{directory}/{filename.split('.', 1)[0]}"
+
+
+def referenced_stems(storage):
+    """Stems of every stored object a document field refers to."""
+    stems = set()
+    for collection_name, fields in REFERENCE_FIELDS.items():
+        query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+        for doc in mongo.db[collection_name].find(query, {field: 1 for field in fields}).batch_size(1000):
+            for field in fields:
+                key = storage.key_for_url(doc.get(field))
+                if key:
+                    stems.add(_object_stem(key))
+    return stems
+
+
+def _blob_sha(key):
+    """SHA-256 of a content-addressed blob or one of its variants, else None."""
+    stem = _object_stem(key).rpartition('/')[2]
+    return stem if SHA256_STEM.match(stem) else None
+
+
+def _delete_batch(storage, batch, cutoff, dry_run, report):
+    """batch: [(key, size)]. Re-checks tracked blobs against their records, then deletes."""
+    shas = {key: _blob_sha(key) for key, _ in batch}
+    tracked = list({sha for sha in shas.values() if sha})
+    keep = set()
+    if tracked:
+        recent = {"$or": [{"refcount": {"$gt": 0}}, {"last_uploaded_at": {"$gte": cutoff}},
+                          {"last_released_at": {"$gte": cutoff}}]}
+        keep = {doc["_id"] for doc in Upload.get_collection().find({"_id": {"$in": tracked}, **recent}, {"_id": 1})}
+        report["keptByRecord"] += len(keep)
+        if not dry_run:
+            # Records go first, so a re-upload from here on records the blob anew and writes its bytes;
+            # each object is checked against its record again right before it is deleted
+            Upload.get_collection().delete_many({"_id": {"$in": [sha for sha in tracked if sha not in keep]},
+                                                 "refcount": {"$lte": 0}, "last_uploaded_at": {"$lt": cutoff},
+                                                 "last_released_at": {"$lt": cutoff}})
+
+    for key, size in batch:
+        if shas[key] in keep:
+            continue
+        if not dry_run and shas[key] and Upload.get_collection().find_one({"_id": shas[key]}, {"_id": 1}):
+            keep.add(shas[key]) # Uploaded again since its record was deleted: the bytes are live
+            report["keptByRecord"] += 1
+            continue
+        report["orphans"] += 1
+        if len(report["sample"]) < REPORT_SAMPLE_SIZE:
+            report["sample"].append(key)
+        if dry_run:
+            report["reclaimableBytes"] += size
+            continue
+        try:
+            storage.delete(key)
+            report["deleted"] += 1
+            report["reclaimedBytes"] += size
+        except Exception as e:
+            report["errors"] += 1
+            current_app.logger.warning(f"Upload GC could not delete {key}: {e}")
+    report["batches"] += 1
+
+
+def sweep_orphaned_uploads(dry_run=None, grace_seconds=None, batch_size=None, pause_seconds=None, max_batches=None):
+    """
+    One full pass over the storage backend. Returns (and stores in `upload_gc_runs`) a report
+    with counts, the bytes reclaimed (or reclaimable in a dry run) and a sample of orphan keys.
+    """
+    config = current_app.config
+    dry_run = config['UPLOAD_GC_DRY_RUN'] if dry_run is None else dry_run
+    grace_seconds = config['UPLOAD_GC_GRACE_HOURS'] * 3600 if grace_seconds is None else grace_seconds
+    batch_size = batch_size or config['UPLOAD_GC_BATCH_SIZE']
+    pause_seconds = config['UPLOAD_GC_BATCH_PAUSE_SECONDS'] if pause_seconds is None else pause_seconds
+    storage = get_storage()
+    started_at = datetime.now(timezone.utc)
+    cutoff = started_at - timedelta(seconds=grace_seconds)
+    report = {"dryRun": dry_run, "startedAt": started_at, "graceSeconds": grace_seconds, "scanned": 0,
+              "scannedBytes": 0, "referenced": 0, "withinGrace": 0, "keptByRecord": 0, "orphans": 0,
+              "deleted": 0, "reclaimedBytes": 0, "reclaimableBytes": 0, "errors": 0, "batches": 0,
+              "complete": True, "sample": []}
+
+    stems = referenced_stems(storage)
+    batch = []
+    for key, size, last_modified in storage.iter_objects():
+        report["scanned"] += 1
+        report["scannedBytes"] += size
+        if _object_stem(key) in stems:
+            report["referenced"] += 1
+            continue
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        if last_modified >= cutoff:
+            report["withinGrace"] += 1
+            continue
+        batch.append((key, size))
+        if len(batch) >= batch_size:
+            _delete_batch(storage, batch, cutoff, dry_run, report)
+            batch = []
+            if max_batches and report["batches"] >= max_batches:
+                report["complete"] = False # The next run picks up the rest
+                break
+            if pause_seconds:
+                time.sleep(pause_seconds) # Spread the I/O of a large backlog
+    if batch:
+        _delete_batch(storage, batch, cutoff, dry_run, report)
+
+    report["finishedAt"] = datetime.now(timezone.utc)
+    mongo.db.upload_gc_runs.insert_one(dict(report))
+    current_app.logger.info(
+        f"Upload GC {'dry run ' if dry_run else ''}scanned {report['scanned']} objects, "
+        f"{report['orphans']} orphans, reclaimed {report['reclaimedBytes']} bytes "
+        f"({report['reclaimableBytes']} reclaimable), {report['errors']} errors"
+    )
+    return report
+
+
+_SWEEPER = PeriodicTask("upload-gc", sweep_orphaned_uploads)
+
+
+def init_upload_gc(app):
+    _SWEEPER.init_app(app, app.config.get('UPLOAD_GC_INTERVAL_SECONDS', 0))
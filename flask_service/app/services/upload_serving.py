@@ -0,0 +1,73 @@
+# app/services/upload_serving.py
+import mimetypes
+import os
+import re
+
+from flask import Response, current_app, jsonify, request, send_file
+from werkzeug.security import safe_join
+
+# Serving of /<STATIC_UPLOAD_SUBPATH>/<path>. UPLOAD_SERVE_MODE selects who moves the bytes:
+#   'app'        - this worker, via send_file (sendfile(2) through the WSGI file wrapper when the
+#                  server supports it) with strong ETags, 304s and byte ranges;
+#   'x-accel'    - nginx: the response only carries X-Accel-Redirect: <UPLOAD_ACCEL_PREFIX>/<path>
+#                  and nginx serves the file from an `internal` location;
+#   'x-sendfile' - Apache/lighttpd: X-Sendfile: <absolute path>.
+# Content-addressed names (blobs/<sha[:2]>/<sha256>[.<variant>].<ext>) never change content, so
+# they get `Cache-Control: immutable` and an ETag derived from the name, which lets a matching
+# If-None-Match be answered without touching the disk.
+
+IMMUTABLE_NAME = re.compile(r'(?:^|/)([0-9a-f]{64}(?:\.[a-z0-9]+)?)\.[a-z0-9]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _immutable_etag(filename):
+    match = IMMUTABLE_NAME.search(filename)
+    return match.group(1) if match else None
+
+
+def _cache_headers(response, immutable_etag, max_age):
+    response.cache_control.public = True
+    if immutable_etag:
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+        response.set_etag(immutable_etag)
+    else:
+        response.cache_control.max_age = max_age
+    return response
+
+
+def _not_found():
+    return jsonify({"status": "error", "message": "File not found"}), 404
+
+
+def serve_upload(filename):
+    config = current_app.config
+    upload_dir = config.get('UPLOAD_FOLDER')
+    if not upload_dir:
+        current_app.logger.error("UPLOAD_FOLDER not configured for serving files.")
+        return jsonify({"status": "error", "message": "File serving not configured"}), 404
+    if not os.path.isabs(upload_dir):
+        upload_dir = os.path.join(current_app.instance_path, upload_dir)
+    path = safe_join(upload_dir, filename)
+    if path is None:
+        return _not_found()
+
+    immutable_etag = _immutable_etag(filename)
+    max_age = config['UPLOAD_CACHE_MAX_AGE']
+    if immutable_etag and request.if_none_match.contains(immutable_etag):
+        return _cache_headers(Response(status=304), immutable_etag, max_age) # Same name, same bytes: no stat needed
+
+    mode = config.get('UPLOAD_SERVE_MODE', 'app')
+    if mode in ('x-accel', 'x-sendfile'):
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        if mode == 'x-accel':
+            response.headers['X-Accel-Redirect'] = f"{config['UPLOAD_ACCEL_PREFIX'].rstrip('/')}/{filename}"
+        else:
+            response.headers['X-Sendfile'] = path
+        return _cache_headers(response, immutable_etag, max_age)
+
+    if not os.path.isfile(path):
+        return _not_found()
+    # conditional=True: 304 on If-None-Match/If-Modified-Since and 206 for Range requests
+    response = send_file(path, conditional=True, etag=immutable_etag or True, max_age=None)
+    return _cache_headers(response, immutable_etag, max_age)
@@ -0,0 +1,269 @@
+# app/services/upload_storage.py
+import base64
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from flask import current_app
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError: # Optional dependency; only needed for UPLOAD_STORAGE_BACKEND='s3'
+    boto3 = None
+
+# Where upload bytes live. Keys are paths relative to the storage root, e.g.
+# blobs/3f/3fa4...e1.png (content-addressed, see file_handler.py) or post_images/postimg_<uuid>.png
+# (legacy); the public URL is <public base>/<key>. UPLOAD_STORAGE_BACKEND selects:
+#   'local' - UPLOAD_FOLDER on this node's disk, served by /<STATIC_UPLOAD_SUBPATH>/ (upload_serving.py).
+#             Only safe with one node, or with UPLOAD_FOLDER on shared storage.
+#   's3'    - an S3-compatible bucket (AWS S3, MinIO, R2, ...) shared by every node; clients can also
+#             PUT straight to the bucket with a presigned URL so the bytes never pass through Flask.
+# UPLOAD_PUBLIC_BASE_URL (a CDN in front of either) overrides the public base. URLs under the
+# backend's own base are still recognised afterwards, so switching to a CDN keeps old URLs working.
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class LocalStorageBackend:
+    supports_direct_uploads = False
+
+    def __init__(self, root, public_base_url, alternate_base_urls=()):
+        self.root = os.path.abspath(root)
+        self.public_base_url = public_base_url.rstrip('/')
+        self._url_prefixes = [base.rstrip('/') + '/' for base in (self.public_base_url, *alternate_base_urls)]
+
+    def url(self, key):
+        return f"{self.public_base_url}/{key}"
+
+    def key_for_url(self, url):
+        """Storage key of a URL this backend serves, or None for external URLs."""
+        if not url or not isinstance(url, str):
+            return None
+        for prefix in self._url_prefixes:
+            if url.startswith(prefix):
+                key = url[len(prefix):]
+                return key if self.local_path(key) else None
+        return None
+
+    def local_path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        return path if path.startswith(self.root + os.sep) else None
+
+    def spool_dir(self, subfolder):
+        # Spools live next to their destination so the final move is a same-filesystem rename
+        directory = os.path.join(self.root, subfolder)
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def exists(self, key):
+        return os.path.exists(self.local_path(key))
+
+    def stat(self, key):
+        """{"size", "sha256"} or None when missing; sha256 is only known to object stores that keep checksums."""
+        try:
+            return {"size": os.path.getsize(self.local_path(key)), "sha256": None}
+        except FileNotFoundError:
+            return None
+
+    def put_file(self, key, source_path, content_type, cache_control=None):
+        """Moves source_path into storage at key."""
+        path = self.local_path(key)
+        if os.path.abspath(source_path) == path:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.replace(source_path, path) # Atomic on the same filesystem
+        except OSError: # Spool on another filesystem: copy beside the target, then rename
+            tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+            shutil.move(source_path, tmp_path)
+            os.replace(tmp_path, path)
+
+    def put_bytes(self, key, data, content_type, cache_control=None):
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def read_range(self, key, length):
+        with open(self.local_path(key), 'rb') as f:
+            return f.read(length)
+
+    @contextmanager
+    def local_copy(self, key):
+        """A filesystem path holding the object's bytes; files written beside it can be stored with put_file."""
+        yield self.local_path(key)
+
+    def delete(self, key):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    def iter_objects(self, prefix=""):
+        """Yields (key, size, last_modified) under prefix."""
+        top = self.local_path(prefix.rstrip('/')) if prefix else self.root
+        for directory, _, filenames in os.walk(top):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    info = os.stat(path)
+                except FileNotFoundError:
+                    continue # Removed while walking
+                key = os.path.relpath(path, self.root).replace(os.sep, '/')
+                yield key, info.st_size, datetime.fromtimestamp(info.st_mtime, timezone.utc)
+
+
+class S3StorageBackend:
+    """
+    Objects in one bucket of an S3-compatible store. endpoint_url points at non-AWS stores
+    (MinIO, R2, Ceph...); path-style addressing and only-when-required checksums keep it
+    compatible with them.
+    """
+
+    supports_direct_uploads = True
+
+    def __init__(self, bucket, endpoint_url=None, region=None, access_key_id=None, secret_access_key=None,
+                 public_base_url=None, addressing_style='path', spool_root=None, max_pool_connections=10):
+        if boto3 is None:
+            raise RuntimeError("UPLOAD_STORAGE_BACKEND='s3' requires the boto3 package.")
+        self.bucket = bucket
+        self._client = boto3.client(
+            's3', endpoint_url=endpoint_url or None, region_name=region or None,
+            aws_access_key_id=access_key_id or None, aws_secret_access_key=secret_access_key or None,
+            config=BotoConfig(signature_version='s3v4', s3={'addressing_style': addressing_style},
+                              request_checksum_calculation='when_required',
+                              response_checksum_validation='when_required',
+                              max_pool_connections=max_pool_connections)
+        )
+        if not public_base_url:
+            public_base_url = f"{endpoint_url.rstrip('/')}/{bucket}" if endpoint_url else \
+                f"https://{bucket}.s3.{region or 'us-east-1'}.amazonaws.com"
+        self.public_base_url = public_base_url.rstrip('/')
+        self.spool_root = spool_root or tempfile.gettempdir()
+
+    def url(self, key):
+        return f"{self.public_base_url}/{key}"
+
+    def key_for_url(self, url):
+        prefix = self.public_base_url + '/'
+        if isinstance(url, str) and url.startswith(prefix) and '..' not in url[len(prefix):]:
+            return url[len(prefix):]
+        return None
+
+    def local_path(self, key):
+        return None # Nothing is on this node's disk
+
+    def spool_dir(self, subfolder):
+        os.makedirs(self.spool_root, exist_ok=True)
+        return self.spool_root
+
+    def _head(self, key, **kwargs):
+        try:
+            return self._client.head_object(Bucket=self.bucket, Key=key, **kwargs)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def exists(self, key):
+        return self._head(key) is not None
+
+    def stat(self, key):
+        head = self._head(key, ChecksumMode='ENABLED')
+        if head is None:
+            return None
+        checksum = head.get("ChecksumSHA256")
+        # Only whole-object checksums ("<base64>", not multipart "<base64>-<parts>") are the content hash
+        sha256 = base64.b64decode(checksum).hex() if checksum and '-' not in checksum else None
+        return {"size": head["ContentLength"], "sha256": sha256}
+
+    def put_file(self, key, source_path, content_type, cache_control=None):
+        """Streams source_path to the bucket, then removes it (same move semantics as the local backend)."""
+        extra = {"CacheControl": cache_control} if cache_control else {}
+        with open(source_path, 'rb') as body:
+            self._client.put_object(Bucket=self.bucket, Key=key, Body=body, ContentType=content_type, **extra)
+        os.remove(source_path)
+
+    def put_bytes(self, key, data, content_type, cache_control=None):
+        extra = {"CacheControl": cache_control} if cache_control else {}
+        self._client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=content_type, **extra)
+
+    def read_range(self, key, length):
+        response = self._client.get_object(Bucket=self.bucket, Key=key, Range=f"bytes=0-{length - 1}")
+        return response["Body"].read()
+
+    @contextmanager
+    def local_copy(self, key):
+        with tempfile.TemporaryDirectory(dir=self.spool_root) as directory:
+            path = os.path.join(directory, key.rsplit('/', 1)[-1])
+            body = self._client.get_object(Bucket=self.bucket, Key=key)["Body"]
+            with open(path, 'wb') as f:
+                shutil.copyfileobj(body, f, 64 * 1024)
+            yield path
+
+    def delete(self, key):
+        self._client.delete_object(Bucket=self.bucket, Key=key)
+
+    def iter_objects(self, prefix=""):
+        paginator = self._client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get("Contents", ()):
+                yield obj["Key"], obj["Size"], obj["LastModified"]
+
+    def presign_put(self, key, content_type, size, sha256, expires_in, cache_control=None):
+        """
+        A URL the client can PUT the bytes to directly. Length, type and SHA-256 are part of
+        the signature, and the store rejects a body whose SHA-256 differs, so the object at a
+        content-addressed key always holds exactly those bytes.
+        """
+        checksum = base64.b64encode(bytes.fromhex(sha256)).decode('ascii')
+        params = {"Bucket": self.bucket, "Key": key, "ContentType": content_type, "ContentLength": size,
+                  "ChecksumSHA256": checksum}
+        headers = {"Content-Type": content_type, "x-amz-checksum-sha256": checksum}
+        if cache_control:
+            params["CacheControl"] = headers["Cache-Control"] = cache_control
+        url = self._client.generate_presigned_url('put_object', Params=params, ExpiresIn=expires_in)
+        return {"method": "PUT", "url": url, "headers": headers, "expiresIn": expires_in}
+
+
+_STORAGE_SETTINGS = ('UPLOAD_STORAGE_BACKEND', 'UPLOAD_FOLDER', 'UPLOAD_PUBLIC_BASE_URL', 'BACKEND_PUBLIC_BASE_URL',
+                     'STATIC_UPLOAD_SUBPATH', 'UPLOAD_SPOOL_FOLDER', 'S3_BUCKET', 'S3_ENDPOINT_URL', 'S3_REGION',
+                     'S3_ACCESS_KEY_ID', 'S3_SECRET_ACCESS_KEY', 'S3_ADDRESSING_STYLE')
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+def build_storage(config):
+    backend_name = config.get('UPLOAD_STORAGE_BACKEND', 'local')
+    if backend_name == 's3':
+        return S3StorageBackend(config['S3_BUCKET'], endpoint_url=config.get('S3_ENDPOINT_URL'),
+                                region=config.get('S3_REGION'), access_key_id=config.get('S3_ACCESS_KEY_ID'),
+                                secret_access_key=config.get('S3_SECRET_ACCESS_KEY'),
+                                public_base_url=config.get('UPLOAD_PUBLIC_BASE_URL'),
+                                addressing_style=config.get('S3_ADDRESSING_STYLE', 'path'),
+                                spool_root=config.get('UPLOAD_SPOOL_FOLDER'))
+    if backend_name == 'local':
+        origin_base_url = f"{config['BACKEND_PUBLIC_BASE_URL'].rstrip('/')}/{config['STATIC_UPLOAD_SUBPATH'].strip('/')}"
+        return LocalStorageBackend(config['UPLOAD_FOLDER'], config.get('UPLOAD_PUBLIC_BASE_URL') or origin_base_url,
+                                   alternate_base_urls=(origin_base_url,))
+    raise RuntimeError(f"Unknown UPLOAD_STORAGE_BACKEND {backend_name!r}; use 'local' or 's3'.")
+
+
+def get_storage():
+    """The storage backend for the current app's settings (S3 clients are reused across requests)."""
+    settings = tuple(current_app.config.get(name) for name in _STORAGE_SETTINGS)
+    storage = _storages.get(settings)
+    if storage is None:
+        with _storages_lock:
+            storage = _storages.get(settings)
+            if storage is None:
+                storage = _storages[settings] = build_storage(current_app.config)
+    return storage
@@ -0,0 +1,105 @@
+# app/utils/compression.py
+import gzip
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError: # Optional dependency; only gzip is offered without it
+    brotli = None
+
+
+def available_encodings():
+    """Content codings we can produce, in server preference order."""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def negotiate_encoding():
+    """Best coding the client accepts (honouring q-values, q=0 and '*'), or None for identity."""
+    if not request.accept_encodings:
+        return None
+    return request.accept_encodings.best_match(available_encodings())
+
+
+def compress_bytes(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESSION_BROTLI_QUALITY'])
+    return gzip.compress(data, compresslevel=config['COMPRESSION_GZIP_LEVEL'], mtime=0) # mtime=0 keeps output deterministic
+
+
+def _is_compressible(response, config):
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if response.direct_passthrough or response.is_streamed: # send_file / generators are left alone
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    if response.mimetype not in config['COMPRESSION_MIMETYPES']:
+        return False
+    return response.content_length is None or response.content_length >= config['COMPRESSION_MIN_SIZE']
+
+
+def _mark_encoded(response, encoding):
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    etag, is_weak = response.get_etag()
+    if etag and not is_weak:
+        # The encoded bytes differ from the identity representation, so the validator becomes weak.
+        response.set_etag(etag, weak=True)
+
+
+def compress_response(response):
+    """after_request hook: compresses eligible responses with the client's preferred coding."""
+    config = current_app.config
+    if not config.get('COMPRESSION_ENABLED', True) or request.method == 'HEAD':
+        return response
+    if not _is_compressible(response, config):
+        return response
+    response.vary.add('Accept-Encoding') # The body depends on Accept-Encoding even when sent uncompressed
+    encoding = negotiate_encoding()
+    if not encoding:
+        return response
+
+    body = response.get_data()
+    if len(body) < config['COMPRESSION_MIN_SIZE']:
+        return response
+    compressed = compress_bytes(body, encoding, config)
+    if len(compressed) >= len(body):
+        return response
+    response.set_data(compressed)
+    _mark_encoded(response, encoding)
+    return response
+
+
+class PrecompressedPayload:
+    """
+    A constant JSON payload serialized and compressed once (when its blueprint is
+    registered) and then served with whichever encoding the request negotiates.
+    """
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.bodies = {}
+
+    def prepare(self, app):
+        identity = app.json.dumps(self.payload).encode('utf-8')
+        self.bodies = {None: identity}
+        if len(identity) >= app.config['COMPRESSION_MIN_SIZE']:
+            for encoding in available_encodings():
+                self.bodies[encoding] = compress_bytes(identity, encoding, app.config)
+
+    def response(self):
+        encoding = negotiate_encoding() if current_app.config.get('COMPRESSION_ENABLED', True) else None
+        if encoding not in self.bodies:
+            encoding = None
+        response = current_app.response_class(self.bodies[None] if encoding is None else self.bodies[encoding],
+                                              mimetype='application/json')
+        if len(self.bodies) > 1:
+            response.vary.add('Accept-Encoding')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def init_compression(app):
+    app.after_request(compress_response)
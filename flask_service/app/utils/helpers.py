@@ -0,0 +1,45 @@
+# app/utils/helpers.py
+import hashlib
+from flask import request, make_response
+
+
+def make_etag(*parts):
+    """Strong ETag value derived from version markers (timestamps, hashes, ids)."""
+    raw = "|".join("" if part is None else str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def is_not_modified(etag):
+    """
+    True when the request's If-None-Match already names `etag`. Uses weak comparison
+    (RFC 7232), so a compressed response's W/ form of the tag still matches.
+    """
+    return bool(etag) and request.if_none_match.contains_weak(etag)
+
+
+def not_modified_response(etag):
+    response = make_response('', 304)
+    response.set_etag(etag)
+    return response
+
+
+def with_etag(response_tuple, etag):
+    """Attaches `etag` to a (response, status) tuple built with jsonify."""
+    response, status_code = response_tuple
+    response.set_etag(etag)
+    return response, status_code
+
+
+def fresh_etag_from_version(load_version_doc, etag_for):
+    """
+    Conditional-GET short circuit. When the request carries If-None-Match, loads only
+    the version fields via `load_version_doc()` and returns the ETag if the client's
+    copy is still current (answer 304 without the full read), else None.
+    """
+    if not request.if_none_match:
+        return None
+    version_doc = load_version_doc()
+    if not version_doc:
+        return None
+    etag = etag_for(version_doc)
+    return etag if is_not_modified(etag) else None
@@ -0,0 +1,70 @@
+# app/utils/json_provider.py
+import base64
+from datetime import date, datetime
+from decimal import Decimal
+
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError: # Optional dependency; fall back to the stdlib-based provider
+    orjson = None
+
+
+def encode_extra_types(obj):
+    """
+    Encodes the Mongo/Python types our serializers pass through as-is:
+    ObjectId -> hex string, datetime/date -> ISO 8601, bytes -> base64,
+    Decimal -> string (as Flask's default provider does, so no precision is lost).
+    """
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (bytes, bytearray)):
+        return base64.b64encode(obj).decode('ascii')
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """Stdlib json provider with the same ObjectId/datetime/bytes/Decimal encoding as OrjsonProvider."""
+
+    sort_keys = False
+
+    @staticmethod
+    def default(obj):
+        try:
+            return encode_extra_types(obj)
+        except TypeError:
+            return DefaultJSONProvider.default(obj)
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    orjson-backed provider. orjson serializes datetimes natively (same ISO 8601 output
+    as .isoformat()) and calls encode_extra_types only for ObjectId/bytes/Decimal.
+    """
+
+    option = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=encode_extra_types, option=self.option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Hand orjson's bytes straight to the response; no str round trip.
+        body = orjson.dumps(obj, default=encode_extra_types, option=self.option)
+        return self._app.response_class(body, mimetype="application/json")
+
+
+def get_json_provider_class(name=None):
+    """Resolves Config.JSON_PROVIDER ('orjson' or 'stdlib'); orjson falls back to stdlib if missing."""
+    if name != 'stdlib' and orjson is not None:
+        return OrjsonProvider
+    return MongoJSONProvider
@@ -0,0 +1,39 @@
+# tests/benchmarks/test_bench_counter_aggregator.py
+# Run with: pytest tests/benchmarks --benchmark-only
+# One hot post taking a burst of votes: write-through issues one update per vote,
+# write-behind folds the burst into a single bulk_write at flush time.
+from datetime import datetime, timezone
+import pytest
+from bson import ObjectId
+from app import mongo
+from app.services.counter_aggregator import CounterAggregator
+
+pytest.importorskip("pytest_benchmark")
+
+VOTES_PER_ROUND = 500
+
+@pytest.fixture
+def hot_post_id(mock_mongo_app):
+    post_id = mongo.db.posts.insert_one({"upvotes": 0, "last_activity_at": datetime.now(timezone.utc)}).inserted_id
+    return post_id
+
+def _vote_burst(aggregator, post_id):
+    for _ in range(VOTES_PER_ROUND):
+        aggregator.record("posts", post_id, inc={"upvotes": 1}, latest={"last_activity_at": datetime.now(timezone.utc)})
+    aggregator.flush()
+
+def test_bench_hot_post_write_through(benchmark, hot_post_id):
+    aggregator = CounterAggregator()
+    aggregator.configure(lambda: mongo.db, enabled=False)
+    benchmark.group = "hot-post-votes"
+    benchmark(_vote_burst, aggregator, hot_post_id)
+    assert mongo.db.posts.find_one({"_id": hot_post_id})["upvotes"] % VOTES_PER_ROUND == 0
+
+def test_bench_hot_post_write_behind(benchmark, hot_post_id):
+    aggregator = CounterAggregator()
+    aggregator.configure(lambda: mongo.db, enabled=True, flush_seconds=60, max_pending=10000, max_staleness=60)
+    benchmark.group = "hot-post-votes"
+    benchmark(_vote_burst, aggregator, hot_post_id)
+    aggregator.stop()
+    assert mongo.db.posts.find_one({"_id": hot_post_id})["upvotes"] % VOTES_PER_ROUND == 0
+    assert aggregator.snapshot()["coalescing"] == VOTES_PER_ROUND
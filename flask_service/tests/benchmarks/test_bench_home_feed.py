@@ -0,0 +1,79 @@
+# tests/benchmarks/test_bench_home_feed.py
+# Run with: pytest tests/benchmarks --benchmark-only
+# First page of GET /feed ("new") for a reader in many small communities and a few large ones.
+# "fan-out-on-read" queries every joined community at request time (TIMELINE_FANOUT_MAX_MEMBERS=0);
+# "hybrid" reads the small communities from the reader's materialized timeline and only queries
+# the large ones. The post-write group is the price paid for it: pushing a new post onto every
+# member's timeline. mongomock has no indexes, so absolute numbers overstate scan costs; compare
+# the cases with each other.
+from datetime import datetime, timedelta, timezone
+import pytest
+from bson import ObjectId
+from app import mongo
+from app.models.post import Post
+from app.services.community_directory import COMMUNITY_DIRECTORY
+from app.services.home_feed import get_home_feed
+from app.services.object_cache import POST_CACHE
+
+pytest.importorskip("pytest_benchmark")
+
+SMALL_COMMUNITIES, POSTS_PER_SMALL = 150, 10
+LARGE_COMMUNITIES, POSTS_PER_LARGE = 3, 100
+SMALL_MEMBERS = 100
+
+@pytest.fixture
+def reader(mock_mongo_app):
+    COMMUNITY_DIRECTORY.clear()
+    POST_CACHE.clear()
+    mock_mongo_app.config.update(IMAGE_PIPELINE_ENABLED=False, TIMELINE_FANOUT_MAX_MEMBERS=500)
+    reader_id, author_id = ObjectId(), ObjectId()
+    snapshot = {"name": "JANE ROE", "usn": "1MS22CS119", "avatarUrl": None}
+    started = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    communities, posts = [], []
+    for n in range(SMALL_COMMUNITIES + LARGE_COMMUNITIES):
+        large = n >= SMALL_COMMUNITIES
+        community_id = ObjectId()
+        communities.append({"_id": community_id, "name": f"Club {n}", "slug": f"club-{n}", "members": [reader_id],
+                            "memberCount": 5000 if large else SMALL_MEMBERS, "updatedAt": started})
+        for m in range(POSTS_PER_LARGE if large else POSTS_PER_SMALL):
+            created_at = started + timedelta(minutes=len(posts))
+            posts.append({"community_id": community_id, "community_slug": f"club-{n}", "author_id": author_id,
+                          "author_snapshot": snapshot, "title": f"Post {m}", "content_type": "text",
+                          "content_text": "Hello", "upvotes": 0, "downvotes": 0, "upvoted_by": [], "downvoted_by": [],
+                          "comment_count": 0, "created_at": created_at, "updated_at": created_at,
+                          "last_activity_at": created_at, "deleted_at": None})
+    mongo.db.communities.insert_many(communities)
+    mongo.db.posts.insert_many(posts)
+    get_home_feed(str(reader_id)) # Builds the reader's timeline once
+    yield {"app": mock_mongo_app, "reader": str(reader_id), "author": str(author_id), "small": communities[0]}
+    COMMUNITY_DIRECTORY.clear()
+
+def _first_page(reader_id):
+    page = get_home_feed(reader_id, limit=20)
+    assert len(page["posts"]) == 20 and page["next_cursor"]
+
+def test_bench_feed_fan_out_on_read(benchmark, reader):
+    reader["app"].config['TIMELINE_FANOUT_MAX_MEMBERS'] = 0
+    benchmark.group = "home-feed-read"
+    benchmark(_first_page, reader["reader"])
+
+def test_bench_feed_hybrid_timeline(benchmark, reader):
+    benchmark.group = "home-feed-read"
+    benchmark(_first_page, reader["reader"])
+
+def _write_post(community_slug, author_id):
+    Post.create_post(community_slug, author_id, "New post", "text", content_text="Hello")
+
+def test_bench_post_write_without_fan_out(benchmark, reader):
+    reader["app"].config['TIMELINE_FANOUT_MAX_MEMBERS'] = 0
+    benchmark.group = "post-write"
+    benchmark(_write_post, reader["small"]["slug"], reader["author"])
+
+def test_bench_post_write_with_fan_out(benchmark, reader):
+    community_id = reader["small"]["_id"]
+    mongo.db.timelines.insert_many([{"_id": ObjectId(), "covered": [community_id], "entries": []}
+                                    for _ in range(SMALL_MEMBERS - 1)]) # The rest of the community's members
+    benchmark.group = "post-write"
+    benchmark(_write_post, reader["small"]["slug"], reader["author"])
+    assert len(mongo.db.timelines.find_one({"_id": ObjectId(reader["reader"])})["entries"]) <= \
+        reader["app"].config['TIMELINE_MAX_ENTRIES']
@@ -0,0 +1,64 @@
+# tests/benchmarks/test_bench_json_provider.py
+# Run with: pytest tests/benchmarks --benchmark-only
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+from app.utils.json_provider import MongoJSONProvider, OrjsonProvider
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("orjson")
+
+FEED_PAGE_SIZE = 50
+
+def _raw_post(i, now):
+    # Shape of Post.to_dict output: ObjectIds and datetimes passed through as-is
+    return {
+        "id": ObjectId(), "community_id": ObjectId(), "community_slug": "coding-club", "community_name": "Coding Club",
+        "author": {"id": ObjectId(), "name": f"Student {i} - 1MS22CS{i:03d}", "avatarUrl": None},
+        "title": f"Post number {i} about exams", "content_type": "text",
+        "content_text": "Does anyone have notes for the software engineering CIE? " * 4,
+        "image_url": None, "link_url": None, "tags": ["exams", "notes"],
+        "upvotes": i * 3, "downvotes": i % 4, "comment_count": i % 7,
+        "created_at": now - timedelta(minutes=i), "updated_at": now - timedelta(minutes=i),
+        "last_activity_at": now, "user_vote": None,
+    }
+
+def _stringified_post(raw):
+    # What serializers produced before the provider: every id and timestamp converted by hand
+    post = dict(raw, author=dict(raw["author"], id=str(raw["author"]["id"])))
+    for key in ("id", "community_id"):
+        post[key] = str(post[key])
+    for key in ("created_at", "updated_at", "last_activity_at"):
+        post[key] = post[key].isoformat()
+    return post
+
+def _feed_page(posts):
+    return {"status": "success", "data": {"posts": posts, "total": 500, "page": 1, "per_page": FEED_PAGE_SIZE, "pages": 10}}
+
+@pytest.fixture(scope="module")
+def raw_posts():
+    now = datetime.utcnow()
+    return [_raw_post(i, now) for i in range(FEED_PAGE_SIZE)]
+
+def test_bench_feed_page_default_provider(benchmark, mock_mongo_app, raw_posts):
+    # Baseline: Flask's stdlib provider on pre-stringified dicts, including the to_dict conversions
+    provider = DefaultJSONProvider(mock_mongo_app)
+    benchmark.group = "feed-page-json"
+    response = benchmark(lambda: provider.response(_feed_page([_stringified_post(p) for p in raw_posts])))
+    assert response.status_code == 200
+
+def test_bench_feed_page_stdlib_raw(benchmark, mock_mongo_app, raw_posts):
+    provider = MongoJSONProvider(mock_mongo_app)
+    benchmark.group = "feed-page-json"
+    response = benchmark(provider.response, _feed_page(raw_posts))
+    assert response.status_code == 200
+
+def test_bench_feed_page_orjson_raw(benchmark, mock_mongo_app, raw_posts):
+    provider = OrjsonProvider(mock_mongo_app)
+    benchmark.group = "feed-page-json"
+    response = benchmark(provider.response, _feed_page(raw_posts))
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body["data"]["posts"]) == FEED_PAGE_SIZE
+    assert body["data"]["posts"][0]["id"] == str(raw_posts[0]["id"])
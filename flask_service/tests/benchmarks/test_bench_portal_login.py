@@ -0,0 +1,69 @@
+# tests/benchmarks/test_bench_portal_login.py
+# Run with: pytest tests/benchmarks/test_bench_portal_login.py --benchmark-only -s
+# PORTAL_BENCH_USERS / PORTAL_BENCH_LATENCY override the concurrency levels and per-request delay.
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+import pytest
+from app.config import Config
+from app.services.college_portal_scraper import scrape_and_parse_college_data
+from app.services.portal_transport import TRANSPORT_METRICS, get_transport_metrics, reset_shared_adapter
+from tests.portal_simulator import PortalSimulator, SimulatorServer, PORTAL_PATH
+
+pytest.importorskip("pytest_benchmark")
+
+CONCURRENCY_LEVELS = [int(n) for n in os.environ.get('PORTAL_BENCH_USERS', '1,8,32').split(',')]
+SIMULATED_LATENCY = float(os.environ.get('PORTAL_BENCH_LATENCY', '0.01'))
+LOGINS_PER_USER = 3
+
+@pytest.fixture(scope='module')
+def simulator_server():
+    server = SimulatorServer(PortalSimulator(latency=SIMULATED_LATENCY)).start()
+    original = (Config.COLLEGE_BASE_URL, Config.COLLEGE_LOGIN_URL)
+    Config.COLLEGE_BASE_URL = server.base_url
+    Config.COLLEGE_LOGIN_URL = urljoin(server.base_url, PORTAL_PATH)
+    yield server
+    Config.COLLEGE_BASE_URL, Config.COLLEGE_LOGIN_URL = original
+    server.stop()
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def _timed_login(user_index):
+    usn = f"1MS22CS{user_index:03d}"
+    start = time.perf_counter()
+    _, success = scrape_and_parse_college_data(usn, "13", "04", "2004")
+    return time.perf_counter() - start, success
+
+def run_login_load(concurrent_users, logins_per_user=LOGINS_PER_USER):
+    """Fires concurrent_users * logins_per_user logins and returns throughput and latency percentiles."""
+    jobs = [i % 1000 for i in range(concurrent_users * logins_per_user)]
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrent_users) as pool:
+        results = list(pool.map(_timed_login, jobs))
+    wall_time = time.perf_counter() - wall_start
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        "users": concurrent_users,
+        "logins": len(results),
+        "failures": sum(1 for _, ok in results if not ok),
+        "throughput_per_sec": round(len(results) / wall_time, 2),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+    }
+
+@pytest.mark.parametrize("concurrent_users", CONCURRENCY_LEVELS)
+def test_bench_portal_login(benchmark, simulator_server, concurrent_users, capsys):
+    benchmark.group = "portal-login"
+    reset_shared_adapter()
+    TRANSPORT_METRICS.reset()
+    stats = benchmark.pedantic(run_login_load, args=(concurrent_users,), rounds=1, iterations=1)
+    stats["transport"] = get_transport_metrics()
+    benchmark.extra_info.update(stats)
+    with capsys.disabled():
+        print(f"\nportal login load: {stats}")
+    assert stats["failures"] == 0
@@ -0,0 +1,52 @@
+# tests/benchmarks/test_bench_scraper_parsing.py
+# Run with: pytest tests/benchmarks --benchmark-only
+import os
+import tracemalloc
+import pytest
+from app.services.college_portal_scraper import (
+    _extract_basic_student_info, _extract_dashboard_subject_summaries,
+    _extract_exam_history, parse_dashboard
+)
+
+pytest.importorskip("pytest_benchmark")
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), '..', 'fixtures')
+
+def _read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+def _two_pass(html):
+    # Previous behaviour: each extractor builds its own tree from the raw HTML
+    profile, _ = _extract_basic_student_info(html)
+    summaries, _ = _extract_dashboard_subject_summaries(html)
+    return profile, summaries
+
+def _single_pass(html):
+    profile, summaries, _ = parse_dashboard(html)
+    return profile, summaries
+
+def _peak_memory_bytes(func, *args):
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+@pytest.mark.parametrize("strategy", [_two_pass, _single_pass], ids=["two_pass", "single_pass"])
+def test_bench_dashboard_parse(benchmark, strategy):
+    html = _read_fixture('dashboard.html')
+    benchmark.group = "dashboard-parse"
+    benchmark.extra_info["peak_memory_bytes"] = _peak_memory_bytes(strategy, html)
+    profile, summaries = benchmark(strategy, html)
+    assert profile["usn"] == "1MS22CS118"
+    assert len(summaries) == 6
+
+def test_bench_exam_history_parse(benchmark):
+    html = _read_fixture('exam_history.html')
+    benchmark.group = "exam-history-parse"
+    benchmark.extra_info["peak_memory_bytes"] = _peak_memory_bytes(_extract_exam_history, html)
+    history, _ = benchmark(_extract_exam_history, html)
+    assert history["mostRecentCGPA"] == 8.57
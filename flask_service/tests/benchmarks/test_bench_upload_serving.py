@@ -0,0 +1,51 @@
+# tests/benchmarks/test_bench_upload_serving.py
+# Run with: pytest tests/benchmarks --benchmark-only
+# Requests per worker for /uploads/<path>: ops/s of each case is the per-worker request rate.
+# "before" is the old handler (send_from_directory, no long-lived caching); the rest are the
+# UPLOAD_SERVE_MODE paths. Under gunicorn+nginx the 'app' case additionally gets sendfile(2)
+# through wsgi.file_wrapper, which the test client does not exercise.
+import hashlib
+import os
+import pytest
+from flask import send_from_directory
+
+pytest.importorskip("pytest_benchmark")
+
+BLOB = os.urandom(256 * 1024)
+SHA256 = hashlib.sha256(BLOB).hexdigest()
+BLOB_PATH = f"blobs/{SHA256[:2]}/{SHA256}.jpg"
+
+@pytest.fixture
+def client(mock_mongo_app, tmp_path):
+    mock_mongo_app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    os.makedirs(tmp_path / "blobs" / SHA256[:2])
+    (tmp_path / BLOB_PATH).write_bytes(BLOB)
+
+    @mock_mongo_app.route('/legacy-uploads/<path:filename>')
+    def legacy_serve(filename): # Handler as it was before upload_serving
+        mock_mongo_app.logger.debug(f"Attempting to serve: {filename} from directory: {tmp_path}")
+        return send_from_directory(str(tmp_path), filename)
+
+    return mock_mongo_app.test_client()
+
+def _fetch(client, url, expected_status, **headers):
+    response = client.get(url, headers=headers)
+    response.get_data()
+    assert response.status_code == expected_status
+
+def test_bench_serve_before(benchmark, client):
+    benchmark.group = "upload-serving"
+    benchmark(_fetch, client, f"/legacy-uploads/{BLOB_PATH}", 200)
+
+def test_bench_serve_app_mode(benchmark, client):
+    benchmark.group = "upload-serving"
+    benchmark(_fetch, client, f"/uploads/{BLOB_PATH}", 200)
+
+def test_bench_serve_revalidation_304(benchmark, client):
+    benchmark.group = "upload-serving"
+    benchmark(_fetch, client, f"/uploads/{BLOB_PATH}", 304, **{"If-None-Match": f'"{SHA256}"'})
+
+def test_bench_serve_x_accel(benchmark, client, mock_mongo_app):
+    mock_mongo_app.config['UPLOAD_SERVE_MODE'] = 'x-accel'
+    benchmark.group = "upload-serving"
+    benchmark(_fetch, client, f"/uploads/{BLOB_PATH}", 200)
@@ -3,6 +3,9 @@ import pytest
 from app import create_app # Your Flask app factory
 from app.config import Config # Your base config
 import os # For potentially setting test-specific env vars if needed
+import copy
+from urllib.parse import urljoin
+from tests.portal_simulator import PortalSimulator, SimulatorServer, PORTAL_PATH
 
 # It's good practice to use a separate test configuration if your app behaves differently
 # or if you want to connect to a different test database (e.g., mongomock or a different real DB)
@@ -13,12 +16,16 @@ class TestConfig(Config):
     # MONGO_URI = "mongomock://localhost/test_unicampus_db" # Requires pip install mongomock pymongo-srv
     # OR, if you have a dedicated test MongoDB instance:
     # MONGO_URI = os.environ.get('TEST_MONGO_URI', 'mongodb://localhost:27017/unicampus_test_db')
+    MONGO_URI = os.environ.get('TEST_MONGO_URI', 'mongodb://localhost:27017/unicampus_test_db')
     
     # For now, we'll let it use the .env MONGO_URI, assuming it's acceptable for testing.
     # Be careful if your tests modify data and you're pointing to your dev Atlas DB.
     # Ideally, tests should run against a dedicated, isolated test database.
 
     JWT_SECRET_KEY = "test_jwt_secret_key" # Use a fixed secret for tests
+    INVALIDATION_BUS_BACKEND = 'none' # Tests run in one process; test_invalidation_bus.py wires its own backend
+    PURGE_ON_DELETE = False # Deletes only soft-delete; test_purger.py drives the purge synchronously
+    PURGE_INTERVAL_SECONDS = 0
     # Make token expiry very short for testing expiry, or very long to not worry about it
     JWT_ACCESS_TOKEN_EXPIRES_MINUTES = 15 
     JWT_REFRESH_TOKEN_EXPIRES_DAYS = 1
@@ -38,6 +45,38 @@ def app():
     with _app.app_context():
         yield _app
 
+# Portal scrape result for one student, shaped like scrape_and_parse_college_data's output
+SCRAPED_STUDENT_DATA = {
+    "studentProfile": {"name": "JOHN DOE", "usn": "1MS22CS118", "semester": 5, "section": "B",
+                       "department": "Computer Science & Engineering"},
+    "dashboardSummaries": [{"code": "CS51", "name": "Software Engineering", "cieTotal": 41, "attendancePercentage": 92}],
+    "examHistory": {"semesters": [{"semesterName": "Semester 1", "creditsRegistered": 20, "creditsEarned": 20,
+                                   "sgpa": 8.75, "cgpa": 8.75}], "mostRecentCGPA": 8.75},
+    "errorMessages": []
+}
+
+@pytest.fixture()
+def scraped_student_data():
+    return copy.deepcopy(SCRAPED_STUDENT_DATA)
+
+@pytest.fixture()
+def mock_mongo_app():
+    """
+    App (with app context) whose `mongo.db` is an in-memory mongomock database.
+    For model-level tests that need query semantics but not a live MongoDB.
+    """
+    mongomock = pytest.importorskip("mongomock")
+    from app import mongo
+    original = (mongo.cx, mongo.db)
+    _app = create_app(config_class=TestConfig)
+    mongo.cx = mongomock.MongoClient()
+    mongo.db = mongo.cx['unicampus_test_db']
+    try:
+        with _app.app_context():
+            yield _app
+    finally:
+        mongo.cx, mongo.db = original
+
 @pytest.fixture()
 def client(app):
     """A test client for the app."""
@@ -48,9 +87,30 @@ def runner(app):
     """A test runner for the app's Click commands."""
     return app.test_cli_runner()
 
+@pytest.fixture(scope='session')
+def portal_simulator():
+    """
+    Points the scraper's COLLEGE_* settings at the offline portal simulator for the
+    whole test session. Set PORTAL_TESTS_USE_LIVE=1 to hit the real portal instead.
+    """
+    if os.environ.get('PORTAL_TESTS_USE_LIVE') == '1':
+        yield None
+        return
+
+    server = SimulatorServer(PortalSimulator()).start()
+    original = {key: getattr(Config, key) for key in ('COLLEGE_BASE_URL', 'COLLEGE_LOGIN_URL')}
+    Config.COLLEGE_BASE_URL = server.base_url
+    Config.COLLEGE_LOGIN_URL = urljoin(server.base_url, PORTAL_PATH)
+    try:
+        yield server
+    finally:
+        for key, value in original.items():
+            setattr(Config, key, value)
+        server.stop()
+
 # Helper fixture to get auth tokens for a test user
 @pytest.fixture
-def auth_tokens(client):
+def auth_tokens(client, portal_simulator):
     """Provides auth tokens for a predefined test user."""
     # For a real test, you might create a test user here or ensure one exists
     # For now, using your hardcoded test credentials
@@ -0,0 +1,170 @@
+# tests/object_store_simulator.py
+"""
+Offline stand-in for an S3-compatible object store (MinIO, AWS S3).
+
+Implements the path-style requests UPLOAD_STORAGE_BACKEND='s3' makes on one bucket:
+PUT (with x-amz-checksum-sha256 verification), GET (with Range), HEAD (with
+x-amz-checksum-mode), DELETE and ListObjectsV2. Request signatures are not verified,
+but presigned URLs expire. Objects are kept in memory.
+
+Run standalone and point the backend at it:
+
+    python -m tests.object_store_simulator --port 9000 --bucket unicampus-uploads
+    UPLOAD_STORAGE_BACKEND=s3 S3_ENDPOINT_URL=http://127.0.0.1:9000 S3_BUCKET=unicampus-uploads \
+        S3_ACCESS_KEY_ID=sim S3_SECRET_ACCESS_KEY=sim flask run
+"""
+import argparse
+import base64
+import hashlib
+import html
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from urllib.parse import parse_qs, quote, unquote
+from wsgiref.simple_server import make_server
+
+from tests.portal_simulator import _KeepAliveHandler, _ThreadingWSGIServer
+
+S3_XMLNS = "http://s3.amazonaws.com/doc/2006-03-01/"
+
+
+class ObjectStoreSimulator:
+    """WSGI app serving one bucket. `requests` logs (method, key) for every request."""
+
+    def __init__(self, bucket='unicampus-uploads'):
+        self.bucket = bucket
+        self.objects = {} # key -> {"data", "content_type", "cache_control", "checksum", "etag", "modified"}
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def request_count(self, method):
+        with self._lock:
+            return sum(1 for logged_method, _ in self.requests if logged_method == method)
+
+    # --- WSGI entry point ---
+    def __call__(self, environ, start_response):
+        method = environ['REQUEST_METHOD']
+        query = {name: values[0] for name, values in parse_qs(environ.get('QUERY_STRING', ''), keep_blank_values=True).items()}
+        bucket, _, key = unquote(environ.get('PATH_INFO', '')).lstrip('/').partition('/')
+        with self._lock:
+            self.requests.append((method, key))
+
+        if bucket != self.bucket:
+            return self._error(start_response, '404 Not Found', 'NoSuchBucket', method)
+        if self._presign_expired(query):
+            return self._error(start_response, '403 Forbidden', 'AccessDenied', method, 'Request has expired')
+        if not key:
+            if method == 'GET':
+                return self._list(start_response, query)
+            return self._error(start_response, '405 Method Not Allowed', 'MethodNotAllowed', method)
+        if method == 'PUT':
+            return self._put(environ, start_response, key)
+        if method in ('GET', 'HEAD'):
+            return self._get(environ, start_response, key, method)
+        if method == 'DELETE':
+            with self._lock:
+                self.objects.pop(key, None)
+            start_response('204 No Content', [])
+            return [b'']
+        return self._error(start_response, '405 Method Not Allowed', 'MethodNotAllowed', method)
+
+    @staticmethod
+    def _presign_expired(query):
+        if 'X-Amz-Date' not in query or 'X-Amz-Expires' not in query:
+            return False
+        signed_at = datetime.strptime(query['X-Amz-Date'], '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) > signed_at + timedelta(seconds=int(query['X-Amz-Expires']))
+
+    def _put(self, environ, start_response, key):
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+        data = environ['wsgi.input'].read(length) if length else b''
+        declared = environ.get('HTTP_X_AMZ_CHECKSUM_SHA256')
+        if declared and base64.b64decode(declared) != hashlib.sha256(data).digest():
+            return self._error(start_response, '400 Bad Request', 'BadDigest', 'PUT',
+                               'The SHA256 you specified did not match the calculated checksum.')
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        with self._lock:
+            self.objects[key] = {
+                "data": data,
+                "content_type": environ.get('CONTENT_TYPE') or 'binary/octet-stream',
+                "cache_control": environ.get('HTTP_CACHE_CONTROL'),
+                "checksum": declared, # Only kept when the client sent one, like S3
+                "etag": etag,
+                "modified": datetime.now(timezone.utc).replace(microsecond=0),
+            }
+        start_response('200 OK', [('ETag', etag), ('Content-Length', '0')])
+        return [b'']
+
+    def _get(self, environ, start_response, key, method):
+        with self._lock:
+            obj = self.objects.get(key)
+        if obj is None:
+            return self._error(start_response, '404 Not Found', 'NoSuchKey', method)
+        data = obj["data"]
+        status = '200 OK'
+        headers = [('Content-Type', obj["content_type"]), ('ETag', obj["etag"]),
+                   ('Last-Modified', format_datetime(obj["modified"], usegmt=True)), ('Accept-Ranges', 'bytes')]
+        if obj["cache_control"]:
+            headers.append(('Cache-Control', obj["cache_control"]))
+        if obj["checksum"] and environ.get('HTTP_X_AMZ_CHECKSUM_MODE') == 'ENABLED':
+            headers.append(('x-amz-checksum-sha256', obj["checksum"]))
+        range_header = environ.get('HTTP_RANGE', '')
+        if method == 'GET' and range_header.startswith('bytes='):
+            start, _, end = range_header[len('bytes='):].partition('-')
+            start, end = int(start), min(int(end) if end else len(data) - 1, len(data) - 1)
+            headers.append(('Content-Range', f"bytes {start}-{end}/{len(data)}"))
+            data, status = data[start:end + 1], '206 Partial Content'
+        headers.append(('Content-Length', str(len(data))))
+        start_response(status, headers)
+        return [b''] if method == 'HEAD' else [data]
+
+    def _list(self, start_response, query):
+        prefix = query.get('prefix', '')
+        max_keys = int(query.get('max-keys', 1000))
+        after = query.get('continuation-token') or query.get('start-after') or ''
+        with self._lock:
+            keys = sorted(key for key in self.objects if key.startswith(prefix) and key > after)
+            page = [(key, self.objects[key]) for key in keys[:max_keys]]
+        truncated = len(keys) > max_keys
+        encode = (lambda key: quote(key, safe='/')) if query.get('encoding-type') == 'url' else html.escape
+        contents = "".join(
+            f"<Contents><Key>{encode(key)}</Key>"
+            f"<LastModified>{obj['modified'].strftime('%Y-%m-%dT%H:%M:%S.000Z')}</LastModified>"
+            f"<ETag>{html.escape(obj['etag'])}</ETag><Size>{len(obj['data'])}</Size>"
+            f"<StorageClass>STANDARD</StorageClass></Contents>"
+            for key, obj in page
+        )
+        token = f"<NextContinuationToken>{html.escape(page[-1][0])}</NextContinuationToken>" if truncated else ""
+        body = (f'<?xml version="1.0" encoding="UTF-8"?><ListBucketResult xmlns="{S3_XMLNS}">'
+                f"<Name>{self.bucket}</Name><Prefix>{html.escape(prefix)}</Prefix><KeyCount>{len(page)}</KeyCount>"
+                f"<MaxKeys>{max_keys}</MaxKeys><IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"
+                f"{contents}{token}</ListBucketResult>").encode('utf-8')
+        start_response('200 OK', [('Content-Type', 'application/xml'), ('Content-Length', str(len(body)))])
+        return [body]
+
+    @staticmethod
+    def _error(start_response, status, code, method, message=''):
+        body = b'' if method == 'HEAD' else \
+            f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code><Message>{message}</Message></Error>'.encode('utf-8')
+        start_response(status, [('Content-Type', 'application/xml'), ('Content-Length', str(len(body)))])
+        return [body]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for an S3-compatible object store.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--bucket', default='unicampus-uploads')
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, ObjectStoreSimulator(args.bucket),
+                         server_class=_ThreadingWSGIServer, handler_class=_KeepAliveHandler)
+    print(f"Object store simulator listening on http://{args.host}:{args.port}/{args.bucket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+# tests/portal_simulator.py
+"""
+Offline stand-in for the parents.msrit.edu portal.
+
+Reproduces the four requests the scraper makes: the Joomla token login page,
+the 302 login redirect, the dashboard and the exam history page. Latency and
+failures are configurable so login performance can be measured without the
+real portal.
+
+Run standalone and point the backend at it:
+
+    python -m tests.portal_simulator --port 8765 --latency 0.05
+    COLLEGE_BASE_URL=http://127.0.0.1:8765 flask run
+"""
+import argparse
+import html
+import os
+import random
+import secrets
+import threading
+import time
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, ServerHandler, make_server
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+PORTAL_PATH = '/newparents/index.php'
+SESSION_COOKIE = 'sim_portal_session'
+
+# The saved fixtures are rendered for this student; the simulator swaps in the logged-in one.
+FIXTURE_USN = '1MS22CS118'
+FIXTURE_NAME = 'JOHN DOE'
+FIXTURE_TOKEN_NAME = '0f1e2d3c4b5a69788796a5b4c3d2e1f0'
+
+
+def _read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+
+class PortalSimulator:
+    """
+    WSGI app. `students` maps USN -> {"name": ..., "dob": "YYYY-MM-DD"}; when
+    `accept_any_credentials` is set, any USN/DOB pair logs in.
+    `latency` is seconds per request (a number or a zero-arg callable) and
+    `failure_rate` is the fraction of requests answered with a 503.
+    """
+
+    def __init__(self, students=None, accept_any_credentials=True, latency=0.0, failure_rate=0.0, seed=None):
+        self.students = {usn.upper(): info for usn, info in (students or {}).items()}
+        self.accept_any_credentials = accept_any_credentials
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self.connection_count = 0
+        self.login_count = 0
+        self.in_flight = 0
+        self.max_in_flight = 0 # Highest number of requests served at the same time
+        self._login_template = _read_fixture('login_page.html')
+        self._dashboard_template = _read_fixture('dashboard.html')
+        self._exam_history_page = _read_fixture('exam_history.html')
+
+    # --- WSGI entry point ---
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.request_count += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            should_fail = self.failure_rate and self._random.random() < self.failure_rate
+        try:
+            self._sleep()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+        if should_fail:
+            return self._respond(start_response, '503 Service Unavailable', 'Service temporarily unavailable')
+        if environ.get('PATH_INFO') != PORTAL_PATH:
+            return self._respond(start_response, '404 Not Found', 'Not Found')
+
+        session_id, session = self._get_session(environ)
+        query = parse_qs(environ.get('QUERY_STRING', ''))
+        method = environ.get('REQUEST_METHOD', 'GET')
+
+        if method == 'POST':
+            return self._handle_login(environ, start_response, session_id, session)
+        if query.get('option') == ['com_history'] and session.get('usn'):
+            return self._respond(start_response, '200 OK', self._exam_history_page)
+        if session.get('usn'):
+            return self._respond(start_response, '200 OK', self._render_dashboard(session))
+        return self._render_login_page(start_response, session_id, session)
+
+    # --- Handlers ---
+    def _render_login_page(self, start_response, session_id, session):
+        token_name = secrets.token_hex(16)
+        session['token'] = token_name
+        page = self._login_template.replace(FIXTURE_TOKEN_NAME, token_name)
+        return self._respond(start_response, '200 OK', page, set_session=session_id)
+
+    def _handle_login(self, environ, start_response, session_id, session):
+        form = self._read_form(environ)
+        token_name = session.get('token')
+        if not token_name or form.get(token_name) != '1':
+            return self._respond(start_response, '200 OK', 'Your session has expired. Please log in again.')
+
+        usn = form.get('username', '').upper()
+        student = self._authenticate(usn, form.get('passwd', ''))
+        if not student:
+            return self._respond(start_response, '200 OK', 'Username and password do not match or you do not have an account yet.')
+
+        session.pop('token', None)
+        session['usn'] = usn
+        session['name'] = student.get('name') or FIXTURE_NAME
+        with self._lock:
+            self.login_count += 1
+        start_response('302 Found', [
+            ('Location', PORTAL_PATH),
+            ('Content-Type', 'text/html; charset=utf-8'),
+            ('Content-Length', '0'),
+        ])
+        return [b'']
+
+    def _authenticate(self, usn, password):
+        student = self.students.get(usn)
+        if student:
+            return student if student.get('dob') == password else None
+        if self.accept_any_credentials and usn:
+            return {"name": FIXTURE_NAME}
+        return None
+
+    def _render_dashboard(self, session):
+        return (self._dashboard_template
+                .replace(FIXTURE_USN, html.escape(session['usn']))
+                .replace(FIXTURE_NAME, html.escape(session['name'])))
+
+    # --- Helpers ---
+    def record_connection(self):
+        with self._lock:
+            self.connection_count += 1
+
+    def _sleep(self):
+        delay = self.latency() if callable(self.latency) else self.latency
+        if delay and delay > 0:
+            time.sleep(delay)
+
+    def _get_session(self, environ):
+        cookies = {}
+        for part in environ.get('HTTP_COOKIE', '').split(';'):
+            if '=' in part:
+                key, value = part.strip().split('=', 1)
+                cookies[key] = value
+        session_id = cookies.get(SESSION_COOKIE)
+        with self._lock:
+            if session_id not in self._sessions:
+                session_id = secrets.token_hex(16)
+                self._sessions[session_id] = {}
+            return session_id, self._sessions[session_id]
+
+    @staticmethod
+    def _read_form(environ):
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        body = environ['wsgi.input'].read(length).decode('utf-8') if length else ''
+        return {k: v[0] for k, v in parse_qs(body, keep_blank_values=True).items()}
+
+    @staticmethod
+    def _respond(start_response, status, body, set_session=None):
+        payload = body.encode('utf-8')
+        headers = [('Content-Type', 'text/html; charset=utf-8'), ('Content-Length', str(len(payload)))]
+        if set_session:
+            headers.append(('Set-Cookie', f"{SESSION_COOKIE}={set_session}; Path=/; HttpOnly"))
+        start_response(status, headers)
+        return [payload]
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 128 # Default of 5 resets connections under concurrent load
+
+
+class _KeepAliveHandler(WSGIRequestHandler):
+    """Serves HTTP/1.1 keep-alive connections (wsgiref closes after every request)."""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True # Headers and body are separate writes; avoid delayed-ACK stalls
+
+    def handle(self):
+        app = self.server.get_app()
+        if hasattr(app, 'record_connection'):
+            app.record_connection()
+        self.close_connection = False
+        while not self.close_connection:
+            self.raw_requestline = self.rfile.readline(65537)
+            if not self.raw_requestline or not self.parse_request():
+                return
+            handler = ServerHandler(self.rfile, self.wfile, self.get_stderr(), self.get_environ(), multithread=True)
+            handler.http_version = '1.1'
+            handler.request_handler = self
+            handler.run(app)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SimulatorServer:
+    """Runs a PortalSimulator on a background thread. Use as a context manager."""
+
+    def __init__(self, simulator=None, host='127.0.0.1', port=0):
+        self.simulator = simulator or PortalSimulator()
+        self._server = make_server(host, port, self.simulator,
+                                   server_class=_ThreadingWSGIServer, handler_class=_KeepAliveHandler)
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for the college parents portal.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds of delay added to every request.")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Fraction of requests answered with 503.")
+    args = parser.parse_args()
+
+    simulator = PortalSimulator(latency=args.latency, failure_rate=args.failure_rate)
+    server = make_server(args.host, args.port, simulator, server_class=_ThreadingWSGIServer, handler_class=_KeepAliveHandler)
+    print(f"Portal simulator listening on http://{args.host}:{args.port}{PORTAL_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
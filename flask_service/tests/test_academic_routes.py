@@ -0,0 +1,57 @@
+# tests/test_academic_routes.py
+import pytest
+from flask_jwt_extended import create_access_token
+from app.models.user import User
+
+@pytest.fixture
+def student(mock_mongo_app, scraped_student_data):
+    user = User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")
+    token = create_access_token(identity=str(user["_id"]))
+    return {"user": user, "headers": {"Authorization": f"Bearer {token}"}}
+
+def test_cie_and_attendance_are_projected(mock_mongo_app, student):
+    client = mock_mongo_app.test_client()
+    cie = client.get('/api/v1/results/cie', headers=student["headers"]).get_json()
+    assert cie["data"]["subjects"] == [{"code": "CS51", "name": "Software Engineering", "cieTotal": 41}]
+    attendance = client.get('/api/v1/attendance/summary', headers=student["headers"]).get_json()
+    assert attendance["data"]["subjects"] == [{"code": "CS51", "name": "Software Engineering", "attendancePercentage": 92}]
+
+def test_see_results(mock_mongo_app, student):
+    client = mock_mongo_app.test_client()
+    see = client.get('/api/v1/results/see', headers=student["headers"]).get_json()
+    assert see["data"]["mostRecentCGPA"] == 8.75
+    assert see["data"]["semesters"][0]["semesterName"] == "Semester 1"
+
+def test_academic_overview_and_etag(mock_mongo_app, student):
+    client = mock_mongo_app.test_client()
+    response = client.get('/api/v1/academics/overview', headers=student["headers"])
+    assert response.status_code == 200
+    data = response.get_json()["data"]
+    assert data["cgpa"] == 8.75
+    assert data["cie"]["subjects"][0]["cieTotal"] == 41
+    assert data["attendance"]["subjects"][0]["attendancePercentage"] == 92
+    assert data["see"]["semesters"][0]["sgpa"] == 8.75
+
+    etag = response.headers["ETag"]
+    cached = client.get('/api/v1/academics/overview', headers=dict(student["headers"], **{"If-None-Match": etag}))
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+@pytest.mark.parametrize("path", ['/api/v1/results/cie', '/api/v1/results/see', '/api/v1/attendance/summary', '/api/v1/users/me'])
+def test_conditional_get_returns_304(mock_mongo_app, student, path):
+    client = mock_mongo_app.test_client()
+    first = client.get(path, headers=student["headers"])
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    second = client.get(path, headers=dict(student["headers"], **{"If-None-Match": etag}))
+    assert second.status_code == 304
+    assert second.headers["ETag"] == etag
+
+def test_etag_changes_after_profile_update(mock_mongo_app, student):
+    client = mock_mongo_app.test_client()
+    etag = client.get('/api/v1/users/me', headers=student["headers"]).headers["ETag"]
+    User.update_profile(str(student["user"]["_id"]), {"avatar": "https://example.com/a.png"})
+    refreshed = client.get('/api/v1/users/me', headers=dict(student["headers"], **{"If-None-Match": etag}))
+    assert refreshed.status_code == 200
+    assert refreshed.headers["ETag"] != etag
+    assert refreshed.get_json()["data"]["user"]["avatar"] == "https://example.com/a.png"
@@ -0,0 +1,68 @@
+# tests/test_author_fanout.py
+import pytest
+from app import mongo
+from app.models.comment import Comment
+from app.models.community import Community
+from app.models.post import Post
+from app.models.user import User
+from app.services.author_fanout import run_author_fanout, get_fanout_status
+from app.services.community_directory import COMMUNITY_DIRECTORY
+from app.services.object_cache import POST_CACHE
+
+@pytest.fixture
+def authored(mock_mongo_app, scraped_student_data):
+    COMMUNITY_DIRECTORY.clear()
+    POST_CACHE.clear()
+    user = User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")
+    community = Community.create_community("Coding Club", "A place to talk about code.", str(user["_id"]))
+    user_id = str(user["_id"])
+    posts = [Post.create_post(community["slug"], user_id, f"Post {i}", "text", content_text="Hi") for i in range(3)]
+    comment = Comment.create_comment(str(posts[0]["id"]), user_id, "First!")
+    yield {"user_id": user_id, "posts": posts, "comment": comment}
+    COMMUNITY_DIRECTORY.clear()
+
+def _rename_without_fanout(user_id, name):
+    # Same write as update_profile, minus the background scheduling, so the test drives the run itself
+    User.get_collection().update_one({"_id": User.find_by_id(user_id)["_id"]}, {"$set": {"name": name}})
+
+def test_create_embeds_author_snapshot(authored):
+    stored = mongo.db.posts.find_one({"_id": authored["posts"][0]["id"]})
+    assert stored["author_snapshot"] == {"name": "JOHN DOE", "usn": "1MS22CS118", "avatarUrl": None}
+    assert authored["posts"][0]["author"]["name"] == "JOHN DOE - 1MS22CS118"
+    assert authored["comment"]["author"]["name"] == "JOHN DOE - 1MS22CS118"
+
+def test_fanout_rewrites_posts_and_comments_in_batches(authored):
+    _rename_without_fanout(authored["user_id"], "John D")
+    job = run_author_fanout(authored["user_id"], batch_size=2)
+    assert job["status"] == "done"
+    assert job["progress"] == {"posts": 3, "comments": 1}
+    assert mongo.db.posts.count_documents({"author_snapshot.name": "John D"}) == 3
+    assert mongo.db.comments.find_one({})["author_snapshot"]["name"] == "John D"
+    assert Post.find_by_id_for_user(str(authored["posts"][1]["id"]))["author"]["name"] == "John D - 1MS22CS118"
+
+def test_rerun_is_idempotent(authored):
+    _rename_without_fanout(authored["user_id"], "John D")
+    run_author_fanout(authored["user_id"])
+    assert run_author_fanout(authored["user_id"]) is None # Nothing stale left
+    assert get_fanout_status(authored["user_id"])["attempts"] == 1
+
+def test_legacy_documents_without_snapshot_fall_back_to_lookup(authored):
+    mongo.db.posts.update_many({}, {"$unset": {"author_snapshot": ""}})
+    assert Post.find_by_id_for_user(str(authored["posts"][2]["id"]))["author"]["name"] == "JOHN DOE - 1MS22CS118"
+
+def test_read_between_profile_update_and_fanout_is_not_served_afterwards(authored):
+    from datetime import datetime
+    from flask import current_app
+    from app.services.job_queue import JobWorker
+    app = current_app._get_current_object()
+    app.config['JOB_QUEUE_ENABLED'] = True # Holds the fan-out until the worker below runs it
+    post_id = authored["posts"][0]["id"]
+    mongo.db.posts.update_many({}, {"$set": {"content_updated_at": datetime(2026, 1, 1)}})
+
+    User.update_profile(authored["user_id"], {"name": "John D"})
+    # A request that loaded the post before the fan-out serializes (and caches) it afterwards
+    in_flight = mongo.db.posts.find_one({"_id": post_id})
+    JobWorker(app, job_types=["author-fanout"]).run(max_jobs=1)
+    assert Post.to_dict(in_flight)["author"]["name"] == "JOHN DOE - 1MS22CS118"
+
+    assert Post.find_by_id_for_user(str(post_id))["author"]["name"] == "John D - 1MS22CS118"
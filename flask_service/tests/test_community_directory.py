@@ -0,0 +1,50 @@
+# tests/test_community_directory.py
+import pytest
+from bson import ObjectId
+from app.models.community import Community
+from app.models.post import Post
+from app.models.user import User
+from app.services.community_directory import COMMUNITY_DIRECTORY
+
+@pytest.fixture
+def community(mock_mongo_app, scraped_student_data):
+    COMMUNITY_DIRECTORY.clear()
+    user = User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")
+    created = Community.create_community("Coding Club", "A place to talk about code.", str(user["_id"]))
+    COMMUNITY_DIRECTORY.clear()
+    yield {"user_id": str(user["_id"]), "id": created["id"], "slug": created["slug"]}
+    COMMUNITY_DIRECTORY.clear()
+
+def test_resolves_by_id_and_slug_from_one_projected_read(community):
+    by_slug = Community.resolve_meta(community["slug"])
+    assert by_slug == {"id": community["id"], "slug": "coding-club", "name": "Coding Club"}
+    assert Community.resolve_meta(str(community["id"])) == by_slug
+    snapshot = COMMUNITY_DIRECTORY.snapshot()
+    assert snapshot["misses"] == 1 and snapshot["hits"] == 1
+
+def test_unknown_slug_is_negatively_cached(community):
+    assert Community.resolve_meta("no-such-club") is None
+    assert Community.resolve_meta("no-such-club") is None
+    assert COMMUNITY_DIRECTORY.snapshot()["negativeHits"] == 1
+
+def test_create_clears_negative_entry(community):
+    assert Community.resolve_meta("robotics-club") is None
+    Community.create_community("Robotics Club", "Build and battle robots.", community["user_id"])
+    assert Community.resolve_meta("robotics-club")["name"] == "Robotics Club"
+
+def test_update_community_invalidates_name(community):
+    Community.resolve_meta(community["slug"])
+    Community.update_community(str(community["id"]), community["user_id"], {"name": "Coding Mavericks"})
+    assert Community.resolve_meta(community["slug"])["name"] == "Coding Mavericks"
+
+def test_post_creation_uses_directory(community):
+    Community.resolve_meta(community["slug"])
+    post = Post.create_post(community["slug"], community["user_id"], "Hello there", "text", content_text="Hi")
+    assert post["community_id"] == community["id"]
+    assert post["community_name"] == "Coding Club"
+    assert COMMUNITY_DIRECTORY.snapshot()["misses"] == 1
+
+def test_find_by_id_or_slug_checks_membership_without_members_array(community):
+    detail = Community.find_by_id_or_slug(community["slug"], community["user_id"])
+    assert detail["is_member"] is True
+    assert Community.find_by_id_or_slug(community["slug"], str(ObjectId()))["is_member"] is False
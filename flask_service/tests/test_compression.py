@@ -0,0 +1,68 @@
+# tests/test_compression.py
+import gzip
+import pytest
+from flask import jsonify
+from app.utils.helpers import with_etag
+
+brotli = pytest.importorskip("brotli")
+
+LARGE_ITEMS = [{"title": f"Post {i}", "content_text": "Notes for the software engineering CIE. " * 5} for i in range(40)]
+
+@pytest.fixture()
+def compression_client(mock_mongo_app):
+    @mock_mongo_app.route('/_test/large')
+    def large_payload():
+        return with_etag((jsonify({"status": "success", "data": LARGE_ITEMS}), 200), "large-v1")
+
+    @mock_mongo_app.route('/_test/small')
+    def small_payload():
+        return jsonify({"status": "success"}), 200
+
+    return mock_mongo_app.test_client()
+
+def test_large_json_prefers_brotli(compression_client):
+    response = compression_client.get('/_test/large', headers={"Accept-Encoding": "gzip, deflate, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    body = brotli.decompress(response.get_data())
+    assert b"Post 39" in body
+    assert int(response.headers["Content-Length"]) == len(response.get_data())
+
+def test_gzip_when_brotli_not_accepted(compression_client):
+    response = compression_client.get('/_test/large', headers={"Accept-Encoding": "gzip;q=1.0, br;q=0"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert b"Post 39" in gzip.decompress(response.get_data())
+
+def test_identity_without_accept_encoding(compression_client):
+    response = compression_client.get('/_test/large')
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json()["data"] == LARGE_ITEMS
+
+def test_small_bodies_are_not_compressed(compression_client):
+    response = compression_client.get('/_test/small', headers={"Accept-Encoding": "gzip, br"})
+    assert "Content-Encoding" not in response.headers
+
+def test_compressed_response_gets_weak_etag(compression_client):
+    response = compression_client.get('/_test/large', headers={"Accept-Encoding": "gzip"})
+    assert response.headers["ETag"] == 'W/"large-v1"'
+
+def test_disabled_by_config(mock_mongo_app, compression_client):
+    mock_mongo_app.config["COMPRESSION_ENABLED"] = False
+    response = compression_client.get('/_test/large', headers={"Accept-Encoding": "gzip, br"})
+    assert "Content-Encoding" not in response.headers
+
+def test_static_payload_is_served_precompressed(compression_client):
+    from flask_jwt_extended import create_access_token
+    from app.routes.content_routes import APP_INFO, COLLEGE_CLUBS
+    assert set(COLLEGE_CLUBS.bodies) == {None, "br", "gzip"}
+    assert set(APP_INFO.bodies) == {None} # Under COMPRESSION_MIN_SIZE, so only the identity body is kept
+
+    headers = {"Authorization": f"Bearer {create_access_token(identity='64b7f0c2a1b2c3d4e5f60718')}"}
+    response = compression_client.get('/api/v1/content/clubs', headers=dict(headers, **{"Accept-Encoding": "br"}))
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.get_data() == COLLEGE_CLUBS.bodies["br"]
+    assert brotli.decompress(response.get_data()) == COLLEGE_CLUBS.bodies[None]
+
+    plain = compression_client.get('/api/v1/content/clubs', headers=headers)
+    assert "Content-Encoding" not in plain.headers
+    assert len(plain.get_json()["data"]) == 3
@@ -0,0 +1,88 @@
+# tests/test_counter_aggregator.py
+import time
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from app import mongo
+from app.models.comment import Comment
+from app.models.community import Community
+from app.models.post import Post
+from app.models.user import User
+from app.services.community_directory import COMMUNITY_DIRECTORY
+from app.services.counter_aggregator import COUNTER_AGGREGATOR
+from app.services.response_cache import RESPONSE_CACHE
+
+def _enable(**overrides):
+    settings = dict(enabled=True, flush_seconds=60, max_pending=1000, max_staleness=60)
+    settings.update(overrides)
+    COUNTER_AGGREGATOR.configure(lambda: mongo.db, **settings)
+    COUNTER_AGGREGATOR._reset_metrics()
+
+@pytest.fixture
+def hot_post(mock_mongo_app, scraped_student_data):
+    COMMUNITY_DIRECTORY.clear()
+    user = User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")
+    community = Community.create_community("Coding Club", "A place to talk about code.", str(user["_id"]))
+    post = Post.create_post(community["slug"], str(user["_id"]), "Viral post", "text", content_text="Hi")
+    _enable()
+    yield post
+    COUNTER_AGGREGATOR.configure(lambda: mongo.db) # Flushes and goes back to write-through
+    COMMUNITY_DIRECTORY.clear()
+
+def test_votes_on_hot_post_coalesce_into_one_write(hot_post):
+    post_id = str(hot_post["id"])
+    for _ in range(50):
+        result = Post.vote_on_post(post_id, str(ObjectId()), "up")
+    assert result["upvotes"] == 50 # The voter's worker overlays its buffered deltas
+    assert mongo.db.posts.find_one({"_id": hot_post["id"]})["upvotes"] == 0
+
+    assert COUNTER_AGGREGATOR.flush() == 1
+    stored = mongo.db.posts.find_one({"_id": hot_post["id"]})
+    assert stored["upvotes"] == 50 and len(stored["upvoted_by"]) == 50
+    metrics = COUNTER_AGGREGATOR.snapshot()
+    assert metrics["recorded"] == 50 and metrics["flushedUpdates"] == 1 and metrics["coalescing"] == 50
+
+def test_flush_invalidates_cached_pages(hot_post):
+    RESPONSE_CACHE.clear()
+    RESPONSE_CACHE.set("page", {"posts": []}, 60, tags=[f"post:{hot_post['id']}"])
+    Post.vote_on_post(str(hot_post["id"]), str(ObjectId()), "up")
+    assert RESPONSE_CACHE.get("page") is not None # Invalidated when the counters land, not per vote
+    COUNTER_AGGREGATOR.flush()
+    assert RESPONSE_CACHE.get("page") is None
+
+def test_comment_counters_are_buffered(hot_post):
+    author_id = str(hot_post["author"]["id"])
+    parent = Comment.create_comment(str(hot_post["id"]), author_id, "First!")
+    Comment.create_comment(str(hot_post["id"]), author_id, "Reply", parent_comment_id_str=str(parent["id"]))
+    assert mongo.db.posts.find_one({"_id": hot_post["id"]})["comment_count"] == 0
+    COUNTER_AGGREGATOR.flush()
+    assert mongo.db.posts.find_one({"_id": hot_post["id"]})["comment_count"] == 2
+    assert mongo.db.comments.find_one({"_id": parent["id"]})["reply_count"] == 1
+
+def test_size_trigger_flushes_inline(hot_post):
+    _enable(max_pending=3)
+    for _ in range(3):
+        COUNTER_AGGREGATOR.record("posts", ObjectId(), inc={"upvotes": 1})
+    assert COUNTER_AGGREGATOR.snapshot()["pendingDocuments"] == 0
+    assert COUNTER_AGGREGATOR.snapshot()["flushes"] == 1
+
+def test_interval_flusher_bounds_staleness(hot_post):
+    _enable(flush_seconds=0.05, max_staleness=0.05)
+    Post.vote_on_post(str(hot_post["id"]), str(ObjectId()), "down")
+    deadline = time.monotonic() + 2
+    while time.monotonic() < deadline and mongo.db.posts.find_one({"_id": hot_post["id"]})["downvotes"] == 0:
+        time.sleep(0.01)
+    assert mongo.db.posts.find_one({"_id": hot_post["id"]})["downvotes"] == 1
+
+def test_shutdown_flushes_buffer(hot_post):
+    Post.vote_on_post(str(hot_post["id"]), str(ObjectId()), "up")
+    COUNTER_AGGREGATOR.stop()
+    assert mongo.db.posts.find_one({"_id": hot_post["id"]})["upvotes"] == 1
+
+def test_activity_timestamp_never_moves_backwards(hot_post):
+    newer = datetime.utcnow() + timedelta(minutes=5)
+    COUNTER_AGGREGATOR.record("posts", hot_post["id"], latest={"last_activity_at": newer})
+    COUNTER_AGGREGATOR.record("posts", hot_post["id"], latest={"last_activity_at": newer - timedelta(minutes=1)})
+    COUNTER_AGGREGATOR.flush()
+    stored = mongo.db.posts.find_one({"_id": hot_post["id"]})["last_activity_at"]
+    assert abs((stored - newer).total_seconds()) < 0.01
@@ -25,4 +25,18 @@ def test_get_app_info(client):
     assert app_data['appName'] == "UniCampus MSRIT" # Or whatever you set
     assert 'version' in app_data
     assert 'developerInfo' in app_data
-    assert 'links' in app_data
\ No newline at end of file
+    assert 'links' in app_data
+
+def test_health_metrics_report_this_worker(mock_mongo_app):
+    from app.services.object_cache import POST_CACHE
+    POST_CACHE.clear()
+    POST_CACHE.get_or_build("p1", 1, lambda: {"title": "Cached"})
+    client = mock_mongo_app.test_client()
+    data = client.get('/health/metrics').get_json()["data"]
+    assert set(data) == {"pid", "portalTransport", "responseCache", "objectCache", "communityDirectory",
+                         "counterAggregator", "invalidationBus"}
+    assert data["objectCache"]["posts"]["entries"] == 1
+    assert "reuseRatio" in data["portalTransport"] and "hitRatio" in data["responseCache"]
+
+    mock_mongo_app.config['HEALTH_METRICS_ENABLED'] = False
+    assert client.get('/health/metrics').status_code == 404
@@ -0,0 +1,73 @@
+# tests/test_home_feed.py
+from datetime import datetime, timedelta, timezone
+import pytest
+from flask_jwt_extended import create_access_token
+from app import mongo
+from app.models.community import Community
+from app.models.post import Post
+from app.models.user import User
+from app.services.community_directory import COMMUNITY_DIRECTORY
+from app.services.object_cache import POST_CACHE
+
+@pytest.fixture
+def feed(mock_mongo_app, scraped_student_data):
+    COMMUNITY_DIRECTORY.clear()
+    POST_CACHE.clear()
+    mock_mongo_app.config['IMAGE_PIPELINE_ENABLED'] = False
+    reader = str(User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")["_id"])
+    scraped_student_data["studentProfile"].update(name="JANE ROE", usn="1MS22CS119")
+    other = str(User.upsert_from_scraped_data(scraped_student_data, "1MS22CS119")["_id"])
+    joined = [Community.create_community(f"Joined Club {n}", "A community the reader is in.", reader) for n in range(3)]
+    outside = Community.create_community("Outside Club", "A community the reader is not in.", other)
+
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    posts = []
+    for n in range(9): # Interleaved across the joined communities, one minute apart
+        post = Post.create_post(joined[n % 3]["slug"], other, f"Post {n}", "text", content_text="Hello")
+        mongo.db.posts.update_one({"_id": post["id"]}, {"$set": {"created_at": base + timedelta(minutes=n),
+                                                                  "last_activity_at": base + timedelta(minutes=n)}})
+        posts.append(post["id"])
+    Post.create_post(outside["slug"], other, "Not for the reader", "text", content_text="Hello")
+    headers = {"Authorization": f"Bearer {create_access_token(identity=reader)}"}
+    yield {"app": mock_mongo_app, "client": mock_mongo_app.test_client(), "headers": headers, "reader": reader,
+           "posts": posts}
+    COMMUNITY_DIRECTORY.clear()
+
+def _walk(client, headers, **params):
+    ids, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        body = client.get('/api/v1/feed', headers=headers, query_string=query).get_json()
+        ids += [post["id"] for post in body["data"]]
+        cursor = body["pagination"]["nextCursor"]
+        if not cursor:
+            return ids
+
+def test_feed_pages_through_joined_communities_newest_first(feed):
+    client, headers, posts = feed["client"], feed["headers"], feed["posts"]
+    first = client.get('/api/v1/feed?limit=4', headers=headers).get_json()
+    assert [post["id"] for post in first["data"]] == [str(post_id) for post_id in posts[::-1][:4]]
+    assert first["pagination"]["hasMore"] is True
+    assert _walk(client, headers, limit=4) == [str(post_id) for post_id in reversed(posts)]
+
+    # Users in more communities than one query merge-sorts get per-chunk queries merged in the app
+    feed["app"].config['FEED_COMMUNITIES_PER_QUERY'] = 2
+    assert _walk(client, headers, limit=4) == [str(post_id) for post_id in reversed(posts)]
+
+def test_hot_sort_deleted_posts_and_bad_cursor(feed):
+    client, headers, posts = feed["client"], feed["headers"], feed["posts"]
+    mongo.db.posts.update_one({"_id": posts[0]}, {"$set": {"last_activity_at": datetime(2026, 2, 1, tzinfo=timezone.utc)}})
+    mongo.db.posts.update_one({"_id": posts[8]}, {"$set": {"deleted_at": datetime.now(timezone.utc)}})
+    hot = _walk(client, headers, sortBy="hot", limit=3)
+    assert hot == [str(posts[0])] + [str(post_id) for post_id in reversed(posts[1:8])]
+    assert client.get('/api/v1/feed?cursor=not-a-cursor', headers=headers).status_code == 400
+    assert client.get('/api/v1/feed').status_code == 401
+
+def test_feed_hydrates_votes_and_legacy_authors_in_batches(feed):
+    client, headers, posts = feed["client"], feed["headers"], feed["posts"]
+    Post.vote_on_post(str(posts[8]), feed["reader"], "up")
+    mongo.db.posts.update_one({"_id": posts[7]}, {"$unset": {"author_snapshot": ""}})
+    data = client.get('/api/v1/feed?limit=2', headers=headers).get_json()["data"]
+    assert data[0]["user_vote"] == "up" and data[0]["upvotes"] == 1
+    assert data[1]["user_vote"] is None
+    assert data[1]["author"]["name"] == "JANE ROE - 1MS22CS119" # Looked up for the post without a snapshot
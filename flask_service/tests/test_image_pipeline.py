@@ -0,0 +1,81 @@
+# tests/test_image_pipeline.py
+import os
+import pytest
+from PIL import Image
+from app import mongo
+from app.models.community import Community
+from app.models.post import Post
+from app.models.user import User
+from app.services.community_directory import COMMUNITY_DIRECTORY
+from app.services.image_pipeline import process_variants, schedule_variants
+
+BASE_URL = "https://unicampusbackend.duckdns.org/uploads"
+
+@pytest.fixture
+def uploads(mock_mongo_app, tmp_path, scraped_student_data):
+    COMMUNITY_DIRECTORY.clear()
+    mock_mongo_app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    mock_mongo_app.config['IMAGE_PIPELINE_ENABLED'] = False # Tests drive process_variants synchronously
+    user = User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")
+    yield tmp_path, str(user["_id"])
+    COMMUNITY_DIRECTORY.clear()
+
+def _photo(tmp_path, subfolder, filename, size):
+    os.makedirs(tmp_path / subfolder, exist_ok=True)
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker" # Make
+    Image.new("RGB", size, (200, 80, 40)).save(tmp_path / subfolder / filename, "JPEG", exif=exif.tobytes())
+    return f"{BASE_URL}/{subfolder}/{filename}"
+
+def test_post_image_variants_are_recorded_with_srcset(uploads):
+    tmp_path, user_id = uploads
+    community = Community.create_community("Coding Club", "A place to talk about code.", user_id)
+    image_url = _photo(tmp_path, "post_images", "postimg_a.jpg", (2400, 1600))
+    post = Post.create_post(community["slug"], user_id, "Hackathon photos", "image", image_url=image_url)
+    assert post["image_variants"] is None and post["image_srcset"] is None
+
+    variants = process_variants("posts", post["id"], "image_url", "image_variants", "image", image_url)
+    assert (variants["thumb320"]["width"], variants["thumb320"]["height"]) == (320, 213)
+    assert variants["feed1080"]["width"] == 1080
+    for entry in variants.values():
+        for url in (entry["webp"], entry["jpeg"]):
+            path = tmp_path / "post_images" / url.rsplit('/', 1)[1]
+            with Image.open(path) as img:
+                assert img.size == (entry["width"], entry["height"])
+                assert not img.getexif() # Metadata stripped
+
+    serialized = Post.find_by_id_for_user(str(post["id"]))
+    assert serialized["image_srcset"]["webp"] == f"{BASE_URL}/post_images/postimg_a.thumb320.webp 320w, " \
+                                                 f"{BASE_URL}/post_images/postimg_a.feed1080.webp 1080w"
+
+def test_community_icon_variants_are_square_and_never_upscaled(uploads):
+    tmp_path, user_id = uploads
+    icon_url = _photo(tmp_path, "community_icons", "cicon_a.jpg", (100, 80))
+    community = Community.create_community("Robotics Club", "Build and battle robots.", user_id, icon_url=icon_url)
+    variants = process_variants("communities", community["id"], "iconUrl", "iconVariants", "icon", icon_url)
+    assert (variants["icon64"]["width"], variants["icon64"]["height"]) == (64, 64)
+    assert (variants["icon128"]["width"], variants["icon128"]["height"]) == (80, 80)
+    assert Community.find_by_id_or_slug(community["slug"])["iconSrcset"]["jpeg"].endswith("cicon_a.icon128.jpg 80w")
+
+def test_replaced_image_does_not_record_stale_variants(uploads):
+    tmp_path, user_id = uploads
+    community = Community.create_community("Chess Club", "Openings, endgames and blitz.", user_id)
+    old_url = _photo(tmp_path, "post_images", "old.jpg", (640, 480))
+    new_url = _photo(tmp_path, "post_images", "new.jpg", (640, 480))
+    post = Post.create_post(community["slug"], user_id, "Board photo", "image", image_url=old_url)
+    Post.update_post(str(post["id"]), user_id, {"image_url": new_url})
+    assert process_variants("posts", post["id"], "image_url", "image_variants", "image", old_url) is None
+    assert mongo.db.posts.find_one({"_id": post["id"]})["image_variants"] is None
+
+def test_external_urls_are_skipped(uploads, mock_mongo_app):
+    mock_mongo_app.config['IMAGE_PIPELINE_ENABLED'] = True
+    assert schedule_variants("posts", None, "image_url", "image_variants", "image", "https://example.com/cat.jpg") is None
+
+def test_scheduled_job_runs_on_pool(uploads, mock_mongo_app):
+    tmp_path, user_id = uploads
+    mock_mongo_app.config['IMAGE_PIPELINE_ENABLED'] = True
+    community = Community.create_community("Photo Club", "Share your best shots here.", user_id)
+    image_url = _photo(tmp_path, "post_images", "pool.jpg", (500, 500))
+    post_id = mongo.db.posts.insert_one({"image_url": image_url, "community_id": community["id"]}).inserted_id
+    future = schedule_variants("posts", post_id, "image_url", "image_variants", "image", image_url)
+    assert future.result(timeout=10)["thumb320"]["width"] == 320
@@ -0,0 +1,148 @@
+# tests/test_invalidation_bus.py
+import threading
+import pytest
+from app.services.invalidation_bus import InvalidationBus, MongoCappedBackend
+
+mongomock = pytest.importorskip("mongomock")
+
+@pytest.fixture
+def worker_pair():
+    """Two buses sharing one Mongo database, standing in for two gunicorn workers."""
+    database = mongomock.MongoClient()['bus_test_db']
+    database.create_collection('cache_invalidations') # mongomock has no capped collections; a plain one polls the same way
+    workers = []
+    for _ in range(2):
+        bus = InvalidationBus()
+        bus.configure(MongoCappedBackend(lambda: database, poll_interval=0.01, tailable=False))
+        workers.append(bus)
+    yield workers
+    for bus in workers:
+        bus.stop()
+
+def _collector(bus, kind):
+    received, event = [], threading.Event()
+    def handler(*keys):
+        received.append(keys)
+        event.set()
+    bus.register(kind, handler)
+    return received, event
+
+def test_invalidation_reaches_other_worker(worker_pair):
+    publisher, subscriber = worker_pair
+    local, _ = _collector(publisher, 'response-tags')
+    remote, remote_event = _collector(subscriber, 'response-tags')
+    subscriber.ensure_listening()
+    publisher.ensure_listening()
+    subscriber._thread.join(timeout=0.05) # Let the listener record its starting position
+
+    publisher.publish('response-tags', 'community:abc', 'communities')
+    assert local == [('community:abc', 'communities')] # Applied synchronously in the writer
+    assert remote_event.wait(timeout=2)
+    assert remote == [('community:abc', 'communities')]
+
+    metrics = subscriber.metrics.snapshot()
+    assert metrics["received"] == 1
+    assert metrics["lastLagMs"] is not None and metrics["maxLagMs"] >= 0
+    assert publisher.metrics.snapshot()["published"] == 1
+    # The publisher ignores its own broadcast instead of applying it twice
+    publisher._thread.join(timeout=0.1)
+    assert local == [('community:abc', 'communities')]
+
+def test_listener_skips_messages_published_before_it_started(worker_pair):
+    publisher, subscriber = worker_pair
+    publisher.publish('user', 'old-user')
+    remote, remote_event = _collector(subscriber, 'user')
+    subscriber.ensure_listening()
+    subscriber._thread.join(timeout=0.05)
+    publisher.publish('user', 'new-user')
+    assert remote_event.wait(timeout=2)
+    assert remote == [('new-user',)]
+
+def _wait_for(received, count):
+    for _ in range(200):
+        if len(received) >= count:
+            return
+        threading.Event().wait(0.01)
+
+def test_listener_delivers_numbers_inserted_out_of_order_once(worker_pair):
+    publisher, subscriber = worker_pair
+    remote, _ = _collector(subscriber, 'post')
+    subscriber.ensure_listening()
+    subscriber._thread.join(timeout=0.05)
+    # Another process took its number first but inserted it last
+    collection = publisher.backend.collection()
+    early, late = publisher.backend._next_seq(), publisher.backend._next_seq()
+    collection.insert_one({"seq": late, "kind": "post", "keys": ["second"], "origin": "other-b"})
+    _wait_for(remote, 1)
+    collection.insert_one({"seq": early, "kind": "post", "keys": ["first"], "origin": "other-a"})
+    _wait_for(remote, 2)
+    subscriber._thread.join(timeout=0.1) # Further polls resume past both and deliver nothing again
+    assert remote == [('second',), ('first',)]
+
+def test_listener_resumes_past_its_last_message_instead_of_rescanning():
+    database = mongomock.MongoClient()['bus_test_db']
+    database.create_collection('cache_invalidations')
+    backend = MongoCappedBackend(lambda: database, poll_interval=0.01, tailable=False)
+    for n in range(3):
+        backend.publish({"kind": "post", "keys": [str(n)]})
+    queries = []
+    find = database.cache_invalidations.find
+    class Recording:
+        def __getattr__(self, name):
+            return getattr(database.cache_invalidations, name)
+        def find(self, *args, **kwargs):
+            queries.append(args[0] if args else {})
+            return find(*args, **kwargs)
+    backend.collection = lambda: Recording()
+    stop = threading.Event()
+    delivered = []
+    def deliver(doc):
+        delivered.append(doc["keys"])
+        stop.set()
+    listener = threading.Thread(target=backend.listen, args=(deliver, stop), daemon=True)
+    listener.start()
+    threading.Event().wait(0.05)
+    backend.publish({"kind": "post", "keys": ["new"]})
+    listener.join(timeout=2)
+    assert delivered == [["new"]]
+    assert queries and all(query == {"seq": {"$gt": 3}} for query in queries)
+
+def test_lost_number_stops_holding_the_resume_point_back(monkeypatch):
+    monkeypatch.setattr(MongoCappedBackend, "GAP_TIMEOUT_SECONDS", 0)
+    resume, delivered = {"seq": 4, "ahead": set(), "gap_since": None}, []
+    MongoCappedBackend._deliver_in_order({"seq": 6}, resume, delivered.append) # 5 was never inserted
+    MongoCappedBackend._deliver_in_order({"seq": 7}, resume, delivered.append)
+    assert resume["seq"] == 4
+    MongoCappedBackend._advance(resume) # Gap first seen
+    MongoCappedBackend._advance(resume)
+    assert resume == {"seq": 7, "ahead": set(), "gap_since": None} and len(delivered) == 2
+
+def test_publish_failure_does_not_raise():
+    class BrokenBackend:
+        def publish(self, message):
+            raise ConnectionError("bus down")
+    bus = InvalidationBus()
+    bus.configure(BrokenBackend())
+    applied, _ = _collector(bus, 'post')
+    bus.publish('post', 'p1')
+    assert applied == [('p1',)]
+    assert bus.metrics.snapshot()["publishErrors"] == 1
+
+def test_profile_update_drops_cached_author(mock_mongo_app, scraped_student_data):
+    from app.models.user import User
+    from app.services.object_cache import POST_CACHE
+    user = User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")
+    POST_CACHE.clear()
+    POST_CACHE.get_or_build("p1", 1, lambda: {"author": {"id": user["_id"], "name": "JOHN DOE - 1MS22CS118"}})
+    User.update_profile(str(user["_id"]), {"name": "John D"})
+    assert POST_CACHE.snapshot()["entries"] == 0
+
+def test_scraped_rename_drops_cached_author(mock_mongo_app, scraped_student_data):
+    from app.models.user import User
+    from app.services.object_cache import POST_CACHE
+    user = User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")
+    POST_CACHE.clear()
+    POST_CACHE.get_or_build("p1", 1, lambda: {"author": {"id": user["_id"], "name": "JOHN DOE - 1MS22CS118"}})
+    scraped_student_data["studentProfile"]["name"] = "JOHN D"
+    User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")
+    assert POST_CACHE.snapshot()["entries"] == 0
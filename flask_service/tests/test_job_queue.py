@@ -0,0 +1,157 @@
+# tests/test_job_queue.py
+import threading
+from datetime import datetime, timedelta, timezone
+import pytest
+from flask_jwt_extended import create_access_token
+from pymongo.errors import DuplicateKeyError
+from app import mongo
+from app.models.comment import Comment
+from app.models.community import Community
+from app.models.post import Post
+from app.models.user import User
+from app.services import job_queue
+from app.services.community_directory import COMMUNITY_DIRECTORY
+from app.services.counter_reconciler import apply, observe, reconcile_recent_posts
+from app.services.job_queue import (JobWorker, claim_job, complete_job, enqueue, get_job_queue_metrics,
+                                    register_job_handler, requeue_expired_leases)
+from app.services.object_cache import POST_CACHE
+
+@pytest.fixture
+def queue_app(mock_mongo_app):
+    mock_mongo_app.config.update(JOB_POLL_SECONDS=0.01, JOB_RETRY_BASE_SECONDS=0, JOB_MAX_ATTEMPTS=3)
+    ran, lock = [], threading.Lock()
+
+    def record(payload):
+        with lock:
+            ran.append(payload["n"])
+
+    def flaky(payload):
+        if mongo.db.jobs.find_one({"payload.n": payload["n"]})["attempts"] < 2:
+            raise RuntimeError("portal timeout")
+        record(payload)
+
+    def broken(payload):
+        raise RuntimeError("always fails")
+
+    register_job_handler("test-record", record, concurrency=2)
+    register_job_handler("test-flaky", flaky)
+    register_job_handler("test-broken", broken, max_attempts=2)
+    yield mock_mongo_app, ran
+    for name in ("test-record", "test-flaky", "test-broken"):
+        job_queue.JOB_HANDLERS.pop(name, None)
+
+def _worker(app, *job_types, **kwargs):
+    return JobWorker(app, job_types=list(job_types), name="test-worker", **kwargs)
+
+def test_claims_by_priority_and_collapses_duplicates(queue_app):
+    app, _ = queue_app
+    low = enqueue("test-record", {"n": 1}, priority=0)
+    high = enqueue("test-record", {"n": 2}, priority=5)
+    first = enqueue("test-record", {"n": 3}, dedupe_key="user:42")
+    assert enqueue("test-record", {"n": 3}, dedupe_key="user:42", priority=9) == first
+    enqueue("test-record", {"n": 4}, delay_seconds=3600) # Not ready yet
+
+    claimed = [claim_job(["test-record"], "w", 60)["_id"] for _ in range(3)]
+    assert claimed == [first, high, low] # The duplicate raised the queued job's priority
+    assert claim_job(["test-record"], "w", 60) is None
+    # Once claimed, the same key queues a new run
+    assert enqueue("test-record", {"n": 3}, dedupe_key="user:42") not in (first, None)
+
+def test_first_enqueue_creates_the_dedupe_index(queue_app):
+    assert "jobs_dedupe" not in mongo.db.jobs.index_information() # `flask create-indexes` never ran
+    enqueue("test-record", {"n": 1}, dedupe_key="user:7")
+    assert "jobs_dedupe" in mongo.db.jobs.index_information()
+    with pytest.raises(DuplicateKeyError): # What a racing enqueue's upsert now runs into
+        mongo.db.jobs.insert_one({"type": "test-record", "status": "queued", "dedupe_key": "user:7"})
+
+def test_worker_runs_retries_and_fails_jobs(queue_app):
+    app, ran = queue_app
+    for n in range(5):
+        enqueue("test-record", {"n": n})
+    enqueue("test-flaky", {"n": 100})
+    broken_id = enqueue("test-broken", {"n": 200})
+
+    worker = _worker(app, "test-record", "test-flaky", "test-broken")
+    worker.run(max_jobs=9) # 5 + flaky (1 retry + 1 success) + broken (1 retry + 1 failure)
+    assert sorted(ran) == [0, 1, 2, 3, 4, 100]
+    stats = worker.snapshot()
+    assert (stats["completed"], stats["retried"], stats["failed"]) == (6, 2, 1)
+    broken = mongo.db.jobs.find_one({"_id": broken_id})
+    assert broken["status"] == "failed" and broken["attempts"] == 2 and "always fails" in broken["last_error"]
+
+    metrics = get_job_queue_metrics()
+    assert metrics["finished"]["test-record"]["done"] == 5
+    assert metrics["finished"]["test-record"]["runMs"]["count"] == 5
+    assert metrics["finished"]["test-broken"]["failed"] == 1
+
+def test_expired_lease_is_reclaimed_and_stale_result_dropped(queue_app):
+    app, _ = queue_app
+    job_id = enqueue("test-record", {"n": 1})
+    stale = claim_job(["test-record"], "crashed-worker", 60)
+    mongo.db.jobs.update_one({"_id": job_id}, {"$set": {"lease_expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+    assert requeue_expired_leases() == 1
+
+    depth = get_job_queue_metrics()["depth"]["test-record"]
+    assert depth["queued"] == depth["ready"] == 1 and depth["running"] == 0
+    fresh = claim_job(["test-record"], "live-worker", 60)
+    assert fresh["_id"] == job_id and fresh["attempts"] == 2
+    assert complete_job(stale) is None # The crashed worker's late result does not count
+    assert complete_job(fresh) is not None
+    assert mongo.db.jobs.find_one({"_id": job_id})["status"] == "done"
+
+def test_per_type_concurrency_limit(queue_app):
+    app, _ = queue_app
+    for n in range(4):
+        enqueue("test-record", {"n": n})
+    enqueue("test-flaky", {"n": 100})
+    worker = _worker(app, "test-record", "test-flaky")
+    worker._executor = worker._make_executor()
+    try:
+        worker._claim_available()
+        running = [job["type"] for job in worker._running.values()]
+        assert sorted(running) == ["test-flaky", "test-record", "test-record"]
+    finally:
+        worker._executor.shutdown(wait=True)
+
+@pytest.fixture
+def thread(mock_mongo_app, scraped_student_data):
+    COMMUNITY_DIRECTORY.clear()
+    POST_CACHE.clear()
+    mock_mongo_app.config.update(IMAGE_PIPELINE_ENABLED=False, PURGE_BATCH_PAUSE_SECONDS=0, JOB_POLL_SECONDS=0.01)
+    user = User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")
+    user_id = str(user["_id"])
+    community = Community.create_community("Coding Club", "A place to talk about code.", user_id)
+    post = Post.create_post(community["slug"], user_id, "Thread", "text", content_text="Hello")
+    top = Comment.create_comment(str(post["id"]), user_id, "Top-level")
+    reply = Comment.create_comment(str(post["id"]), user_id, "Reply", str(top["id"]))
+    headers = {"Authorization": f"Bearer {create_access_token(identity=user_id)}"}
+    yield {"app": mock_mongo_app, "user_id": user_id, "post_id": post["id"], "top": top, "reply": reply, "headers": headers}
+    COMMUNITY_DIRECTORY.clear()
+
+def test_deleted_post_is_purged_by_the_worker(thread):
+    app = thread["app"]
+    app.config.update(JOB_QUEUE_ENABLED=True, PURGE_ON_DELETE=True)
+    response = app.test_client().delete(f"/api/v1/posts/{thread['post_id']}", headers=thread["headers"])
+    assert response.status_code == 200
+    job = mongo.db.jobs.find_one({"type": "purge"})
+    assert job["payload"] == {"collection": "posts", "id": str(thread["post_id"])}
+    assert mongo.db.posts.count_documents({}) == 1 # Nothing purged on the request
+
+    JobWorker(app, job_types=["purge"]).run(max_jobs=1)
+    assert mongo.db.posts.count_documents({}) == 0 and mongo.db.comments.count_documents({}) == 0
+
+def test_reconciler_repairs_settled_drift_only(thread):
+    post_id, top_id = thread["post_id"], thread["top"]["id"]
+    mongo.db.posts.update_one({"_id": post_id}, {"$set": {"comment_count": 7, "upvotes": 3}})
+    mongo.db.comments.update_one({"_id": top_id}, {"$set": {"reply_count": 0}})
+    assert reconcile_recent_posts(since_seconds=3600, quiet_seconds=0) == {"checked": 1, "drifted": 1, "fixed": 2}
+    post = mongo.db.posts.find_one({"_id": post_id})
+    assert (post["comment_count"], post["upvotes"]) == (2, 0)
+    assert mongo.db.comments.find_one({"_id": top_id})["reply_count"] == 1
+
+    # A delta landing between the two looks means the counter was in flight, not lost
+    mongo.db.posts.update_one({"_id": post_id}, {"$set": {"upvotes": 1}})
+    observed = observe(post_id)
+    mongo.db.posts.update_one({"_id": post_id}, {"$inc": {"upvotes": -1}})
+    assert apply(post_id, observed) == 0
+    assert mongo.db.posts.find_one({"_id": post_id})["upvotes"] == 0
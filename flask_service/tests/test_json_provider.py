@@ -0,0 +1,45 @@
+# tests/test_json_provider.py
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+import pytest
+from bson import ObjectId
+from app.utils.json_provider import MongoJSONProvider, OrjsonProvider, encode_extra_types
+
+PAYLOAD = {
+    "id": ObjectId("64b7f0c2a1b2c3d4e5f60718"),
+    "created_at": datetime(2024, 5, 1, 9, 30, 15, 123456),
+    "aware_at": datetime(2024, 5, 1, 9, 30, tzinfo=timezone.utc),
+    "blob": b"\x00\x01png",
+    "gpa": Decimal("8.70"),
+    "tags": ["a", "b"],
+    "missing": None,
+}
+
+EXPECTED = {
+    "id": "64b7f0c2a1b2c3d4e5f60718",
+    "created_at": "2024-05-01T09:30:15.123456",
+    "aware_at": "2024-05-01T09:30:00+00:00",
+    "blob": "AAFwbmc=",
+    "gpa": "8.70", # As Flask's default provider encoded it
+    "tags": ["a", "b"],
+    "missing": None,
+}
+
+def test_app_uses_fast_provider(mock_mongo_app):
+    pytest.importorskip("orjson")
+    assert isinstance(mock_mongo_app.json, OrjsonProvider)
+
+@pytest.mark.parametrize("provider_class", [MongoJSONProvider, OrjsonProvider], ids=["stdlib", "orjson"])
+def test_providers_encode_mongo_types_identically(mock_mongo_app, provider_class):
+    if provider_class is OrjsonProvider:
+        pytest.importorskip("orjson")
+    provider = provider_class(mock_mongo_app)
+    assert json.loads(provider.dumps(PAYLOAD)) == EXPECTED
+    response = provider.response({"data": PAYLOAD})
+    assert response.mimetype == "application/json"
+    assert response.get_json() == {"data": EXPECTED}
+
+def test_encode_extra_types_rejects_unknown_objects():
+    with pytest.raises(TypeError):
+        encode_extra_types(object())
@@ -0,0 +1,105 @@
+# tests/test_object_cache.py
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from app.models.post import Post
+from app.services.object_cache import POST_CACHE, VersionedObjectCache, get_object_cache_metrics
+
+@pytest.fixture
+def post_doc(mock_mongo_app):
+    POST_CACHE.clear()
+    now = datetime.utcnow()
+    doc = {"_id": ObjectId(), "community_id": ObjectId(), "author_id": ObjectId(), "title": "Hot post",
+           "content_type": "text", "content_text": "Hello", "upvotes": 3, "downvotes": 0, "comment_count": 1,
+           "upvoted_by": [], "downvoted_by": [], "created_at": now, "updated_at": now, "last_activity_at": now,
+           "content_updated_at": now}
+    yield doc
+    POST_CACHE.clear()
+
+def test_post_serialization_is_reused_until_content_changes(post_doc):
+    first = Post.to_dict(post_doc)
+    hits = POST_CACHE.hits
+    post_doc["upvotes"] = 10 # A vote: counters and updated_at are not part of the cached form
+    post_doc["updated_at"] += timedelta(seconds=1)
+    second = Post.to_dict(post_doc)
+    assert POST_CACHE.hits == hits + 1
+    assert second["upvotes"] == 10 and first["upvotes"] == 3
+    assert second["updated_at"] == post_doc["updated_at"] != first["updated_at"]
+    assert second["author"] is first["author"]
+
+    post_doc["title"] = "Edited title"
+    post_doc["content_updated_at"] += timedelta(seconds=1)
+    assert Post.to_dict(post_doc)["title"] == "Edited title"
+
+def test_user_vote_is_not_cached(post_doc):
+    voter = ObjectId()
+    post_doc["upvoted_by"] = [voter]
+    assert Post.to_dict(post_doc, str(voter))["user_vote"] == "up"
+    assert Post.to_dict(post_doc)["user_vote"] is None
+
+def test_memory_caps_evict_least_recently_used(mock_mongo_app):
+    mock_mongo_app.config["OBJECT_CACHE_MAX_BYTES"] = 2000
+    cache = VersionedObjectCache("test")
+    for i in range(10):
+        cache.get_or_build(i, 1, lambda: {"text": "x" * 500})
+    snapshot = cache.snapshot()
+    assert snapshot["approxBytes"] <= 2000
+    assert snapshot["evictions"] == 10 - snapshot["entries"]
+    assert cache.get_or_build(9, 1, lambda: {"text": "rebuilt"}) == {"text": "x" * 500}
+    assert cache.snapshot()["hitRatio"] == round(1 / 11, 3)
+
+def test_metrics_report_both_caches(post_doc):
+    Post.to_dict(post_doc)
+    Post.to_dict(post_doc)
+    metrics = get_object_cache_metrics()
+    assert set(metrics) == {"posts", "communities"}
+    assert metrics["posts"]["hitRatio"] == 0.5
+
+def test_vote_moves_updated_at_without_evicting_the_post(mock_mongo_app, scraped_student_data):
+    from app import mongo
+    from app.models.community import Community
+    from app.models.user import User
+    from app.services.community_directory import COMMUNITY_DIRECTORY
+    COMMUNITY_DIRECTORY.clear()
+    POST_CACHE.clear()
+    user_id = str(User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")["_id"])
+    community = Community.create_community("Coding Club", "A place to talk about code.", user_id)
+    created = Post.create_post(community["slug"], user_id, "Hot post", "text", content_text="Hi")
+    mongo.db.posts.update_one({"_id": created["id"]}, {"$set": {"updated_at": datetime(2026, 1, 1)}})
+    before = mongo.db.posts.find_one({"_id": created["id"]})
+
+    Post.vote_on_post(str(created["id"]), str(ObjectId()), "up")
+    after = mongo.db.posts.find_one({"_id": created["id"]})
+    assert after["updated_at"] > before["updated_at"] # Clients still see a vote as an update
+    assert after["content_updated_at"] == before["content_updated_at"]
+    hits = POST_CACHE.hits
+    assert Post.to_dict(after)["updated_at"] == after["updated_at"]
+    assert POST_CACHE.hits == hits + 1
+    COMMUNITY_DIRECTORY.clear()
+
+def test_joins_and_new_posts_keep_the_cached_community(mock_mongo_app, scraped_student_data):
+    from app import mongo
+    from app.models.community import Community
+    from app.models.user import User
+    from app.services.community_directory import COMMUNITY_DIRECTORY
+    from app.services.object_cache import COMMUNITY_CACHE
+    COMMUNITY_DIRECTORY.clear()
+    COMMUNITY_CACHE.clear()
+    user_id = str(User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")["_id"])
+    community = Community.create_community("Coding Club", "A place to talk about code.", user_id)
+    community_id = community["id"]
+    mongo.db.communities.update_one({"_id": community_id}, {"$set": {"updatedAt": datetime(2026, 1, 1)}})
+    Community.to_dict(mongo.db.communities.find_one({"_id": community_id}))
+
+    Community.join_community(str(community_id), str(ObjectId()))
+    Community.increment_post_count(community_id)
+    doc = mongo.db.communities.find_one({"_id": community_id})
+    hits = COMMUNITY_CACHE.hits
+    served = Community.to_dict(doc)
+    assert COMMUNITY_CACHE.hits == hits + 1
+    assert served["updatedAt"] == doc["updatedAt"] > datetime(2026, 1, 1)
+    assert served["memberCount"] == 2 and served["postCount"] == 1
+
+    Community.update_community(str(community_id), user_id, {"description": "Now about compilers too."})
+    assert Community.to_dict(mongo.db.communities.find_one({"_id": community_id}))["description"] == "Now about compilers too."
+    COMMUNITY_DIRECTORY.clear()
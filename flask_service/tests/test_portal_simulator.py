@@ -0,0 +1,61 @@
+# tests/test_portal_simulator.py
+import time
+import pytest
+from urllib.parse import urljoin
+from app.config import Config
+from app.services.college_portal_scraper import scrape_and_parse_college_data
+from tests.portal_simulator import PortalSimulator, SimulatorServer, PORTAL_PATH
+
+@pytest.fixture
+def simulator_server(monkeypatch):
+    server = SimulatorServer(PortalSimulator(students={"1MS21IS001": {"name": "JANE ROE", "dob": "2003-02-01"}},
+                                             accept_any_credentials=False)).start()
+    monkeypatch.setattr(Config, 'COLLEGE_BASE_URL', server.base_url)
+    monkeypatch.setattr(Config, 'COLLEGE_LOGIN_URL', urljoin(server.base_url, PORTAL_PATH))
+    yield server
+    server.stop()
+
+def test_scrape_against_simulator(simulator_server):
+    data, success = scrape_and_parse_college_data("1ms21is001", "1", "2", "2003")
+    assert success, data["errorMessages"]
+    assert data["studentProfile"]["usn"] == "1MS21IS001"
+    assert data["studentProfile"]["name"] == "JANE ROE"
+    assert len(data["dashboardSummaries"]) == 6
+    assert data["examHistory"]["mostRecentCGPA"] == 8.57
+    # token page, login POST, dashboard, exam history
+    assert simulator_server.simulator.request_count == 4
+
+def test_simulator_rejects_bad_credentials(simulator_server):
+    data, success = scrape_and_parse_college_data("1MS21IS001", "9", "9", "1999")
+    assert not success
+    assert any("Invalid credentials" in e for e in data["errorMessages"])
+
+def test_simulator_failure_injection(simulator_server):
+    simulator_server.simulator.failure_rate = 1.0
+    data, success = scrape_and_parse_college_data("1MS21IS001", "1", "2", "2003")
+    assert not success
+    assert any("503" in e for e in data["errorMessages"])
+
+def test_post_login_pages_fetched_concurrently(simulator_server):
+    simulator_server.simulator.latency = 0.2
+    data, success = scrape_and_parse_college_data("1MS21IS001", "1", "2", "2003")
+    assert success, data["errorMessages"]
+    assert data["examHistory"]["mostRecentCGPA"] == 8.57
+    # Dashboard and exam history were in flight on the portal at the same time
+    assert simulator_server.simulator.max_in_flight == 2
+
+def test_failed_dashboard_check_settles_page_fetches(simulator_server):
+    simulator = simulator_server.simulator
+    simulator._render_dashboard = lambda session: "<html><body>Maintenance</body></html>" # No USN on the page
+    respond, finished = simulator._respond, []
+    def slow_exam_history(start_response, status, body, set_session=None):
+        if body is simulator._exam_history_page:
+            time.sleep(0.3)
+            finished.append(body)
+        return respond(start_response, status, body, set_session=set_session)
+    simulator._respond = slow_exam_history
+    data, success = scrape_and_parse_college_data("1MS21IS001", "1", "2", "2003")
+    assert not success
+    assert any("Failed to extract student USN" in e for e in data["errorMessages"])
+    # The early return waited for the in-flight exam history fetch before the session was torn down
+    assert finished
@@ -0,0 +1,44 @@
+# tests/test_portal_transport.py
+import pytest
+from urllib.parse import urljoin
+from app.config import Config
+from app.services.college_portal_scraper import scrape_and_parse_college_data
+from app.services.portal_transport import (
+    portal_session, reset_shared_adapter, get_transport_metrics, TRANSPORT_METRICS
+)
+from tests.portal_simulator import PortalSimulator, SimulatorServer, PORTAL_PATH
+
+@pytest.fixture
+def simulator_server(monkeypatch):
+    server = SimulatorServer(PortalSimulator()).start()
+    monkeypatch.setattr(Config, 'COLLEGE_BASE_URL', server.base_url)
+    monkeypatch.setattr(Config, 'COLLEGE_LOGIN_URL', urljoin(server.base_url, PORTAL_PATH))
+    reset_shared_adapter()
+    TRANSPORT_METRICS.reset()
+    yield server
+    reset_shared_adapter()
+    server.stop()
+
+def test_logins_reuse_pooled_connections(simulator_server):
+    for usn in ("1MS22CS001", "1MS22CS002", "1MS22CS003"):
+        _, success = scrape_and_parse_college_data(usn, "13", "04", "2004")
+        assert success
+
+    metrics = get_transport_metrics()
+    assert metrics["requests"] == 12
+    # Each login keeps at most two requests in flight (dashboard + exam history),
+    # so sequential logins ride on the same two keep-alive connections
+    assert metrics["connectionsOpened"] <= 2
+    assert simulator_server.simulator.connection_count == metrics["connectionsOpened"]
+    assert metrics["connectionsReused"] >= 10
+
+def test_each_login_gets_isolated_cookie_jar(simulator_server):
+    with portal_session() as first:
+        first.get(Config.COLLEGE_LOGIN_URL)
+        assert len(first.cookies) == 1
+        with portal_session() as second:
+            assert len(second.cookies) == 0
+            second.get(Config.COLLEGE_LOGIN_URL)
+            assert second.cookies.get_dict() != first.cookies.get_dict()
+    # The pool outlives the sessions
+    assert get_transport_metrics()["connectionsOpened"] <= 2
@@ -0,0 +1,91 @@
+# tests/test_purger.py
+import hashlib
+import pytest
+from flask_jwt_extended import create_access_token
+from app import mongo
+from app.models.comment import Comment
+from app.models.community import Community
+from app.models.post import Post
+from app.models.upload import Upload
+from app.models.user import User
+from app.services.community_directory import COMMUNITY_DIRECTORY
+from app.services.object_cache import POST_CACHE
+from app.services.purger import _purge_comment_step, purge_document, run_purge_pass
+
+IMAGE_SHA = hashlib.sha256(b"thread-image").hexdigest()
+IMAGE_URL = f"https://unicampusbackend.duckdns.org/uploads/blobs/{IMAGE_SHA[:2]}/{IMAGE_SHA}.png"
+
+@pytest.fixture
+def thread(mock_mongo_app, scraped_student_data):
+    COMMUNITY_DIRECTORY.clear()
+    POST_CACHE.clear()
+    mock_mongo_app.config['IMAGE_PIPELINE_ENABLED'] = False
+    mock_mongo_app.config['PURGE_BATCH_PAUSE_SECONDS'] = 0
+    Upload.get_collection().insert_one({"_id": IMAGE_SHA, "refcount": 0})
+    user = User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")
+    user_id = str(user["_id"])
+    community = Community.create_community("Coding Club", "A place to talk about code.", user_id)
+    post = Post.create_post(community["slug"], user_id, "Big thread", "image", image_url=IMAGE_URL)
+    Community.increment_post_count(community["id"])
+    post_id = str(post["id"])
+    top = Comment.create_comment(post_id, user_id, "Top-level")
+    replies = [Comment.create_comment(post_id, user_id, f"Reply {n}", str(top["id"])) for n in range(5)]
+    nested = Comment.create_comment(post_id, user_id, "Nested reply", str(replies[0]["id"]))
+    other = Comment.create_comment(post_id, user_id, "Unrelated")
+    headers = {"Authorization": f"Bearer {create_access_token(identity=user_id)}"}
+    yield {"client": mock_mongo_app.test_client(), "headers": headers, "post_id": post_id, "community": community,
+           "top": top, "replies": replies, "nested": nested, "other": other}
+    COMMUNITY_DIRECTORY.clear()
+
+def _comment_count(post_id):
+    return mongo.db.posts.find_one({"_id": Post.find_by_id_for_user(post_id)["id"]})["comment_count"]
+
+def test_comment_delete_hides_now_and_purges_replies_later(thread):
+    client, headers, post_id = thread["client"], thread["headers"], thread["post_id"]
+    assert _comment_count(post_id) == 8
+    response = client.delete(f"/api/v1/comments/{thread['top']['id']}", headers=headers)
+    assert response.status_code == 200
+    assert Comment.find_by_id(str(thread["top"]["id"])) is None
+    assert _comment_count(post_id) == 7 # Only the comment itself so far
+    assert client.delete(f"/api/v1/comments/{thread['top']['id']}", headers=headers).status_code == 404
+
+    passes = 0
+    while any(run_purge_pass(batch_size=2).values()): # Each level of replies is hidden by one pass and purged by the next
+        passes += 1
+    assert passes == 3
+    assert mongo.db.comments.count_documents({}) == 1
+    assert _comment_count(post_id) == 1
+    listed = Comment.get_comments_for_post_for_user(post_id)
+    assert [c["id"] for c in listed["comments"]] == [thread["other"]["id"]] and listed["total"] == 1
+
+def test_retried_reply_batch_does_not_double_count(thread):
+    top_id = thread["top"]["id"]
+    Comment.delete_comment(str(top_id), str(mongo.db.users.find_one()["_id"]))
+    assert _purge_comment_step(top_id, 3) is False
+    first_batch = mongo.db.posts.find_one()["purge_tokens"]
+    replayed = mongo.db.comments.find({"deleted_by_purge": first_batch[0]}, {"_id": 1})
+    # Crash replay: the journal of the batch that was already applied is still on the comment
+    mongo.db.comments.update_one({"_id": top_id}, {"$set": {"purge_batch": {"token": first_batch[0],
+                                                                            "ids": [doc["_id"] for doc in replayed]}}})
+    assert _purge_comment_step(top_id, 3) is False
+    assert _comment_count(thread["post_id"]) == 8 - 1 - 3
+    purge_document("comments", top_id, batch_size=3)
+    assert _comment_count(thread["post_id"]) == 8 - 1 - 5
+
+def test_post_delete_is_soft_then_purged_in_batches(thread):
+    client, headers, post_id = thread["client"], thread["headers"], thread["post_id"]
+    response = client.delete(f"/api/v1/posts/{post_id}", headers=headers)
+    assert response.status_code == 200
+    assert client.get(f"/api/v1/posts/{post_id}", headers=headers).status_code == 404
+    assert Post.get_posts_for_community_for_user(str(thread["community"]["id"]))["total"] == 0
+    assert Community.find_by_id_or_slug(thread["community"]["slug"])["postCount"] == 0
+    with pytest.raises(ValueError):
+        Comment.create_comment(post_id, str(mongo.db.users.find_one()["_id"]), "Too late")
+    assert mongo.db.comments.count_documents({}) == 8 # Nothing removed inside the request
+
+    steps = purge_document("posts", post_id, batch_size=3)
+    assert steps == 4 # Three comment batches, then the post itself
+    assert mongo.db.posts.count_documents({}) == 0 and mongo.db.comments.count_documents({}) == 0
+    assert Upload.get_collection().find_one({"_id": IMAGE_SHA})["refcount"] == 0 # Released exactly once
+    assert purge_document("posts", post_id) == 1 # Re-running a finished purge is a no-op
+    assert Upload.get_collection().find_one({"_id": IMAGE_SHA})["refcount"] == 0
@@ -0,0 +1,74 @@
+# tests/test_response_cache.py
+import pytest
+from flask_jwt_extended import create_access_token
+from app.models.community import Community
+from app.models.post import Post
+from app.models.user import User
+from app.services.response_cache import RESPONSE_CACHE, ResponseCache, cache_key
+
+@pytest.fixture
+def community_setup(mock_mongo_app, scraped_student_data):
+    RESPONSE_CACHE.clear()
+    user = User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")
+    user_id = str(user["_id"])
+    community = Community.create_community("Coding Club", "A place to talk about code.", user_id)
+    post = Post.create_post(str(community["id"]), user_id, "First post", "text", content_text="Hello")
+    token = create_access_token(identity=user_id)
+    yield {"user_id": user_id, "community_id": str(community["id"]), "post_id": str(post["id"]),
+           "headers": {"Authorization": f"Bearer {token}"}, "client": mock_mongo_app.test_client()}
+    RESPONSE_CACHE.clear()
+
+def test_cache_key_is_order_independent():
+    assert cache_key('communities', page=1, limit=10) == cache_key('communities', limit=10, page=1)
+    assert cache_key('communities', page=1, q=None) == cache_key('communities', page=1)
+
+def test_lru_eviction_and_tag_invalidation():
+    cache = ResponseCache()
+    cache.set("a", {"v": 1}, 60, tags=["community:1"], max_entries=2)
+    cache.set("b", {"v": 2}, 60, tags=["community:2"], max_entries=2)
+    cache.set("c", {"v": 3}, 60, tags=["community:1"], max_entries=2)
+    assert cache.get("a") is None # Evicted as least recently used
+    cache.invalidate("community:1")
+    assert cache.get("c") is None
+    assert cache.get("b") == {"v": 2}
+
+def test_community_list_is_shared_and_overlays_membership(community_setup):
+    client = community_setup["client"]
+    anonymous = client.get('/api/v1/communities').get_json()
+    assert anonymous["data"][0]["is_member"] is False
+
+    hits_before = RESPONSE_CACHE.hits
+    member_view = client.get('/api/v1/communities', headers=community_setup["headers"]).get_json()
+    assert RESPONSE_CACHE.hits == hits_before + 1
+    assert member_view["data"][0]["is_member"] is True
+    # The cached anonymous payload was not modified by the overlay
+    assert client.get('/api/v1/communities').get_json()["data"][0]["is_member"] is False
+
+def test_community_detail_invalidated_on_update(community_setup):
+    client = community_setup["client"]
+    path = f"/api/v1/communities/{community_setup['community_id']}"
+    assert client.get(path).get_json()["data"]["community"]["description"] == "A place to talk about code."
+
+    Community.update_community(community_setup["community_id"], community_setup["user_id"],
+                               {"description": "Updated description here."})
+    detail = client.get(path, headers=community_setup["headers"]).get_json()["data"]["community"]
+    assert detail["description"] == "Updated description here."
+    assert detail["is_member"] is True
+
+def test_post_page_overlays_votes_and_invalidates_on_vote(community_setup):
+    client = community_setup["client"]
+    path = f"/api/v1/communities/{community_setup['community_id']}/posts"
+    first = client.get(path, headers=community_setup["headers"]).get_json()["data"][0]
+    assert first["upvotes"] == 0 and first["user_vote"] is None
+
+    Post.vote_on_post(community_setup["post_id"], community_setup["user_id"], "up")
+    voted = client.get(path, headers=community_setup["headers"]).get_json()["data"][0]
+    assert voted["upvotes"] == 1 and voted["user_vote"] == "up"
+    assert client.get(path).get_json()["data"][0]["user_vote"] is None
+
+def test_new_post_invalidates_community_pages(community_setup):
+    client = community_setup["client"]
+    path = f"/api/v1/communities/{community_setup['community_id']}/posts"
+    assert client.get(path).get_json()["results"] == 1
+    Post.create_post(community_setup["community_id"], community_setup["user_id"], "Second post", "text", content_text="Hi")
+    assert client.get(path).get_json()["results"] == 2
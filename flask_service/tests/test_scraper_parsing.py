@@ -0,0 +1,48 @@
+# tests/test_scraper_parsing.py
+import os
+from app.services.college_portal_scraper import (
+    _extract_basic_student_info, _extract_dashboard_subject_summaries,
+    _extract_exam_history, parse_dashboard, parse_dashboard_html
+)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+def _read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+def test_parse_dashboard_matches_separate_extractors():
+    html = _read_fixture('dashboard.html')
+    profile, summaries, errors = parse_dashboard(html)
+
+    # Raw HTML path (parses independently) must give the same result as the shared tree
+    assert (profile, []) == _extract_basic_student_info(html)
+    assert (summaries, []) == _extract_dashboard_subject_summaries(html)
+    assert errors == []
+
+    assert profile == {
+        "name": "JOHN DOE", "usn": "1MS22CS118", "semester": 5,
+        "section": "B", "department": "Computer Science & Engineering"
+    }
+    by_code = {s["code"]: s for s in summaries}
+    assert by_code["CS53"] == {"code": "CS53", "name": "Database Systems", "cieTotal": 45, "attendancePercentage": 78}
+    assert len(summaries) == 6
+
+def test_extractors_accept_prebuilt_tree():
+    soup = parse_dashboard_html(_read_fixture('dashboard.html'))
+    profile, _ = _extract_basic_student_info(soup)
+    summaries, _ = _extract_dashboard_subject_summaries(soup)
+    assert profile["usn"] == "1MS22CS118"
+    assert len(summaries) == 6
+
+def test_non_grade_charts_are_ignored():
+    # The attendance pie chart on the dashboard must not leak into the subject list
+    _, summaries, _ = parse_dashboard(_read_fixture('dashboard.html'))
+    assert all(s["code"] not in ("Present", "Absent") for s in summaries)
+
+def test_extract_exam_history():
+    history, errors = _extract_exam_history(_read_fixture('exam_history.html'))
+    assert errors == []
+    assert [s["semesterName"] for s in history["semesters"]] == ["Semester 1", "Semester 2", "Semester 3", "Semester 4"]
+    assert history["semesters"][1]["cgpa"] == 8.90 # "CGPA : CGPA : 8.90" caption quirk
+    assert history["mostRecentCGPA"] == 8.57
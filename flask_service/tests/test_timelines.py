@@ -0,0 +1,137 @@
+# tests/test_timelines.py
+from datetime import datetime, timedelta, timezone
+import pytest
+from app import mongo
+from app.models.community import Community
+from app.models.post import Post
+from app.models.user import User
+from app.services.community_directory import COMMUNITY_DIRECTORY
+from app.services.home_feed import get_home_feed
+from app.services.job_queue import JobWorker
+from app.services.object_cache import POST_CACHE
+
+@pytest.fixture
+def timeline(mock_mongo_app, scraped_student_data):
+    COMMUNITY_DIRECTORY.clear()
+    POST_CACHE.clear()
+    mock_mongo_app.config.update(IMAGE_PIPELINE_ENABLED=False, TIMELINE_FANOUT_MAX_MEMBERS=10, JOB_POLL_SECONDS=0.01)
+    reader = str(User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")["_id"])
+    scraped_student_data["studentProfile"].update(name="JANE ROE", usn="1MS22CS119")
+    other = str(User.upsert_from_scraped_data(scraped_student_data, "1MS22CS119")["_id"])
+    small = [Community.create_community(f"Small Club {n}", "A small community.", other) for n in range(2)]
+    large = Community.create_community("Large Club", "A community past the fan-out threshold.", other)
+    later = Community.create_community("Later Club", "A community the reader joins later.", other)
+    for community in small + [large]:
+        Community.join_community(str(community["id"]), reader)
+    mongo.db.communities.update_one({"_id": large["id"]}, {"$set": {"memberCount": 5000}})
+
+    clock = [datetime(2026, 1, 1, tzinfo=timezone.utc)]
+    def post(community, title):
+        created = Post.create_post(community["slug"], other, title, "text", content_text="Hello")
+        clock[0] += timedelta(minutes=1) # Distinct, increasing creation times
+        mongo.db.posts.update_one({"_id": created["id"]}, {"$set": {"created_at": clock[0]}})
+        mongo.db.timelines.update_many({"entries.post_id": created["id"]},
+                                       {"$set": {"entries.$.created_at": clock[0]}})
+        return created["id"]
+
+    yield {"app": mock_mongo_app, "reader": reader, "small": small, "large": large, "later": later, "post": post}
+    COMMUNITY_DIRECTORY.clear()
+
+def _walk(reader, limit):
+    ids, cursor = [], None
+    while True:
+        page = get_home_feed(reader, cursor=cursor, limit=limit)
+        ids += [post["id"] for post in page["posts"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            return ids
+
+def _read_time_order(app, reader):
+    app.config['TIMELINE_FANOUT_MAX_MEMBERS'] = 0 # Pure fan-out on read
+    try:
+        return _walk(reader, limit=100)
+    finally:
+        app.config['TIMELINE_FANOUT_MAX_MEMBERS'] = 10
+
+def test_small_communities_fan_out_on_write_and_large_ones_are_read(timeline):
+    reader, post = timeline["reader"], timeline["post"]
+    first = post(timeline["small"][0], "Before the timeline exists")
+    assert [p["id"] for p in get_home_feed(reader)["posts"]] == [first] # Built on first read
+    doc = mongo.db.timelines.find_one()
+    assert set(doc["covered"]) == {c["id"] for c in timeline["small"]}
+
+    small_post = post(timeline["small"][1], "Pushed")
+    large_post = post(timeline["large"], "Read at request time")
+    entries = [entry["post_id"] for entry in mongo.db.timelines.find_one()["entries"]]
+    assert entries == [small_post, first]
+    assert [p["id"] for p in get_home_feed(reader)["posts"]] == [large_post, small_post, first]
+
+    # A covered community that grows past the threshold stops being fanned out to, and is read instead
+    mongo.db.communities.update_one({"_id": timeline["small"][1]["id"]}, {"$set": {"memberCount": 50}})
+    grown_post = post(timeline["small"][1], "Now a large community")
+    assert timeline["small"][1]["id"] not in mongo.db.timelines.find_one()["covered"]
+    assert [p["id"] for p in get_home_feed(reader)["posts"]][:2] == [grown_post, large_post]
+
+def test_trimmed_timelines_stay_bounded_and_match_fan_out_on_read(timeline):
+    app, reader, post = timeline["app"], timeline["reader"], timeline["post"]
+    app.config['TIMELINE_MAX_ENTRIES'] = 3
+    get_home_feed(reader)
+    posts = [post(timeline["small"][n % 2] if n % 3 else timeline["large"], f"Post {n}") for n in range(10)]
+    assert len(mongo.db.timelines.find_one()["entries"]) == 3
+    Post.delete_post(str(posts[8]), str(mongo.db.posts.find_one({"_id": posts[8]})["author_id"]))
+
+    expected = _read_time_order(app, reader)
+    assert len(expected) == 9 and posts[8] not in expected
+    assert _walk(reader, limit=2) == expected # Past the oldest entry, covered communities are queried
+
+def test_join_backfills_through_the_job_queue_and_leave_uncovers(timeline):
+    app, reader, post = timeline["app"], timeline["reader"], timeline["post"]
+    app.config.update(JOB_QUEUE_ENABLED=True)
+    later_posts = [post(timeline["later"], f"Older post {n}") for n in range(3)]
+    get_home_feed(reader)
+    Community.join_community(str(timeline["later"]["id"]), reader)
+    assert mongo.db.jobs.find_one({"type": "timeline-backfill"})["status"] == "queued"
+
+    JobWorker(app, job_types=["timeline-backfill"]).run(max_jobs=1)
+    doc = mongo.db.timelines.find_one()
+    assert timeline["later"]["id"] in doc["covered"]
+    assert [entry["post_id"] for entry in doc["entries"]] == later_posts[::-1]
+    assert [p["id"] for p in get_home_feed(reader)["posts"]] == later_posts[::-1]
+
+    # New posts fan out through the queue too
+    fresh = post(timeline["later"], "After joining")
+    JobWorker(app, job_types=["timeline-fanout"]).run(max_jobs=1)
+    assert mongo.db.timelines.find_one()["entries"][0]["post_id"] == fresh
+
+    Community.leave_community(str(timeline["later"]["id"]), reader)
+    assert timeline["later"]["id"] not in mongo.db.timelines.find_one()["covered"]
+    assert get_home_feed(reader)["posts"] == []
+
+def test_racing_fan_out_and_backfill_hold_a_post_once(timeline):
+    from app.services import timelines
+    reader, post = timeline["reader"], timeline["post"]
+    get_home_feed(reader)
+    Community.join_community(str(timeline["later"]["id"]), reader) # Backfills inline, nothing to copy yet
+    fresh = post(timeline["later"], "Fanned out and copied")
+    fresh_doc = mongo.db.posts.find_one({"_id": fresh})
+    assert timelines.fanout_post(fresh_doc) == 0 # A retried fan-out skips timelines that hold the post
+    assert timelines.backfill(reader, timeline["later"]["id"]) # A backfill racing the fan-out copies it again
+    entries = [entry["post_id"] for entry in mongo.db.timelines.find_one()["entries"]]
+    assert entries == [fresh]
+
+def test_reads_only_refresh_stale_read_at(timeline):
+    reader = timeline["reader"]
+    get_home_feed(reader)
+    read_at = mongo.db.timelines.find_one()["read_at"]
+    get_home_feed(reader)
+    assert mongo.db.timelines.find_one()["read_at"] == read_at # Still fresh: the read did not write
+
+    mongo.db.timelines.update_one({}, {"$set": {"read_at": datetime(2025, 1, 1, tzinfo=timezone.utc)}})
+    get_home_feed(reader)
+    assert mongo.db.timelines.find_one()["read_at"] > datetime(2026, 1, 1)
+
+def test_first_use_creates_the_timeline_indexes(timeline):
+    get_home_feed(timeline["reader"])
+    indexes = {tuple(key for key, _ in index["key"]): index for index in mongo.db.timelines.index_information().values()}
+    assert ("covered",) in indexes
+    assert indexes[("read_at",)]["expireAfterSeconds"] == timeline["app"].config['TIMELINE_IDLE_DAYS'] * 24 * 3600
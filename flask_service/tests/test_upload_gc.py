@@ -0,0 +1,119 @@
+# tests/test_upload_gc.py
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+from app import mongo
+from app.models.upload import Upload
+from app.services.upload_gc import sweep_orphaned_uploads
+from tests.object_store_simulator import ObjectStoreSimulator
+from tests.portal_simulator import SimulatorServer
+
+BASE_URL = "https://unicampusbackend.duckdns.org/uploads"
+OLD = time.time() - 3 * 24 * 3600
+
+def _blob(tmp_path, content, *variants, age=OLD):
+    sha256 = hashlib.sha256(content).hexdigest()
+    key = f"blobs/{sha256[:2]}/{sha256}.png"
+    keys = [key] + [f"blobs/{sha256[:2]}/{sha256}.{variant}" for variant in variants]
+    for name in keys:
+        path = tmp_path / name
+        os.makedirs(path.parent, exist_ok=True)
+        path.write_bytes(content)
+        os.utime(path, (age, age))
+    uploaded_at = datetime.fromtimestamp(age, timezone.utc)
+    Upload.get_collection().insert_one({"_id": sha256, "path": key, "refcount": 0, "size": len(content),
+                                        "last_uploaded_at": uploaded_at, "last_released_at": uploaded_at})
+    return f"{BASE_URL}/{key}", keys
+
+def _legacy(tmp_path, name, age=OLD):
+    path = tmp_path / name
+    os.makedirs(path.parent, exist_ok=True)
+    path.write_bytes(b"legacy-bytes")
+    os.utime(path, (age, age))
+    return f"{BASE_URL}/{name}"
+
+@pytest.fixture
+def upload_root(mock_mongo_app, tmp_path):
+    mock_mongo_app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    mock_mongo_app.config['UPLOAD_GC_BATCH_PAUSE_SECONDS'] = 0
+    return tmp_path
+
+def _remaining(tmp_path):
+    return sorted(str(p.relative_to(tmp_path)) for p in tmp_path.rglob("*") if p.is_file())
+
+def test_sweep_deletes_only_old_unreferenced_files(upload_root):
+    tmp_path = upload_root
+    kept_url, kept_keys = _blob(tmp_path, b"kept-post-image", "thumb320.webp", "thumb320.jpg")
+    orphan_url, orphan_keys = _blob(tmp_path, b"replaced-icon", "icon64.webp")
+    fresh_url, fresh_keys = _blob(tmp_path, b"just-uploaded", age=time.time())
+    _, reuploaded_keys = _blob(tmp_path, b"old-file-sent-again")
+    Upload.get_collection().update_one({"_id": reuploaded_keys[0].split('/')[-1][:64]},
+                                       {"$set": {"last_uploaded_at": datetime.now(timezone.utc)}})
+    legacy_avatar = _legacy(tmp_path, "avatars/avatar_1.png")
+    _legacy(tmp_path, "post_images/postimg_deleted.png")
+    _legacy(tmp_path, "blobs/.upload-abandoned.part")
+
+    mongo.db.posts.insert_one({"image_url": kept_url})
+    mongo.db.communities.insert_one({"iconUrl": "https://elsewhere.example/icon.png", "bannerImage": None})
+    mongo.db.users.insert_one({"avatar": legacy_avatar})
+
+    dry = sweep_orphaned_uploads(dry_run=True, batch_size=2)
+    assert dry["orphans"] == 4 and dry["deleted"] == 0
+    assert dry["reclaimableBytes"] == 2 * len(b"replaced-icon") + 2 * len(b"legacy-bytes")
+    assert len(_remaining(tmp_path)) == 10
+
+    report = sweep_orphaned_uploads(batch_size=2)
+    assert report["deleted"] == 4 and report["reclaimedBytes"] == dry["reclaimableBytes"]
+    assert report["referenced"] == 4 and report["withinGrace"] == 1 and report["keptByRecord"] == 1
+    assert report["batches"] == 3
+    assert _remaining(tmp_path) == sorted(kept_keys + fresh_keys + reuploaded_keys + ["avatars/avatar_1.png"])
+    assert Upload.get_collection().find_one({"_id": orphan_keys[0].split('/')[-1][:64]}) is None
+    assert mongo.db.upload_gc_runs.count_documents({}) == 2
+
+def test_sweep_can_stop_after_max_batches(upload_root):
+    for n in range(5):
+        _legacy(upload_root, f"post_images/postimg_{n}.png")
+    first = sweep_orphaned_uploads(batch_size=2, max_batches=1)
+    assert first["deleted"] == 2 and first["complete"] is False
+    second = sweep_orphaned_uploads(batch_size=2)
+    assert second["deleted"] == 3 and second["complete"] is True
+    assert _remaining(upload_root) == []
+
+def test_sweep_against_object_storage(mock_mongo_app, tmp_path):
+    with SimulatorServer(ObjectStoreSimulator('unicampus-test')) as server:
+        mock_mongo_app.config.update(UPLOAD_STORAGE_BACKEND='s3', S3_BUCKET='unicampus-test', S3_ENDPOINT_URL=server.base_url,
+                                     S3_ACCESS_KEY_ID='sim', S3_SECRET_ACCESS_KEY='sim', UPLOAD_GC_BATCH_PAUSE_SECONDS=0)
+        simulator = server.simulator
+        old = datetime.now(timezone.utc) - timedelta(days=3)
+        for key in ("post_images/postimg_live.png", "post_images/postimg_live.feed1080.webp", "post_images/postimg_gone.png"):
+            simulator.objects[key] = {"data": b"x" * 10, "content_type": "image/png", "cache_control": None,
+                                      "checksum": None, "etag": '"x"', "modified": old}
+        mongo.db.posts.insert_one({"image_url": f"{server.base_url}/unicampus-test/post_images/postimg_live.png"})
+
+        report = sweep_orphaned_uploads(batch_size=1)
+        assert report["scanned"] == 3 and report["deleted"] == 1 and report["reclaimedBytes"] == 10
+        assert sorted(simulator.objects) == ["post_images/postimg_live.feed1080.webp", "post_images/postimg_live.png"]
+
+def test_sweep_keeps_blob_uploaded_again_while_it_runs(upload_root, monkeypatch):
+    _, keys = _blob(upload_root, b"sent-again-mid-sweep")
+    sha256 = keys[0].split('/')[-1][:64]
+    collection = Upload.get_collection()
+
+    class UploadDuringSweep:
+        """Re-uploads the blob right after the sweeper drops its record, before it deletes the object."""
+        def __getattr__(self, name):
+            return getattr(collection, name)
+
+        def delete_many(self, query):
+            result = collection.delete_many(query)
+            Upload.record_upload(sha256, keys[0], f"{BASE_URL}/{keys[0]}", 20, "png", "post")
+            (upload_root / keys[0]).write_bytes(b"sent-again-mid-sweep")
+            return result
+
+    monkeypatch.setattr(Upload, "get_collection", staticmethod(lambda: UploadDuringSweep()))
+    report = sweep_orphaned_uploads()
+    assert report["deleted"] == 0 and report["keptByRecord"] == 1
+    assert _remaining(upload_root) == keys
+    assert collection.find_one({"_id": sha256})["uploads"] == 1
@@ -0,0 +1,108 @@
+# tests/test_upload_routes.py
+import hashlib
+import io
+import struct
+import zlib
+import pytest
+from bson import ObjectId
+from flask_jwt_extended import create_access_token
+from PIL import Image
+from app import mongo
+from app.models.upload import Upload
+
+def _png_bytes(width=96, height=64):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (30, 120, 200)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+def _png_header(width, height):
+    # Header chunks only, no pixel data: enough for the dimension check, which must not decode anything
+    return b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)) + _png_chunk(b"IEND", b"")
+
+PNG_BYTES = _png_bytes()
+
+@pytest.fixture
+def uploader(mock_mongo_app, tmp_path):
+    mock_mongo_app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    mock_mongo_app.config['UPLOAD_MAX_IMAGE_BYTES'] = 64 * 1024
+    mock_mongo_app.config['UPLOAD_CHUNK_SIZE'] = 1024
+    mock_mongo_app.config['IMAGE_PIPELINE_ENABLED'] = False
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(ObjectId()))}"}
+    return mock_mongo_app.test_client(), headers, tmp_path
+
+def _stored_files(tmp_path):
+    return sorted(str(p.relative_to(tmp_path)) for p in tmp_path.rglob("*") if p.is_file())
+
+def test_multipart_upload_streams_to_disk(uploader):
+    client, headers, tmp_path = uploader
+    response = client.post('/api/v1/uploads/post_image', headers=headers,
+                           data={"file": (io.BytesIO(PNG_BYTES), "photo.png")}, content_type='multipart/form-data')
+    assert response.status_code == 201
+    data = response.get_json()["data"]
+    assert data["size"] == len(PNG_BYTES) and data["format"] == "png"
+    sha256 = hashlib.sha256(PNG_BYTES).hexdigest()
+    assert data["url"].endswith(f"/uploads/blobs/{sha256[:2]}/{sha256}.png")
+    stored = _stored_files(tmp_path)
+    assert stored == [f"blobs/{sha256[:2]}/{sha256}.png"] # No .part files left behind
+    assert (tmp_path / stored[0]).read_bytes() == PNG_BYTES
+
+def test_raw_body_upload(uploader):
+    client, headers, tmp_path = uploader
+    response = client.post('/api/v1/uploads/community_icon', headers=headers, data=PNG_BYTES, content_type='image/png')
+    assert response.status_code == 201
+    assert response.get_json()["data"]["url"].endswith(".png")
+
+def test_oversized_upload_is_rejected_while_streaming(uploader):
+    client, headers, tmp_path = uploader
+    too_big = PNG_BYTES + b"\x00" * (64 * 1024) # Trailing bytes after IEND
+    # No Content-Length to reject up front: the limit has to be enforced on the bytes as they arrive
+    response = client.post('/api/v1/uploads/post_image', headers=headers, input_stream=io.BytesIO(too_big),
+                           content_type='image/png', environ_overrides={"wsgi.input_terminated": True})
+    assert response.status_code == 413
+    assert _stored_files(tmp_path) == []
+
+def test_non_image_bytes_are_rejected(uploader):
+    client, headers, tmp_path = uploader
+    response = client.post('/api/v1/uploads/post_image', headers=headers,
+                           data={"file": (io.BytesIO(b"<html>not an image</html>"), "page.png")},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert _stored_files(tmp_path) == []
+
+def test_unknown_kind(uploader):
+    client, headers, _ = uploader
+    assert client.post('/api/v1/uploads/avatars', headers=headers, data=PNG_BYTES, content_type='image/png').status_code == 404
+
+def test_decompression_bomb_rejected_from_header(uploader):
+    client, headers, tmp_path = uploader
+    response = client.post('/api/v1/uploads/post_image', headers=headers, data=_png_header(9000, 9000),
+                           content_type='image/png')
+    assert response.status_code == 400
+    assert "too large" in response.get_json()["message"]
+    assert _stored_files(tmp_path) == []
+
+def test_identical_bytes_are_stored_once(uploader):
+    client, headers, tmp_path = uploader
+    first = client.post('/api/v1/uploads/post_image', headers=headers, data=PNG_BYTES, content_type='image/png').get_json()["data"]
+    second = client.post('/api/v1/uploads/community_banner', headers=headers,
+                         data={"file": (io.BytesIO(PNG_BYTES), "again.png")}, content_type='multipart/form-data').get_json()["data"]
+    assert second["url"] == first["url"]
+    assert (first["deduplicated"], second["deduplicated"]) == (False, True)
+    assert len(_stored_files(tmp_path)) == 1
+    blob = mongo.db.uploads.find_one({"_id": first["sha256"]})
+    assert blob["uploads"] == 2 and sorted(blob["kinds"]) == ["community_banner", "post_image"]
+
+def test_references_are_counted(uploader, scraped_student_data):
+    from app.models.community import Community
+    from app.models.user import User
+    client, headers, tmp_path = uploader
+    url = client.post('/api/v1/uploads/community_icon', headers=headers, data=PNG_BYTES, content_type='image/png').get_json()["data"]["url"]
+    user_id = str(User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")["_id"])
+    community = Community.create_community("Coding Club", "A place to talk about code.", user_id, icon_url=url)
+    User.update_profile(user_id, {"avatar": url})
+    assert mongo.db.uploads.find_one({"_id": Upload.sha_for_url(url)})["refcount"] == 2
+    Community.update_community(str(community["id"]), user_id, {"iconUrl": None})
+    assert mongo.db.uploads.find_one({"_id": Upload.sha_for_url(url)})["refcount"] == 1
@@ -0,0 +1,61 @@
+# tests/test_upload_serving.py
+import hashlib
+import os
+import pytest
+
+BLOB = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 8
+SHA256 = hashlib.sha256(BLOB).hexdigest()
+BLOB_PATH = f"blobs/{SHA256[:2]}/{SHA256}.png"
+
+@pytest.fixture
+def served(mock_mongo_app, tmp_path):
+    mock_mongo_app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    os.makedirs(tmp_path / "blobs" / SHA256[:2])
+    (tmp_path / BLOB_PATH).write_bytes(BLOB)
+    os.makedirs(tmp_path / "post_images")
+    (tmp_path / "post_images" / "postimg_legacy.png").write_bytes(BLOB)
+    return mock_mongo_app, mock_mongo_app.test_client()
+
+def test_hashed_upload_is_immutable_with_strong_etag(served):
+    _, client = served
+    response = client.get(f"/uploads/{BLOB_PATH}")
+    assert response.status_code == 200 and response.data == BLOB
+    assert response.headers["ETag"] == f'"{SHA256}"'
+    assert response.cache_control.immutable and response.cache_control.max_age == 365 * 24 * 3600
+
+    revalidated = client.get(f"/uploads/{BLOB_PATH}", headers={"If-None-Match": f'"{SHA256}"'})
+    assert revalidated.status_code == 304 and revalidated.data == b""
+
+def test_legacy_upload_gets_validators_and_short_max_age(served):
+    app, client = served
+    response = client.get("/uploads/post_images/postimg_legacy.png")
+    assert response.status_code == 200
+    assert not response.cache_control.immutable
+    assert response.cache_control.max_age == app.config['UPLOAD_CACHE_MAX_AGE']
+    assert client.get("/uploads/post_images/postimg_legacy.png",
+                      headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+def test_byte_ranges(served):
+    _, client = served
+    response = client.get(f"/uploads/{BLOB_PATH}", headers={"Range": "bytes=8-15"})
+    assert response.status_code == 206
+    assert response.data == BLOB[8:16]
+    assert response.headers["Content-Range"] == f"bytes 8-15/{len(BLOB)}"
+
+def test_x_accel_redirect_offloads_to_proxy(served):
+    app, client = served
+    app.config['UPLOAD_SERVE_MODE'] = 'x-accel'
+    response = client.get(f"/uploads/{BLOB_PATH}")
+    assert response.status_code == 200 and response.data == b""
+    assert response.headers["X-Accel-Redirect"] == f"/protected-uploads/{BLOB_PATH}"
+    assert response.mimetype == "image/png"
+    assert response.cache_control.immutable
+
+def test_x_sendfile_and_missing_files(served):
+    app, client = served
+    app.config['UPLOAD_SERVE_MODE'] = 'x-sendfile'
+    response = client.get(f"/uploads/{BLOB_PATH}")
+    assert response.headers["X-Sendfile"] == os.path.join(app.config['UPLOAD_FOLDER'], BLOB_PATH)
+    app.config['UPLOAD_SERVE_MODE'] = 'app'
+    assert client.get("/uploads/post_images/missing.png").status_code == 404
+    assert client.get("/uploads/../secrets.txt").status_code == 404
@@ -0,0 +1,128 @@
+# tests/test_upload_storage.py
+import base64
+import hashlib
+import io
+import os
+import pytest
+import requests
+from bson import ObjectId
+from flask_jwt_extended import create_access_token
+from PIL import Image
+from app import mongo
+from app.models.upload import Upload
+from app.services.image_pipeline import process_variants
+from tests.object_store_simulator import ObjectStoreSimulator
+from tests.portal_simulator import SimulatorServer
+
+pytest.importorskip("boto3")
+
+CDN = "https://cdn.unicampus.test"
+
+def _png_bytes(width=96, height=64, color=(30, 120, 200)):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+PNG_BYTES = _png_bytes()
+PNG_SHA256 = hashlib.sha256(PNG_BYTES).hexdigest()
+PNG_KEY = f"blobs/{PNG_SHA256[:2]}/{PNG_SHA256}.png"
+
+def _configure(app, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / "uploads")
+    app.config['UPLOAD_SPOOL_FOLDER'] = str(tmp_path / "spool")
+    app.config['UPLOAD_MAX_IMAGE_BYTES'] = 64 * 1024
+    app.config['UPLOAD_CHUNK_SIZE'] = 1024
+    app.config['IMAGE_PIPELINE_ENABLED'] = False
+    return app.test_client(), {"Authorization": f"Bearer {create_access_token(identity=str(ObjectId()))}"}
+
+@pytest.fixture
+def object_store(mock_mongo_app, tmp_path):
+    """UPLOAD_STORAGE_BACKEND='s3' against the in-process simulator (MinIO stand-in), URLs through a CDN base."""
+    with SimulatorServer(ObjectStoreSimulator('unicampus-test')) as server:
+        client, headers = _configure(mock_mongo_app, tmp_path)
+        mock_mongo_app.config.update(UPLOAD_STORAGE_BACKEND='s3', S3_BUCKET='unicampus-test', S3_ENDPOINT_URL=server.base_url,
+                                     S3_ACCESS_KEY_ID='sim', S3_SECRET_ACCESS_KEY='sim', UPLOAD_PUBLIC_BASE_URL=CDN)
+        yield client, headers, server.simulator, tmp_path
+
+def test_streaming_upload_lands_in_bucket_with_cdn_url(object_store):
+    client, headers, simulator, tmp_path = object_store
+    response = client.post('/api/v1/uploads/post_image', headers=headers, data=PNG_BYTES, content_type='image/png')
+    assert response.status_code == 201
+    data = response.get_json()["data"]
+    assert data["url"] == f"{CDN}/{PNG_KEY}" and data["deduplicated"] is False
+    stored = simulator.objects[PNG_KEY]
+    assert stored["data"] == PNG_BYTES and stored["content_type"] == "image/png"
+    assert "immutable" in stored["cache_control"]
+    assert not os.listdir(tmp_path / "spool") # Spool removed once uploaded
+    assert not (tmp_path / "uploads").exists() # Nothing written to this node's disk
+
+    puts = simulator.request_count('PUT')
+    again = client.post('/api/v1/uploads/post_image', headers=headers,
+                        data={"file": (io.BytesIO(PNG_BYTES), "same.png")}, content_type='multipart/form-data')
+    assert again.get_json()["data"]["deduplicated"] is True
+    assert simulator.request_count('PUT') == puts # Identical bytes are not sent to the bucket again
+
+def test_presigned_direct_upload(object_store):
+    client, headers, simulator, _ = object_store
+    body = {"sha256": PNG_SHA256, "contentType": "image/png", "size": len(PNG_BYTES)}
+    assert client.post('/api/v1/uploads/post_image/complete', headers=headers, json=body).status_code == 404
+
+    presigned = client.post('/api/v1/uploads/post_image/presign', headers=headers, json=body)
+    assert presigned.status_code == 200
+    target = presigned.get_json()["data"]["target"]
+    assert target["method"] == "PUT" and target["headers"]["x-amz-checksum-sha256"] == \
+        base64.b64encode(bytes.fromhex(PNG_SHA256)).decode()
+
+    tampered = requests.put(target["url"], data=_png_bytes(color=(0, 0, 0))[:len(PNG_BYTES)], headers=target["headers"])
+    assert tampered.status_code == 400 # The store rejects bytes that do not match the signed SHA-256
+    assert requests.put(target["url"], data=PNG_BYTES, headers=target["headers"]).status_code == 200
+
+    completed = client.post('/api/v1/uploads/post_image/complete', headers=headers, json=body)
+    assert completed.status_code == 201
+    assert completed.get_json()["data"]["url"] == f"{CDN}/{PNG_KEY}"
+    assert Upload.get_collection().find_one({"_id": PNG_SHA256})["path"] == PNG_KEY
+
+    repeat = client.post('/api/v1/uploads/post_image/presign', headers=headers, json=body).get_json()["data"]
+    assert repeat["target"] is None and repeat["upload"]["deduplicated"] is True
+
+def test_direct_upload_that_is_not_an_image_is_deleted(object_store):
+    client, headers, simulator, _ = object_store
+    payload = b"GIF89a" + b"\x00" * 64 # Declared as PNG, sniffed as something else
+    body = {"sha256": hashlib.sha256(payload).hexdigest(), "contentType": "image/png", "size": len(payload)}
+    target = client.post('/api/v1/uploads/post_image/presign', headers=headers, json=body).get_json()["data"]["target"]
+    requests.put(target["url"], data=payload, headers=target["headers"])
+    response = client.post('/api/v1/uploads/post_image/complete', headers=headers, json=body)
+    assert response.status_code == 400
+    assert not simulator.objects
+
+    too_big = dict(body, size=10 * 1024 * 1024)
+    assert client.post('/api/v1/uploads/post_image/presign', headers=headers, json=too_big).status_code == 413
+    assert client.post('/api/v1/uploads/post_image/presign', headers=headers,
+                       json=dict(body, sha256="not-a-digest")).status_code == 400
+
+def test_variants_are_generated_from_and_written_to_the_bucket(object_store):
+    client, headers, simulator, _ = object_store
+    photo = _png_bytes(1600, 900)
+    url = client.post('/api/v1/uploads/post_image', headers=headers, data=photo, content_type='image/png').get_json()["data"]["url"]
+    post_id = mongo.db.posts.insert_one({"image_url": url}).inserted_id
+
+    variants = process_variants("posts", post_id, "image_url", "image_variants", "image", url)
+    stem = url.rsplit('/', 1)[1].rsplit('.', 1)[0]
+    assert variants["thumb320"]["webp"] == f"{CDN}/blobs/{stem[:2]}/{stem}.thumb320.webp"
+    key = f"blobs/{stem[:2]}/{stem}.feed1080.jpg"
+    assert simulator.objects[key]["content_type"] == "image/jpeg"
+    with Image.open(io.BytesIO(simulator.objects[key]["data"])) as img:
+        assert img.size == (1080, 608)
+
+def test_local_backend_uses_cdn_base_and_rejects_presign(mock_mongo_app, tmp_path):
+    client, headers = _configure(mock_mongo_app, tmp_path)
+    mock_mongo_app.config['UPLOAD_PUBLIC_BASE_URL'] = CDN
+    data = client.post('/api/v1/uploads/post_image', headers=headers, data=PNG_BYTES, content_type='image/png').get_json()["data"]
+    assert data["url"] == f"{CDN}/{PNG_KEY}"
+    assert (tmp_path / "uploads" / PNG_KEY).read_bytes() == PNG_BYTES
+
+    body = {"sha256": PNG_SHA256, "contentType": "image/png", "size": len(PNG_BYTES)}
+    response = client.post('/api/v1/uploads/post_image/presign', headers=headers, json=body)
+    assert response.status_code == 400 and "UPLOAD_STORAGE_BACKEND" in response.get_json()["message"]
+    response = client.post('/api/v1/uploads/post_image/complete', headers=headers, json=body)
+    assert response.status_code == 400 and "UPLOAD_STORAGE_BACKEND" in response.get_json()["message"]
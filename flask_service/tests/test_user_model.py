@@ -0,0 +1,58 @@
+# tests/test_user_model.py
+import copy
+from app.models.user import User
+
+def test_upsert_creates_user_on_first_login(mock_mongo_app, scraped_student_data):
+    user = User.upsert_from_scraped_data(scraped_student_data, "1ms22cs118")
+    assert user["usn"] == "1MS22CS118"
+    assert user["email"] == "1ms22cs118@unicampus.app"
+    assert user["role"] == "student"
+    assert user["college_profile"]["usn"] == "1MS22CS118"
+    # Token issuance does not need the heavy arrays
+    assert "academic_summaries" not in user and "exam_history" not in user
+
+    stored = User.find_by_usn("1MS22CS118")
+    assert stored["academic_summaries"] == scraped_student_data["dashboardSummaries"]
+    assert stored["most_recent_cgpa"] == 8.75
+    assert User.get_collection().count_documents({}) == 1
+
+def test_upsert_skips_rewrite_when_unchanged(mock_mongo_app, scraped_student_data):
+    first = User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")
+    second = User.upsert_from_scraped_data(copy.deepcopy(scraped_student_data), "1MS22CS118")
+    assert second["_id"] == first["_id"]
+    assert second["scrape_hash"] == first["scrape_hash"]
+    # Content did not change, so neither did the data/version timestamps
+    assert second["college_data_last_updated"] == first["college_data_last_updated"]
+    assert second["updated_at"] == first["updated_at"]
+    assert second["college_data_last_checked"] >= first["college_data_last_checked"]
+
+def test_upsert_rewrites_when_content_changes(mock_mongo_app, scraped_student_data):
+    first = User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")
+    changed = copy.deepcopy(scraped_student_data)
+    changed["dashboardSummaries"][0]["cieTotal"] = 44
+    second = User.upsert_from_scraped_data(changed, "1MS22CS118")
+    assert second["_id"] == first["_id"]
+    assert second["scrape_hash"] != first["scrape_hash"]
+    assert second["created_at"] == first["created_at"]
+    assert User.find_by_usn("1MS22CS118")["academic_summaries"][0]["cieTotal"] == 44
+    assert User.get_collection().count_documents({}) == 1
+
+def _stored_without_arrays(user_id):
+    return User.get_collection().find_one({"_id": user_id}, {field: 0 for field in User.SCRAPED_ARRAY_FIELDS})
+
+def test_upsert_returns_the_stored_document(mock_mongo_app, scraped_student_data, monkeypatch):
+    first = User.upsert_from_scraped_data(scraped_student_data, "1MS22CS118")
+    assert first == _stored_without_arrays(first["_id"]) # Insert: built from the create-only fields
+
+    refreshed = []
+    monkeypatch.setattr(User, "_refresh_author_snapshots", staticmethod(refreshed.append))
+    changed = copy.deepcopy(scraped_student_data)
+    changed["studentProfile"]["semester"] = "7"
+    second = User.upsert_from_scraped_data(changed, "1MS22CS118")
+    assert second == _stored_without_arrays(first["_id"]) # Update: the pre-image with the new fields
+    assert second["college_profile"]["semester"] == "7"
+    assert refreshed == [] # Name, USN and avatar did not change
+
+    changed["studentProfile"]["name"] = "JOHN Q DOE"
+    User.upsert_from_scraped_data(changed, "1MS22CS118")
+    assert refreshed == [first["_id"]]